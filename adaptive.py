@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# - adaptive.py -
+#
+# Adaptive lookup: templates are tried by decayed hit frequency, in an
+# order which can't change the results (see utils/overlap.py).
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import heapq
+
+from utils.overlap import Analysis
+import errors
+
+# Weight kept by the past hits at each lookup
+DEFAULT_DECAY = 0.9999
+# Number of lookups between two reorders
+DEFAULT_INTERVAL = 1000
+# The ordering is persisted next to the compiled artifact
+ORDER_SUFFIX = ".order"
+FORMAT_VERSION = 1
+# Scores are rescaled before the weight of a hit overflows
+MAX_WEIGHT = 1e100
+
+
+class AdaptiveLookup(object):
+    """Try the templates by decayed hit frequency instead of the config
+    order. A template is only moved before another one if the overlap
+    analysis proves they can't validate the same path, so the results are
+    the ones of the config order:
+
+    - :func:`first_template_from_path` returns the first template of the
+      config order which validates the path.
+    - :func:`templates_from_path` stops as soon as a template which
+      overlaps no other one validates the path.
+
+    >>> lookup = AdaptiveLookup(prodex_template)
+    >>> lookup.first_template_from_path(path)
+    >>> lookup.order[:3]
+    >>> ['maya_shot_work', 'nuke_shot_render', 'maya_shot_publish']
+    >>> lookup.save()
+
+    :param config: The configuration
+    :type config: :class:`templates.ProdexTemplate`
+    :param decay: (kwargs) Weight kept by the past hits at each lookup,
+    defaults to :data:`DEFAULT_DECAY`
+    :type decay: float
+    :param interval: (kwargs) Number of lookups between two reorders,
+    defaults to :data:`DEFAULT_INTERVAL`
+    :type interval: int
+    :param path: (kwargs) File of the persisted ordering, defaults to the
+    compiled artifact of the config followed by :data:`ORDER_SUFFIX`. It is
+    loaded if it exists.
+    :type path: str
+    :raises errors.ProdexTemplateError: If the decay is not in ]0, 1]
+    """
+
+    def __init__(self, config, **kwargs):
+        super(AdaptiveLookup, self).__init__()
+
+        self._decay = float(kwargs.get("decay", DEFAULT_DECAY))
+        if not 0.0 < self._decay <= 1.0:
+            raise errors.ProdexTemplateError(
+                "The decay must be in ]0, 1], not %s" % self._decay
+            )
+        self._interval = int(kwargs.get("interval", DEFAULT_INTERVAL))
+        self._path = kwargs.get("path", None)
+        if self._path is None and config.artifact:
+            self._path = config.artifact + ORDER_SUFFIX
+
+        # Config order
+        self._templates = list(config.templates.values())
+        self._positions = {x.name: i for i, x in enumerate(self._templates)}
+        analysis = Analysis(self._templates)
+        self._exclusive = frozenset(analysis.exclusive())
+        # Position: positions after it which may validate the same paths
+        self._successors = [
+            [
+                self._positions[x]
+                for x in analysis.overlaps(template.name)
+                if self._positions[x] > position
+            ]
+            for position, template in enumerate(self._templates)
+        ]
+
+        # Decayed hits: a hit weighs more at each lookup instead of
+        # decaying all the scores
+        self._scores = [0.0] * len(self._templates)
+        self._weight = 1.0
+        self._lookups = 0
+        self._order = list(self._templates)
+        if self._path and os.path.exists(self._path):
+            self.load(self._path)
+
+    def __repr__(self):
+        return "<%s %d templates>" % (
+            self.__class__.__name__,
+            len(self._templates),
+        )
+
+    @property
+    def order(self):
+        """Return the names of the templates in the order they are tried
+
+        :rtype: list
+        """
+        return [x.name for x in self._order]
+
+    @property
+    def scores(self):
+        """Return the decayed number of hits of each template
+
+        :return: Dictionnary of scores (key: template name)
+        :rtype: dict
+        """
+        return {
+            x.name: self._scores[i] / self._weight
+            for i, x in enumerate(self._templates)
+        }
+
+    @property
+    def path(self):
+        """Return the file of the persisted ordering
+
+        :rtype: str
+        """
+        return self._path
+
+    def _record(self, template):
+        if template is not None:
+            self._scores[self._positions[template.name]] += self._weight
+        self._weight /= self._decay
+        if self._weight > MAX_WEIGHT:
+            self._scores = [x / self._weight for x in self._scores]
+            self._weight = 1.0
+        self._lookups += 1
+        if self._lookups % self._interval == 0:
+            self.reorder()
+
+    def reorder(self):
+        """Sort the templates by score. Templates which overlap keep their
+        config order (topological sort of the overlaps).
+        """
+        predecessors = [0] * len(self._templates)
+        for successors in self._successors:
+            for position in successors:
+                predecessors[position] += 1
+        heap = [
+            (-self._scores[x], x)
+            for x, count in enumerate(predecessors)
+            if not count
+        ]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            _, position = heapq.heappop(heap)
+            order.append(self._templates[position])
+            for successor in self._successors[position]:
+                predecessors[successor] -= 1
+                if not predecessors[successor]:
+                    heapq.heappush(
+                        heap, (-self._scores[successor], successor)
+                    )
+        self._order = order
+
+    def first_template_from_path(self, path, **kwargs):
+        """Find the first template (in the config order) which validates
+        the path
+
+        :param path: The path to match against a template
+        :type path: str
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :return: :class:`templates.Template` or None if no match could be
+        found.
+        :rtype: :class:`templates.Template`
+        """
+        for template in self._order:
+            if template.validate(path, **kwargs):
+                self._record(template)
+                return template
+        self._record(None)
+        return None
+
+    def templates_from_path(self, path, **kwargs):
+        """Finds templates that matches the given path, like
+        :func:`templates.ProdexTemplate.templates_from_path`
+
+        :param path: The path to match against a template
+        :type path: str
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :return: List of :class:`templates.Template` (in the config order)
+        or [] if no match could be found.
+        :rtype: list
+        """
+        found = []
+        for template in self._order:
+            if not template.validate(path, **kwargs):
+                continue
+            found.append(template)
+            if template.name in self._exclusive:
+                # No other template can validate the path
+                break
+        self._record(found[0] if len(found) == 1 else None)
+        found.sort(key=lambda x: self._positions[x.name])
+        return found
+
+    def save(self, path=None):
+        """Persist the scores, warm processes start with this ordering
+
+        :param path: The file, defaults to :func:`path`
+        :type path: str, optional
+        :raises errors.ProdexTemplateError: If there is no file to save to
+        """
+        path = path or self._path
+        if not path:
+            raise errors.ProdexTemplateError(
+                "No file to save the ordering, the config is not compiled"
+            )
+        data = {
+            "version": FORMAT_VERSION,
+            "order": self.order,
+            "scores": self.scores,
+        }
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Load persisted scores. Templates which don't exist anymore are
+        ignored and the order is computed again with the current overlaps.
+
+        :param path: The file
+        :type path: str
+        :return: True if the file has been loaded, False if its version is
+        not supported
+        :rtype: bool
+        """
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            return False
+        self._weight = 1.0
+        self._scores = [
+            float(data["scores"].get(x.name, 0.0)) for x in self._templates
+        ]
+        self.reorder()
+        return True
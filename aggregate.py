@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+#
+# - aggregate.py -
+#
+# Streaming group-by aggregation of the classification results.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import errors
+from utils import filesystem as filesystem_
+
+
+def _sort_key(value):
+    """Order values of mixed types: numbers, then strings, then None"""
+    number = isinstance(value, (int, float)) and not isinstance(value, bool)
+    return (value is None, not number, value if number else str(value))
+
+
+class Reducer(object):
+    """Reduce the paths of a group into a value. The state of a group is
+    all what is kept in memory, whatever the number of paths.
+
+    :param field: The placeholder to reduce, if the reducer needs one
+    :type field: str, optional
+    """
+
+    name = None
+    needs_field = True
+
+    def __init__(self, field=None, **kwargs):
+        super(Reducer, self).__init__()
+
+        if self.needs_field and not field:
+            raise ValueError("The reducer %s needs a field" % self.name)
+        self.field = field or None
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.key)
+
+    @property
+    def key(self):
+        """Return the name of the result (``max_version``, ``count``...)
+
+        :rtype: str
+        """
+        if self.field is None:
+            return self.name
+        return "%s_%s" % (self.name, self.field)
+
+    def start(self):
+        """Return the state of a new group"""
+        return None
+
+    def update(self, state, path, fields):
+        """Return the state updated with a path
+
+        :param state: The state of the group
+        :type state: object
+        :param path: The path
+        :type path: str
+        :param fields: The placeholders values of the path
+        :type fields: dict
+        :return: The new state
+        :rtype: object
+        """
+        raise NotImplementedError
+
+    def merge(self, state, other):
+        """Return the state of a group from two partial states"""
+        raise NotImplementedError
+
+    def result(self, state):
+        """Return the value of a group from its state"""
+        return state
+
+
+class MaxReducer(Reducer):
+    """Greatest value of a field (latest version...)"""
+
+    name = "max"
+
+    def update(self, state, path, fields):
+        return self.merge(state, fields.get(self.field))
+
+    def merge(self, state, other):
+        if other is None:
+            return state
+        if state is None or other > state:
+            return other
+        return state
+
+
+class MinReducer(MaxReducer):
+    """Smallest value of a field"""
+
+    name = "min"
+
+    def merge(self, state, other):
+        if other is None:
+            return state
+        if state is None or other < state:
+            return other
+        return state
+
+
+class CountReducer(Reducer):
+    """Number of paths"""
+
+    name = "count"
+    needs_field = False
+
+    def start(self):
+        return 0
+
+    def update(self, state, path, fields):
+        return state + 1
+
+    def merge(self, state, other):
+        return state + other
+
+
+class SizeReducer(CountReducer):
+    """Sum of the sizes of the files (stat), paths which don't exist
+    anymore count for 0.
+
+    :param filesystem: (kwargs) The filesystem to stat the paths, defaults
+    to the local filesystem
+    :type filesystem: :class:`utils.filesystem.FileSystem`
+    """
+
+    name = "size"
+
+    def __init__(self, field=None, **kwargs):
+        super(SizeReducer, self).__init__(field=field, **kwargs)
+
+        self._filesystem = kwargs.get("filesystem", None)
+        if self._filesystem is None:
+            self._filesystem = filesystem_.LOCAL_FILESYSTEM
+
+    def update(self, state, path, fields):
+        return state + (self._filesystem.size(path) or 0)
+
+
+class SetReducer(Reducer):
+    """Distinct values of a field (extensions of a step...)"""
+
+    name = "set"
+
+    def start(self):
+        return set()
+
+    def update(self, state, path, fields):
+        value = fields.get(self.field)
+        if value is not None:
+            state.add(value)
+        return state
+
+    def merge(self, state, other):
+        state.update(other)
+        return state
+
+    def result(self, state):
+        return sorted(state, key=_sort_key)
+
+
+REDUCERS_MAPPING = {
+    MaxReducer.name: MaxReducer,
+    MinReducer.name: MinReducer,
+    CountReducer.name: CountReducer,
+    SizeReducer.name: SizeReducer,
+    SetReducer.name: SetReducer,
+}
+
+
+def reducer_from_spec(spec, **kwargs):
+    """Create a reducer from its description: ``name`` or ``name:field``
+    (``count``, ``size``, ``max:version``, ``set:extension``...)
+
+    :param spec: The description
+    :type spec: str
+    :param kwargs: Given to the reducer (filesystem...)
+    :type kwargs: dict
+    :raises ValueError: If the reducer doesn't exist
+    :rtype: :class:`Reducer`
+    """
+    name, _, field = spec.partition(":")
+    if name not in REDUCERS_MAPPING:
+        raise ValueError(
+            "Unknown reducer %s (%s)"
+            % (name, ", ".join(sorted(REDUCERS_MAPPING)))
+        )
+    return REDUCERS_MAPPING[name](field=field, **kwargs)
+
+
+class Aggregator(object):
+    """Group the classification results by template and by the values of
+    some placeholders, and reduce each group as the results come. Only the
+    state of the groups is kept, never the results themselves.
+
+    >>> aggregator = Aggregator(by=["asset"], reducers=["max:version"])
+    >>> aggregator.consume(prodex_template.resolve(paths, discreet=True))
+    >>> list(aggregator.results())
+    >>> [{'template': 'maya_asset_work', 'asset': 'foo', 'max_version': 3}]
+
+    :param by: The placeholders to group by, after the template
+    :type by: list, optional
+    :param reducers: The reducers (:class:`Reducer` or description, see
+    :func:`reducer_from_spec`), defaults to ``["count"]``
+    :type reducers: list, optional
+    :param templates: (kwargs) Only aggregate these templates, optional
+    :type templates: list
+    :param max_groups: (kwargs) Raise if there are more groups, to bound
+    the memory, optional
+    :type max_groups: int
+    :param filesystem: (kwargs) The filesystem of the size reducer, optional
+    :type filesystem: :class:`utils.filesystem.FileSystem`
+    """
+
+    def __init__(self, by=None, reducers=None, **kwargs):
+        super(Aggregator, self).__init__()
+
+        self._by = list(by or [])
+        self._reducers = []
+        for reducer in reducers or ["count"]:
+            if not isinstance(reducer, Reducer):
+                reducer = reducer_from_spec(
+                    reducer, filesystem=kwargs.get("filesystem", None)
+                )
+            self._reducers.append(reducer)
+        templates = kwargs.get("templates", None)
+        self._templates = frozenset(templates) if templates else None
+        self._max_groups = kwargs.get("max_groups", None)
+        # (template name, values...): [state of each reducer]
+        self._groups = {}
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self._groups)
+
+    @property
+    def by(self):
+        """Return the placeholders to group by
+
+        :rtype: list
+        """
+        return list(self._by)
+
+    @property
+    def reducers(self):
+        """Return the reducers
+
+        :rtype: list
+        """
+        return list(self._reducers)
+
+    def _states(self, key):
+        states = self._groups.get(key)
+        if states is not None:
+            return states
+        if self._max_groups is not None and (
+            len(self._groups) >= self._max_groups
+        ):
+            raise errors.ProdexTemplateError(
+                "More than %d groups, group by less placeholders"
+                % self._max_groups
+            )
+        states = [x.start() for x in self._reducers]
+        self._groups[key] = states
+        return states
+
+    def add(self, path, template, fields):
+        """Add a classification result
+
+        :param path: The path
+        :type path: str
+        :param template: The template (or its name), None if unmatched
+        :type template: :class:`templates.Template`
+        :param fields: The placeholders values
+        :type fields: dict
+        :raises errors.ProdexTemplateError: If max_groups is exceeded
+        :return: False if the path is skipped (unmatched or filtered)
+        :rtype: bool
+        """
+        name = getattr(template, "name", template)
+        if name is None or (
+            self._templates is not None and name not in self._templates
+        ):
+            self.skipped += 1
+            return False
+        key = (name,) + tuple(fields.get(x) for x in self._by)
+        states = self._states(key)
+        for index, reducer in enumerate(self._reducers):
+            states[index] = reducer.update(states[index], path, fields)
+        return True
+
+    def consume(self, results):
+        """Add a stream of results, like the ones of
+        :meth:`templates.ProdexTemplate.resolve`
+
+        :param results: Iterable of (path, template, fields)
+        :type results: iterable
+        :return: The aggregator
+        :rtype: :class:`Aggregator`
+        """
+        add = self.add
+        for path, template, fields in results:
+            add(path, template, fields)
+        return self
+
+    def merge(self, other):
+        """Add the groups of another aggregator (of another shard, another
+        process...) with the same placeholders and reducers.
+
+        :param other: The other aggregator
+        :type other: :class:`Aggregator`
+        :raises ValueError: If the aggregators are not compatible
+        :return: The aggregator
+        :rtype: :class:`Aggregator`
+        """
+        keys = [x.key for x in self._reducers]
+        if other.by != self._by or [x.key for x in other.reducers] != keys:
+            raise ValueError("The aggregators don't have the same groups")
+        for key, other_states in other._groups.items():
+            states = self._states(key)
+            for index, reducer in enumerate(self._reducers):
+                states[index] = reducer.merge(
+                    states[index], other_states[index]
+                )
+        self.skipped += other.skipped
+        return self
+
+    def results(self):
+        """Generate the value of each group, sorted by template and values
+
+        :return: Generator of dict: template, the placeholders to group by
+        and the result of each reducer
+        :rtype: generator
+        """
+        for key in sorted(
+            self._groups, key=lambda x: [_sort_key(y) for y in x]
+        ):
+            result = {"template": key[0]}
+            result.update(zip(self._by, key[1:]))
+            states = self._groups[key]
+            for index, reducer in enumerate(self._reducers):
+                result[reducer.key] = reducer.result(states[index])
+            yield result
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+#
+# - memory.py -
+#
+# Memory benchmarks: configuration load, per template overhead and peak memory
+# of batch resolutions. The JSON report can be diffed between two versions.
+#
+#     $ python benchmarks/memory.py --sizes 100000 1000000 --output report.json
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import collections
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+from templates import ProdexTemplate  # noqa: E402
+from columnar import resolve_columnar  # noqa: E402
+from utils import synthetic  # noqa: E402
+
+DEFAULT_SIZES = [10**5, 10**6, 10**7]
+# Allocations of these files are reported as hot spots
+WATCHED_FILES = (
+    "templates_utils.py",
+    "templates.py",
+    "placeholders.py",
+    "engines.py",
+    "codegen.py",
+)
+
+
+def rss():
+    """Return the current resident set size (bytes)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def hot_spots(snapshot, limit=10):
+    """Biggest allocations of the watched files
+
+    :param snapshot: The tracemalloc snapshot
+    :type snapshot: tracemalloc.Snapshot
+    :param limit: Number of lines to report, defaults to 10
+    :type limit: int, optional
+    :return: List of {"line", "size", "count"}
+    :rtype: list
+    """
+    spots = []
+    for stat in snapshot.statistics("lineno"):
+        frame = stat.traceback[0]
+        if os.path.basename(frame.filename) not in WATCHED_FILES:
+            continue
+        spots.append(
+            {
+                "line": "%s:%d"
+                % (os.path.relpath(frame.filename, ROOT_PATH), frame.lineno),
+                "size": stat.size,
+                "count": stat.count,
+            }
+        )
+        if len(spots) >= limit:
+            break
+    return spots
+
+
+def measure_load(config_path):
+    """Memory of a configuration load"""
+    gc.collect()
+    rss_before = rss()
+    tracemalloc.start(1)
+    start = time.perf_counter()
+    config = ProdexTemplate(path=config_path)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    templates = config.templates
+    return {
+        "templates": len(templates),
+        "definitions": sum(len(x.definitions) for x in templates.values()),
+        "retained": current,
+        "peak": peak,
+        "rss": rss() - rss_before,
+        "seconds": round(elapsed, 4),
+        "per_template": current // max(len(templates), 1),
+        "hot_spots": hot_spots(snapshot),
+    }
+
+
+def measure_variations(directory, templates):
+    """Retained memory by template according to the number of optional
+    sections (so of definition variations).
+    """
+    result = {}
+    for optionals in range(4):
+        path = synthetic.generate_config(
+            os.path.join(directory, "optionals_%d.yml" % optionals),
+            templates=templates,
+            optionals=optionals,
+        )
+        load = measure_load(path)
+        result[str(optionals)] = {
+            "definitions_per_template": round(
+                load["definitions"] / load["templates"], 2
+            ),
+            "per_template": load["per_template"],
+        }
+    return result
+
+
+def measure_batch(config_path, size, mode):
+    """Peak memory of a batch resolution of size paths.
+
+    :param mode: "stream" (results are consumed), "list" (results are kept)
+    or "columnar" (results are kept in a ColumnarResult)
+    :type mode: str
+    """
+    config = ProdexTemplate(path=config_path)
+    paths = (x[0] for x in synthetic.generate_paths(config, size))
+    stats = collections.Counter()
+    gc.collect()
+    rss_before = rss()
+    tracemalloc.start(1)
+    start = time.perf_counter()
+    if mode == "columnar":
+        kept = resolve_columnar(config, paths, stats=stats)
+    elif mode == "list":
+        kept = list(config.resolve(paths, stats=stats, discreet=True))
+    else:
+        kept = None
+        for _ in config.resolve(paths, stats=stats, discreet=True):
+            pass
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del kept
+    return {
+        "paths": size,
+        "mode": mode,
+        "retained": current,
+        "peak": peak,
+        "per_path": peak // max(size, 1),
+        "rss": rss() - rss_before,
+        "seconds": round(elapsed, 3),
+        "resolved": stats["resolved"],
+        "hot_spots": hot_spots(snapshot),
+    }
+
+
+def run_isolated(config_path, size, mode):
+    """Run a batch measure in a new process (RSS of the previous measures
+    would hide the result).
+    """
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--batch",
+            config_path,
+            str(size),
+            mode,
+        ]
+    )
+    return json.loads(output.decode("utf-8"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Memory benchmarks of prodex-template."
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES
+    )
+    parser.add_argument(
+        "--modes", nargs="+", default=["stream", "list", "columnar"]
+    )
+    parser.add_argument("--templates", type=int, default=200)
+    parser.add_argument("--output", help="Write the JSON report there")
+    parser.add_argument("--batch", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        config_path, size, mode = args.batch
+        result = measure_batch(config_path, int(size), mode)
+        sys.stdout.write(json.dumps(result))
+        return 0
+
+    directory = tempfile.mkdtemp(prefix="prodex-bench-")
+    config_path = str(
+        synthetic.generate_config(
+            os.path.join(directory, "config.yml"), templates=args.templates
+        )
+    )
+    report = {
+        "python": sys.version.split()[0],
+        "load": measure_load(config_path),
+        "variations": measure_variations(directory, args.templates),
+        "batch": [
+            run_isolated(config_path, size, mode)
+            for size in args.sizes
+            for mode in args.modes
+        ],
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    sys.stdout.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+#
+# - catalog.py -
+#
+# Persistent catalog of resolved paths (SQLite). Each placeholder is an indexed
+# column, so catalogued files can be queried without scanning again.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sqlite3
+
+from placeholders import IntegerPlaceholder
+import errors
+
+BATCH_SIZE = 10000
+
+OPERATORS = {
+    "=": "=",
+    "==": "=",
+    "!=": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+    "in": "IN",
+    "like": "LIKE",
+    "glob": "GLOB",
+}
+
+
+# Prefix of the columns of the fields, placeholders can be named like the
+# other columns (path, template)
+FIELD_PREFIX = "f_"
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _column(name):
+    """Return the quoted column of a placeholder"""
+    return _quote(FIELD_PREFIX + name)
+
+
+class Catalog(object):
+    """Catalog of (path, template, fields) stored in SQLite.
+
+    >>> catalog = Catalog("/prod/project/catalog.db", prodex_template)
+    >>> catalog.add(prodex_template.resolve(paths, discreet=True))
+    >>> for path, template, fields in catalog.query(
+    ...     templates=["houdini_asset_work_alembic_cache"],
+    ...     asset="foo",
+    ...     version=(">=", 10),
+    ... ):
+    ...     print(path)
+    """
+
+    def __init__(self, path, config):
+        super(Catalog, self).__init__()
+
+        self.path = str(path)
+        self._config = config
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._columns = []
+        self._create_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the database"""
+        self._connection.close()
+
+    def _create_schema(self):
+        """Create the table and one indexed column by placeholder (named
+        with :data:`FIELD_PREFIX`). Columns of new placeholders are added
+        to an existing catalog.
+        """
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS paths ("
+                "path TEXT PRIMARY KEY, template TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS paths_template "
+                "ON paths (template)"
+            )
+            existing = [
+                x[1]
+                for x in self._connection.execute("PRAGMA table_info(paths)")
+            ]
+            for name, placeholder in sorted(
+                self._config.placeholders.items()
+            ):
+                if FIELD_PREFIX + name not in existing:
+                    kind = (
+                        "INTEGER"
+                        if isinstance(placeholder, IntegerPlaceholder)
+                        else "TEXT"
+                    )
+                    self._connection.execute(
+                        "ALTER TABLE paths ADD COLUMN %s %s"
+                        % (_column(name), kind)
+                    )
+                # Template first, queries are mostly filtered by template.
+                # Partial index, a path only fills the columns of its
+                # template and NULL values cost nothing.
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS %s ON paths (template, %s) "
+                    "WHERE %s IS NOT NULL"
+                    % (
+                        _quote("paths_" + FIELD_PREFIX + name),
+                        _column(name),
+                        _column(name),
+                    )
+                )
+            # Placeholder names, without the prefix
+            self._columns = [
+                x[1][len(FIELD_PREFIX) :]
+                for x in self._connection.execute("PRAGMA table_info(paths)")
+                if x[1].startswith(FIELD_PREFIX)
+            ]
+
+    def add(self, results, **kwargs):
+        """Add (or update) results of a classification. Results are
+        inserted by batches, each batch in one transaction.
+
+        :param results: (path, template, fields) like
+        :func:`templates.ProdexTemplate.resolve` returns, paths can be
+        bytes. Unmatched paths (template is None) are removed from the
+        catalog.
+        :type results: iterable
+        :param batch_size: (kwargs) Number of results by transaction
+        :type batch_size: int
+        :return: The number of catalogued paths
+        :rtype: int
+        """
+        batch_size = kwargs.get("batch_size", BATCH_SIZE)
+        columns = ["path", "template"] + [
+            _column(x) for x in self._columns
+        ]
+        upsert = (
+            "INSERT INTO paths (%s) VALUES (%s) "
+            "ON CONFLICT(path) DO UPDATE SET %s"
+            % (
+                ", ".join(columns),
+                ", ".join("?" * len(columns)),
+                ", ".join("%s=excluded.%s" % (x, x) for x in columns[1:]),
+            )
+        )
+        count = 0
+        rows = []
+        removed = []
+        for path, template, fields in results:
+            path = os.fsdecode(path)
+            if template is None:
+                removed.append((path,))
+            else:
+                name = getattr(template, "name", template)
+                rows.append(
+                    [path, name] + [fields.get(x) for x in self._columns]
+                )
+                count += 1
+            if len(rows) + len(removed) >= batch_size:
+                self._write(upsert, rows, removed)
+                rows, removed = [], []
+        self._write(upsert, rows, removed)
+        if count >= batch_size:
+            # Bulk load, the query planner needs fresh statistics
+            self.optimize()
+        return count
+
+    def optimize(self):
+        """Update the statistics used by the query planner to choose the
+        most selective index.
+        """
+        with self._connection:
+            self._connection.execute("ANALYZE")
+
+    def _write(self, upsert, rows, removed):
+        with self._connection:
+            if rows:
+                self._connection.executemany(upsert, rows)
+            if removed:
+                self._connection.executemany(
+                    "DELETE FROM paths WHERE path = ?", removed
+                )
+
+    def update(self, paths, **kwargs):
+        """Classify the given paths again and update the catalog (changed
+        paths after a new crawl...).
+
+        :param paths: The paths to classify
+        :type paths: iterable
+        :return: The number of catalogued paths
+        :rtype: int
+        """
+        return self.add(self._config.resolve(paths, discreet=True), **kwargs)
+
+    def remove(self, paths):
+        """Remove paths from the catalog
+
+        :param paths: The paths to remove
+        :type paths: iterable
+        """
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM paths WHERE path = ?",
+                ((os.fsdecode(x),) for x in paths),
+            )
+
+    def query(self, templates=None, **predicates):
+        """Query the catalog. Results are streamed.
+
+        >>> catalog.query(templates=["maya_shot_work"], version=(">=", 10))
+
+        :param templates: Names of the templates, all if None
+        :type templates: list, optional
+        :param predicates: Placeholder name: value, or (operator, value).
+        Operators are =, !=, <, <=, >, >=, in, like and glob.
+        :type predicates: dict
+        :raises errors.ProdexTemplateError: If a predicate is not valid
+        :return: Generator of (path, template name, fields), not sorted
+        :rtype: generator
+        """
+        clauses = []
+        parameters = []
+        if templates is not None:
+            templates = list(templates)
+            clauses.append(
+                "template IN (%s)" % ", ".join("?" * len(templates))
+            )
+            parameters.extend(templates)
+        for name, predicate in predicates.items():
+            if name not in self._columns:
+                raise errors.ProdexTemplateError(
+                    "No placeholder %s in the catalog" % name
+                )
+            operator, value = "=", predicate
+            if isinstance(predicate, tuple):
+                operator, value = predicate
+            sql_operator = OPERATORS.get(str(operator).lower())
+            if not sql_operator:
+                raise errors.ProdexTemplateError(
+                    "Unknown operator %s" % operator
+                )
+            if sql_operator == "IN":
+                value = list(value)
+                clauses.append(
+                    "%s IN (%s)" % (_column(name), ", ".join("?" * len(value)))
+                )
+                parameters.extend(value)
+            else:
+                clauses.append("%s %s ?" % (_column(name), sql_operator))
+                parameters.append(value)
+            # Allows the partial index of the column to be used
+            clauses.append("%s IS NOT NULL" % _column(name))
+
+        sql = "SELECT %s FROM paths" % ", ".join(
+            ["path", "template"] + [_column(x) for x in self._columns]
+        )
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        cursor = self._connection.execute(sql, parameters)
+        for row in cursor:
+            fields = {
+                name: value
+                for name, value in zip(self._columns, row[2:])
+                if value is not None
+            }
+            yield row[0], row[1], fields
+
+    def count(self, templates=None):
+        """Count the catalogued paths
+
+        :param templates: Names of the templates, all if None
+        :type templates: list, optional
+        :return: The number of paths
+        :rtype: int
+        """
+        if templates is None:
+            sql, parameters = "SELECT COUNT(*) FROM paths", []
+        else:
+            templates = list(templates)
+            sql = "SELECT COUNT(*) FROM paths WHERE template IN (%s)" % (
+                ", ".join("?" * len(templates))
+            )
+            parameters = templates
+        return self._connection.execute(sql, parameters).fetchone()[0]
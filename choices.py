@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+#
+# - choices.py -
+#
+# Choices of the placeholders which come from outside of the configuration
+# (files, callables), loaded lazily and shared.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import csv
+import json
+import time
+import bisect
+import threading
+
+import errors
+from utils import filesystem as filesystems
+
+# Shared providers, key: provider
+_PROVIDERS = {}
+_LOCK = threading.Lock()
+
+
+class ChoicesProvider(object):
+    """Set of values loaded on the first use. Membership tests are O(1).
+    With a ttl, the values are checked again after ttl seconds.
+
+    A provider is always true, even when it has no value: a placeholder
+    with a provider only accepts the values of the provider.
+    """
+
+    def __init__(self, ttl=None, convert=None):
+        super(ChoicesProvider, self).__init__()
+
+        self.ttl = ttl
+        self._convert = convert
+        self._lock = threading.Lock()
+        self._values = None
+        self._sorted = None
+        self._expires = None
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.source)
+
+    def __bool__(self):
+        return True
+
+    def __contains__(self, value):
+        return value in self._check()
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def source(self):
+        """Return the source of the values
+
+        :rtype: str
+        """
+        raise NotImplementedError
+
+    @property
+    def values(self):
+        """Return the values, loaded or refreshed if needed
+
+        :rtype: frozenset
+        """
+        return self._check()
+
+    def startswith(self, prefix):
+        """Find the values which start with a prefix (string values only).
+        The sorted values are built on the first call.
+
+        :param prefix: The prefix
+        :type prefix: str
+        :return: The sorted values
+        :rtype: list
+        """
+        values = self.values
+        ordered = self._sorted
+        if ordered is None or ordered[0] is not values:
+            ordered = (values, sorted(str(x) for x in values))
+            self._sorted = ordered
+        ordered = ordered[1]
+        start = bisect.bisect_left(ordered, prefix)
+        end = start
+        while end < len(ordered) and ordered[end].startswith(prefix):
+            end += 1
+        return ordered[start:end]
+
+    def refresh(self):
+        """Check the source again on the next use"""
+        self._expires = 0.0
+
+    def _check(self):
+        expires = self._expires
+        if self._values is None or (
+            expires is not None and time.monotonic() > expires
+        ):
+            self._refresh()
+        return self._values
+
+    def _refresh(self):
+        with self._lock:
+            expires = self._expires
+            if self._values is not None and (
+                expires is None or time.monotonic() <= expires
+            ):
+                # Refreshed by another thread
+                return
+            values = self._load(self._values is None)
+            if values is not None:
+                if self._convert is not None:
+                    values = self._converted(values)
+                self._values = frozenset(values)
+            if self.ttl is not None:
+                self._expires = time.monotonic() + self.ttl
+            else:
+                self._expires = None
+
+    def _converted(self, values):
+        converted = []
+        for value in values:
+            try:
+                converted.append(self._convert(value))
+            except (TypeError, ValueError):
+                raise errors.ProdexTemplateError(
+                    "Invalid value %r in the choices of %s"
+                    % (value, self.source)
+                )
+        return converted
+
+    def _load(self, first):
+        """Get the values
+
+        :param first: True if nothing has been loaded yet
+        :type first: bool
+        :return: The values, None to keep the current values
+        :rtype: iterable
+        """
+        raise NotImplementedError
+
+
+class CallableChoices(ChoicesProvider):
+    """Values returned by a callable (a database query for example)
+
+    >>> asset = StringPlaceholder("asset", "str", choices=get_assets)
+    """
+
+    def __init__(self, function, ttl=None, convert=None):
+        super(CallableChoices, self).__init__(ttl=ttl, convert=convert)
+
+        self._function = function
+
+    @property
+    def source(self):
+        return getattr(self._function, "__qualname__", repr(self._function))
+
+    def _load(self, first):
+        return self._function()
+
+
+class FileChoices(ChoicesProvider):
+    """Values stored in a file. The format depends on the extension:
+
+    - ``.csv``: a column of a CSV file with a header, the first column
+      by default.
+    - ``.json``: a list of values, the keys of an object or a field
+      (column) of a list of objects.
+    - other extensions: a value by line, blank lines and lines starting by
+      # are ignored.
+
+    When the ttl expires, the file is read again only if it has been
+    modified.
+    """
+
+    def __init__(self, path, column=None, ttl=None, **kwargs):
+        super(FileChoices, self).__init__(
+            ttl=ttl, convert=kwargs.get("convert", None)
+        )
+
+        self.path = str(path)
+        self.column = column
+        self._filesystem = kwargs.get("filesystem", None)
+        self._filesystem = self._filesystem or filesystems.LOCAL_FILESYSTEM
+        self._mtime = None
+
+    @property
+    def source(self):
+        return self.path
+
+    def _load(self, first):
+        mtime = self._filesystem.mtime(self.path)
+        if not first and mtime is not None and mtime == self._mtime:
+            return None
+        try:
+            data = self._filesystem.read(self.path).decode("utf-8")
+        except OSError as error:
+            raise errors.ProdexTemplateError(
+                "Can't read the choices of %s: %s" % (self.path, error)
+            )
+        self._mtime = mtime
+        extension = self.path.rpartition(".")[-1].lower()
+        if extension == "csv":
+            return self._parse_csv(data)
+        if extension == "json":
+            return self._parse_json(data)
+        return [
+            x.strip()
+            for x in data.splitlines()
+            if x.strip() and not x.strip().startswith("#")
+        ]
+
+    def _parse_csv(self, data):
+        reader = csv.reader(io.StringIO(data))
+        header = next(reader, [])
+        index = 0
+        if self.column is not None:
+            if self.column not in header:
+                raise errors.ProdexTemplateError(
+                    "No column %s in %s" % (self.column, self.path)
+                )
+            index = header.index(self.column)
+        return [row[index] for row in reader if len(row) > index]
+
+    def _parse_json(self, data):
+        data = json.loads(data)
+        if isinstance(data, dict):
+            return list(data)
+        if self.column is None:
+            return data
+        return [x[self.column] for x in data if self.column in x]
+
+
+def file_choices(path, column=None, ttl=None, convert=None):
+    """Get the shared provider of a file. Every placeholder which uses the
+    same file (same column, ttl and conversion) shares the same values.
+
+    :param path: The absolute path of the file
+    :type path: str
+    :param column: The column (CSV) or the field (JSON), optional
+    :type column: str, optional
+    :param ttl: Seconds before checking the file again, optional
+    :type ttl: float, optional
+    :param convert: Conversion of the values (int for example), optional
+    :type convert: callable, optional
+    :return: The provider
+    :rtype: :class:`FileChoices`
+    """
+    key = ("file", str(path), column, ttl, convert)
+    with _LOCK:
+        provider = _PROVIDERS.get(key)
+        if provider is None:
+            provider = FileChoices(path, column, ttl, convert=convert)
+            _PROVIDERS[key] = provider
+        return provider
+
+
+def callable_choices(function, ttl=None, convert=None):
+    """Get the shared provider of a callable
+
+    :param function: The callable which returns the values
+    :type function: callable
+    :param ttl: Seconds before calling it again, optional
+    :type ttl: float, optional
+    :param convert: Conversion of the values (int for example), optional
+    :type convert: callable, optional
+    :return: The provider
+    :rtype: :class:`CallableChoices`
+    """
+    key = ("callable", function, ttl, convert)
+    with _LOCK:
+        provider = _PROVIDERS.get(key)
+        if provider is None:
+            provider = CallableChoices(function, ttl, convert=convert)
+            _PROVIDERS[key] = provider
+        return provider
+
+
+def as_container(choices):
+    """Get the container to test the membership of a value in the choices:
+    a frozenset for the static choices (a list or the keys of a dict)
+    which are hashable, else the choices themselves.
+
+    :param choices: The choices of a placeholder
+    :type choices: object
+    :return: The container
+    :rtype: object
+    """
+    if isinstance(choices, ChoicesProvider):
+        return choices
+    try:
+        return frozenset(choices)
+    except TypeError:
+        return choices
+
+
+def clear():
+    """Forget the shared providers"""
+    with _LOCK:
+        _PROVIDERS.clear()
@@ -0,0 +1,1016 @@
+# -*- coding: utf-8 -*-
+#
+# - cli.py -
+#
+# Command line entry point (prodex-template). Everything is streamed, so
+# millions of paths can be classified with a bounded memory.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import collections
+import tempfile
+import multiprocessing
+
+from templates import ProdexTemplate
+from engines import ENGINES_MAPPING
+from utils import templates_utils, filesystem
+import compiled
+import errors
+import exporters
+import sharding
+
+CONFIG_ENV = "PRODEX_TEMPLATE_CONFIG"
+CHUNK_SIZE = 512
+READ_SIZE = 65536
+
+# The config loaded by each worker process
+_worker_config = None
+
+
+def _read_records(stream, delimiter="\n"):
+    """Read records from a stream without loading the whole stream
+
+    :param stream: The text stream to read
+    :type stream: io.TextIOBase
+    :param delimiter: The records delimiter, defaults to "\\n"
+    :type delimiter: str, optional
+    :return: Generator of records (empty records are skipped)
+    :rtype: generator
+    """
+    if delimiter == "\n":
+        for line in stream:
+            line = line.rstrip("\r\n")
+            if line:
+                yield line
+        return
+    pending = ""
+    while True:
+        block = stream.read(READ_SIZE)
+        if not block:
+            break
+        records = (pending + block).split(delimiter)
+        pending = records.pop()
+        for record in records:
+            if record:
+                yield record
+    if pending:
+        yield pending
+
+
+def _chunks(records, size):
+    """Group records in lists of the given size
+
+    :param records: The records to group
+    :type records: iterable
+    :param size: The size of a chunk
+    :type size: int
+    :return: Generator of lists
+    :rtype: generator
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(artifact):
+    """Attach each worker process to the compiled configuration"""
+    global _worker_config
+    _worker_config = compiled.attach(artifact)
+
+
+def _resolve_chunk(paths, config=None, matched_only=False, any_site=False):
+    """Resolve a chunk of paths
+
+    :param paths: The paths to resolve
+    :type paths: list
+    :param config: The configuration to use, the one of the worker if None
+    :type config: :class:`ProdexTemplate`, optional
+    :param matched_only: Skip the paths without template, defaults to False
+    :type matched_only: bool, optional
+    :param any_site: Paths can be on any site, defaults to False
+    :type any_site: bool, optional
+    :return: The NDJSON lines and the counters of the match stages
+    :rtype: tuple
+    """
+    config = config or _worker_config
+    stats = collections.Counter()
+    lines = []
+    for path, template, fields in config.resolve(
+        paths, stats=stats, discreet=True, any_site=any_site
+    ):
+        if matched_only and not template:
+            continue
+        lines.append(
+            json.dumps(
+                {
+                    "path": os.fsdecode(path),
+                    "template": template.name if template else None,
+                    "fields": fields,
+                }
+            )
+        )
+    return lines, stats
+
+
+def _remap_chunk(paths, site, config=None):
+    """Translate a chunk of paths into paths of a site
+
+    :param paths: Paths of any site
+    :type paths: list
+    :param site: The name of the destination site
+    :type site: str
+    :param config: The configuration to use, the one of the worker if None
+    :type config: :class:`ProdexTemplate`, optional
+    :return: The translated paths and the counters
+    :rtype: tuple
+    """
+    config = config or _worker_config
+    stats = collections.Counter()
+    lines = []
+    for path, translated in config.sites.translate_many(
+        paths, site, discreet=True
+    ):
+        stats["paths"] += 1
+        if translated is None:
+            stats["errors"] += 1
+            sys.stderr.write("error: %s: can't be translated\n" % path)
+            continue
+        stats["translated"] += 1
+        lines.append(translated)
+    return lines, stats
+
+
+def _format_chunk(records, template_name=None, config=None):
+    """Generate paths from a chunk of NDJSON records
+
+    :param records: NDJSON records. A record is a dict with "template" and
+    "fields" keys, or only the fields if template_name is given.
+    :type records: list
+    :param template_name: The template to use for all records, optional
+    :type template_name: str
+    :param config: The configuration to use, the one of the worker if None
+    :type config: :class:`ProdexTemplate`, optional
+    :return: The generated paths and the counters
+    :rtype: tuple
+    """
+    config = config or _worker_config
+    stats = collections.Counter()
+    lines = []
+    for record in records:
+        stats["records"] += 1
+        try:
+            data = json.loads(record)
+            if not isinstance(data, dict):
+                raise errors.ProdexTemplateError("Not a JSON object")
+            if template_name:
+                name, fields = template_name, data
+            else:
+                name, fields = data.get("template"), data.get("fields", {})
+            if not isinstance(fields, dict):
+                raise errors.ProdexTemplateError(
+                    "The fields are not a JSON object"
+                )
+            template = config.templates.get(name)
+            if not template:
+                raise errors.ProdexTemplateError(
+                    "No template found for %s" % name
+                )
+            path = template.set_placeholders_values(placeholders=fields)
+            if path is None:
+                raise errors.ProdexTemplateMissingPlaceholders(
+                    "Required placeholders missing for %s" % name
+                )
+        except (TypeError, ValueError, errors.ProdexTemplateError) as error:
+            stats["errors"] += 1
+            sys.stderr.write("error: %s: %s\n" % (record, error))
+            continue
+        stats["formatted"] += 1
+        lines.append(str(path))
+    return lines, stats
+
+
+def _run(
+    function, chunks, jobs, config_path, engine, output, stats, **kwargs
+):
+    """Run the function on each chunk and write the results in order.
+    With several jobs, only a few chunks are in flight at the same time to
+    keep the memory bounded.
+
+    :param function: The function to apply on each chunk
+    :type function: callable
+    :param chunks: The chunks to process
+    :type chunks: iterable
+    :param jobs: The number of processes to use
+    :type jobs: int
+    :param config_path: The path of the configuration
+    :type config_path: str
+    :param engine: The matching engine of the templates
+    :type engine: str
+    :param output: The stream on which write the results
+    :type output: io.TextIOBase
+    :param stats: Counter updated with the counters of each chunk
+    :type stats: collections.Counter
+    """
+    if jobs <= 1:
+        config = ProdexTemplate(path=config_path, engine=engine)
+        for chunk in chunks:
+            lines, chunk_stats = function(chunk, config=config, **kwargs)
+            _write(output, lines)
+            stats.update(chunk_stats)
+        return
+
+    # The configuration is compiled once, workers only attach to it
+    temp_dir = tempfile.mkdtemp(prefix="prodex-template-")
+    try:
+        artifact = compiled.build(
+            ProdexTemplate(path=config_path, engine=engine),
+            os.path.join(temp_dir, "config.pxtc"),
+        )
+        _run_pool(function, chunks, jobs, artifact, output, stats, **kwargs)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _run_pool(function, chunks, jobs, artifact, output, stats, **kwargs):
+    pending = collections.deque()
+    with multiprocessing.Pool(
+        processes=jobs, initializer=_init_worker, initargs=(artifact,)
+    ) as pool:
+        for chunk in chunks:
+            pending.append(pool.apply_async(function, (chunk,), kwargs))
+            if len(pending) < jobs * 2:
+                continue
+            lines, chunk_stats = pending.popleft().get()
+            _write(output, lines)
+            stats.update(chunk_stats)
+        while pending:
+            lines, chunk_stats = pending.popleft().get()
+            _write(output, lines)
+            stats.update(chunk_stats)
+
+
+def _write(output, lines):
+    for line in lines:
+        output.write(line)
+        output.write("\n")
+
+
+def _open_input(path):
+    if path == "-":
+        return sys.stdin
+    return open(path, "r", errors="surrogateescape")
+
+
+def _write_stats(stats, elapsed):
+    """Write the counters and the throughput on stderr"""
+    count = stats.get("paths", 0) or stats.get("records", 0)
+    sys.stderr.write("elapsed: %.3fs\n" % elapsed)
+    sys.stderr.write(
+        "throughput: %.1f/s\n" % (count / elapsed if elapsed else 0.0)
+    )
+    for key in sorted(stats):
+        sys.stderr.write("%s: %d\n" % (key, stats[key]))
+
+
+def command_resolve(args, stats):
+    """Resolve paths from a file or stdin into NDJSON"""
+    stream = _open_input(args.input)
+    delimiter = "\0" if args.null else "\n"
+    chunks = _chunks(_read_records(stream, delimiter), args.chunk_size)
+    _run(
+        _resolve_chunk,
+        chunks,
+        args.jobs,
+        args.config,
+        args.engine,
+        sys.stdout,
+        stats,
+        any_site=args.any_site,
+    )
+    return 0
+
+
+def command_remap(args, stats):
+    """Translate paths from a file or stdin into paths of a site"""
+    stream = _open_input(args.input)
+    delimiter = "\0" if args.null else "\n"
+    chunks = _chunks(_read_records(stream, delimiter), args.chunk_size)
+    _run(
+        _remap_chunk,
+        chunks,
+        args.jobs,
+        args.config,
+        args.engine,
+        sys.stdout,
+        stats,
+        site=args.site,
+    )
+    return 0 if not stats.get("errors") else 1
+
+
+def command_format(args, stats):
+    """Generate paths from NDJSON fields"""
+    stream = _open_input(args.input)
+    chunks = _chunks(_read_records(stream), args.chunk_size)
+    _run(
+        _format_chunk,
+        chunks,
+        args.jobs,
+        args.config,
+        args.engine,
+        sys.stdout,
+        stats,
+        template_name=args.template,
+    )
+    return 0 if not stats.get("errors") else 1
+
+
+def command_scan(args, stats):
+    """Walk a directory and resolve everything found below it"""
+    root = os.fsencode(args.root) if args.bytes else args.root
+    chunks = _chunks(filesystem.LOCAL_FILESYSTEM.walk(root), args.chunk_size)
+    _run(
+        _resolve_chunk,
+        chunks,
+        args.jobs,
+        args.config,
+        args.engine,
+        sys.stdout,
+        stats,
+        matched_only=not args.all,
+    )
+    return 0
+
+
+def command_watch(args, stats):
+    """Classify the files written below the roots of the templates until
+    it is interrupted"""
+    # Imported here, the other commands don't need the watcher
+    from watcher import Watcher
+
+    config = ProdexTemplate(path=args.config, engine=args.engine)
+    watcher = Watcher(
+        config,
+        templates=args.template or None,
+        backend=args.backend,
+        debounce=args.debounce,
+        unmatched=args.all,
+    )
+    try:
+        while True:
+            for event in watcher.poll():
+                stats[event.event] += 1
+                sys.stdout.write(
+                    json.dumps(
+                        {
+                            "event": event.event,
+                            "path": event.path,
+                            "template": (
+                                event.template.name if event.template else None
+                            ),
+                            "fields": event.fields,
+                        }
+                    )
+                    + "\n"
+                )
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    return 0
+
+
+def command_export(args, stats):
+    """Print a template as a filter for external tools"""
+    config = ProdexTemplate(path=args.config)
+    template = config.templates.get(args.template)
+    if template is None:
+        raise errors.ProdexTemplateError(
+            "Template %s not found." % args.template
+        )
+    if args.format in ("glob", "like") and args.sql:
+        clause, patterns = exporters.sql_where(
+            template, column=args.column, operator=args.format.upper()
+        )
+        lines = [clause] + patterns
+    else:
+        lines = exporters.EXPORTERS_MAPPING[args.format](template)
+        if not isinstance(lines, list):
+            lines = [lines]
+    stats["patterns"] = len(lines)
+    for line in lines:
+        sys.stdout.write(line + "\n")
+    return 0
+
+
+def command_shard(args, stats):
+    """Resolve the paths of one shard of a scan or of a manifest into a
+    partial result file"""
+    config = ProdexTemplate(path=args.config, engine=args.engine)
+    sharder = sharding.Sharder(
+        args.count,
+        strategy=args.strategy,
+        depth=args.depth,
+        templates=list(config.templates.values()),
+    )
+    if not 0 <= args.index < args.count:
+        raise errors.ProdexTemplateError(
+            "The shard must be between 0 and %d" % (args.count - 1)
+        )
+    coverage = sharding.Coverage()
+    if args.root:
+        source = args.root
+        paths = sharder.walk(args.root, args.index, coverage)
+    else:
+        source = args.manifest
+        delimiter = "\0" if args.null else "\n"
+        paths = sharder.split(
+            _read_records(_open_input(args.manifest), delimiter),
+            args.index,
+            coverage,
+        )
+    # Written next to the output, renamed once complete
+    temp_path = args.output + ".part"
+    with open(temp_path, "w", errors="surrogateescape") as output:
+        output.write(sharding.header_line(sharder.header(args.index, source)))
+        _run(
+            _resolve_chunk,
+            _chunks(paths, args.chunk_size),
+            args.jobs,
+            args.config,
+            args.engine,
+            output,
+            stats,
+            matched_only=not args.all,
+        )
+        output.write(sharding.trailer_line(coverage))
+    os.replace(temp_path, args.output)
+    stats["decisions"] = coverage.seen
+    stats["owned"] = coverage.owned
+    return 0
+
+
+def command_merge_shards(args, stats):
+    """Merge the partial result files of all shards"""
+    summary = sharding.merge(args.partials, sys.stdout)
+    stats.update(summary)
+    return 0
+
+
+def command_diff(args, stats):
+    """Compare the configuration with a previous one"""
+    # Imported here, the other commands don't need the analysis
+    from impact import ConfigDiff
+
+    diff = ConfigDiff(
+        ProdexTemplate(path=args.previous), ProdexTemplate(path=args.config)
+    )
+    report = diff.to_dict()
+    for key in ("added", "removed", "changed"):
+        stats[key] = len(report[key])
+    sys.stdout.write(json.dumps(report, indent=4, sort_keys=True) + "\n")
+    return 0
+
+
+def command_reclassify(args, stats):
+    """Classify again the records of a previous classification which may
+    change with the configuration"""
+    from impact import ConfigDiff
+
+    diff = ConfigDiff(
+        ProdexTemplate(path=args.previous),
+        ProdexTemplate(path=args.config, engine=args.engine),
+    )
+    records = (json.loads(x) for x in _read_records(_open_input(args.input)))
+    mapping = ((x["path"], x.get("template")) for x in records)
+    for path, template, fields in diff.reclassify(mapping, stats=stats):
+        sys.stdout.write(
+            json.dumps(
+                {
+                    "path": path,
+                    "template": template.name if template else None,
+                    "fields": fields,
+                }
+            )
+            + "\n"
+        )
+    return 0
+
+
+def command_scaffold(args, stats):
+    """Create the directories of templates over sets of fields"""
+    from scaffold import Scaffold
+
+    config = ProdexTemplate(path=args.config)
+    scaffold = Scaffold(config, templates=args.template, jobs=args.threads)
+    fields = {}
+    for field in args.field or []:
+        name, _, values = field.partition("=")
+        fields[name] = values.split(",")
+    if args.fields:
+        for record in _read_records(_open_input(args.fields)):
+            field_set = dict(fields)
+            field_set.update(json.loads(record))
+            scaffold.add(field_set)
+    else:
+        scaffold.add(fields)
+    for name, count in scaffold.skipped.items():
+        sys.stderr.write(
+            "warning: %s: missing placeholders in %d sets of fields\n"
+            % (name, count)
+        )
+    if args.dry_run:
+        plan = scaffold.plan()
+        _write(sys.stdout, plan)
+        stats["planned"] = len(plan)
+        return 0
+    report = scaffold.create()
+    for path, error in report.pop("failed"):
+        stats["failed"] += 1
+        sys.stderr.write("error: %s: %s\n" % (path, error))
+    stats.update(report)
+    return 0 if not stats.get("failed") else 1
+
+
+def command_aggregate(args, stats):
+    """Group the classification results and reduce each group"""
+    from aggregate import Aggregator
+
+    try:
+        aggregator = Aggregator(
+            by=args.by,
+            reducers=args.reduce,
+            templates=args.template,
+            max_groups=args.max_groups,
+        )
+    except ValueError as error:
+        sys.stderr.write("error: %s\n" % error)
+        return 2
+    if args.root:
+        if not args.config:
+            sys.stderr.write("error: --config is required with --root\n")
+            return 2
+        config = ProdexTemplate(path=args.config, engine=args.engine)
+        walk = filesystem.LOCAL_FILESYSTEM.walk(args.root)
+        results = config.resolve(walk, stats=stats, discreet=True)
+    else:
+        records = (
+            json.loads(x) for x in _read_records(_open_input(args.input))
+        )
+        results = (
+            (x["path"], x.get("template"), x.get("fields") or {})
+            for x in records
+        )
+    aggregator.consume(results)
+    stats["groups"] = len(aggregator)
+    stats["skipped"] = aggregator.skipped
+    for result in aggregator.results():
+        sys.stdout.write(json.dumps(result) + "\n")
+    return 0
+
+
+def command_lint(args, stats):
+    """Estimate the cost of the templates and check it against maximums"""
+    import lint
+
+    costs = lint.analyze(ProdexTemplate(path=args.config))
+    thresholds = {}
+    for metric in lint.DEFAULT_THRESHOLDS:
+        limit = getattr(args, "max_" + metric)
+        if limit is not None:
+            thresholds[metric] = limit if limit >= 0 else None
+    violations = lint.check(costs, **thresholds)
+    stats["templates"] = len(costs)
+    stats["violations"] = len(violations)
+    report = {
+        "worst": [x.to_dict() for x in lint.worst(costs, args.top)],
+        "violations": [
+            {"template": name, "metric": metric, "value": value, "max": limit}
+            for name, metric, value, limit in violations
+        ],
+    }
+    if args.json:
+        sys.stdout.write(json.dumps(report, indent=4, sort_keys=True) + "\n")
+    else:
+        for cost in report["worst"]:
+            sys.stdout.write(
+                "%(score)6d %(name)s: %(variations)d variations, "
+                "%(adjacent)d adjacent, %(ambiguity)d ambiguous, "
+                "%(unanchored)d unanchored\n" % cost
+            )
+        for violation in report["violations"]:
+            sys.stdout.write(
+                "error: %(template)s: %(metric)s %(value)d > %(max)d\n"
+                % violation
+            )
+    return 1 if violations else 0
+
+
+def command_validate_config(args, stats):
+    """Load the configuration and check all templates"""
+    config = ProdexTemplate(path=args.config, profile=args.profile)
+    if args.profile:
+        sys.stderr.write(config.load_profile.report() + "\n")
+    problems = []
+    for name, template in config.templates.items():
+        placeholders = set(
+            templates_utils.find_placeholder(str(template.path))
+        )
+        missing = placeholders.difference(config.placeholders)
+        if missing:
+            problems.append(
+                "%s: undefined placeholders %s"
+                % (name, ", ".join(sorted(missing)))
+            )
+        stats["templates"] += 1
+        stats["definitions"] += len(template.definitions)
+    stats["placeholders"] = len(config.placeholders)
+    for problem in problems:
+        sys.stdout.write("%s\n" % problem)
+    if problems:
+        return 1
+    sys.stdout.write(
+        "%s: %d templates, %d placeholders\n"
+        % (args.config, stats["templates"], stats["placeholders"])
+    )
+    return 0
+
+
+def command_serve(args, stats):
+    """Run the resolver daemon until it is interrupted"""
+    # Imported here, the other commands don't need the daemon
+    from server import ProdexTemplateServer
+
+    server = ProdexTemplateServer(
+        args.socket, args.config, reload_interval=args.reload_interval
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def build_parser():
+    """Build the arguments parser of the command line
+
+    :return: The parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="prodex-template",
+        description="Resolve, format and scan paths with a template config.",
+    )
+    parser.add_argument(
+        "--config",
+        default=os.environ.get(CONFIG_ENV),
+        help="The root YAML config (default: $%s)" % CONFIG_ENV,
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes (default: 1)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="Number of records sent to a process at once",
+    )
+    parser.add_argument(
+        "--engine",
+        default="reference",
+        choices=sorted(ENGINES_MAPPING),
+        help="Matching engine of the templates (default: reference)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print the throughput and the match stages counters on stderr",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    resolve = subparsers.add_parser(
+        "resolve", help="Paths (one per line) to NDJSON template and fields"
+    )
+    resolve.add_argument("input", nargs="?", default="-")
+    resolve.add_argument(
+        "-0",
+        "--null",
+        action="store_true",
+        help="Paths are delimited by NUL characters",
+    )
+    resolve.add_argument(
+        "--any-site",
+        action="store_true",
+        help="Paths can be on any site of the sites section",
+    )
+    resolve.set_defaults(function=command_resolve)
+
+    remap = subparsers.add_parser(
+        "remap", help="Translate paths (one per line) into paths of a site"
+    )
+    remap.add_argument("site")
+    remap.add_argument("input", nargs="?", default="-")
+    remap.add_argument(
+        "-0",
+        "--null",
+        action="store_true",
+        help="Paths are delimited by NUL characters",
+    )
+    remap.set_defaults(function=command_remap)
+
+    format_ = subparsers.add_parser(
+        "format", help="NDJSON fields to paths (one per line)"
+    )
+    format_.add_argument("input", nargs="?", default="-")
+    format_.add_argument(
+        "--template",
+        help="Template to use, records are only fields in this case",
+    )
+    format_.set_defaults(function=command_format)
+
+    scan = subparsers.add_parser(
+        "scan", help="Resolve all directories and files below a root"
+    )
+    scan.add_argument("root")
+    scan.add_argument(
+        "--all", action="store_true", help="Also output unmatched paths"
+    )
+    scan.add_argument(
+        "--bytes",
+        action="store_true",
+        help="Match the bytes names, only the values found are decoded",
+    )
+    scan.set_defaults(function=command_scan)
+
+    watch = subparsers.add_parser(
+        "watch", help="Classify new files as NDJSON events until interrupted"
+    )
+    watch.add_argument(
+        "--template",
+        action="append",
+        help="Watch only this template (repeatable)",
+    )
+    watch.add_argument(
+        "--backend",
+        default="auto",
+        choices=["auto", "inotify", "polling"],
+        help="Source of the events (default: inotify on Linux)",
+    )
+    watch.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="Seconds without event before a batch is classified",
+    )
+    watch.add_argument(
+        "--all",
+        action="store_true",
+        help="Also output the files without template",
+    )
+    watch.set_defaults(function=command_watch)
+
+    export = subparsers.add_parser(
+        "export", help="Print a template as a regex, GLOB or LIKE filter"
+    )
+    export.add_argument("template")
+    export.add_argument(
+        "--format",
+        default="ere",
+        choices=sorted(exporters.EXPORTERS_MAPPING),
+        help="Dialect of the filter (default: ere, for find and grep -E)",
+    )
+    export.add_argument(
+        "--sql",
+        action="store_true",
+        help="Print a WHERE clause followed by its parameters",
+    )
+    export.add_argument(
+        "--column", default="path", help="Column used by the WHERE clause"
+    )
+    export.set_defaults(function=command_export)
+
+    shard = subparsers.add_parser(
+        "shard", help="Resolve one shard of a scan or of a manifest"
+    )
+    source = shard.add_mutually_exclusive_group(required=True)
+    source.add_argument("--root", help="Scan this directory")
+    source.add_argument(
+        "--manifest", help="Paths (one per line) of a file, - for stdin"
+    )
+    shard.add_argument("--index", type=int, required=True)
+    shard.add_argument("--count", type=int, required=True)
+    shard.add_argument(
+        "--strategy",
+        default="hash",
+        choices=sharding.STRATEGIES,
+        help="Partition by directory prefix or template subtree",
+    )
+    shard.add_argument(
+        "--depth",
+        type=int,
+        default=sharding.DEFAULT_DEPTH,
+        help="Number of directories of the hashed prefixes",
+    )
+    shard.add_argument(
+        "--output", required=True, help="The partial result file"
+    )
+    shard.add_argument(
+        "-0",
+        "--null",
+        action="store_true",
+        help="Paths of the manifest are delimited by NUL characters",
+    )
+    shard.add_argument(
+        "--all", action="store_true", help="Also output unmatched paths"
+    )
+    shard.set_defaults(function=command_shard)
+
+    merge = subparsers.add_parser(
+        "merge-shards",
+        help="Check the coverage and merge the partial result files",
+    )
+    merge.add_argument("partials", nargs="+")
+    merge.set_defaults(function=command_merge_shards, config_required=False)
+
+    diff = subparsers.add_parser(
+        "diff", help="Templates added, removed or changed since a config"
+    )
+    diff.add_argument("previous", help="The previous root YAML config")
+    diff.set_defaults(function=command_diff)
+
+    reclassify = subparsers.add_parser(
+        "reclassify",
+        help="Classify again the NDJSON records the config change affects",
+    )
+    reclassify.add_argument("previous", help="The previous root YAML config")
+    reclassify.add_argument("input", nargs="?", default="-")
+    reclassify.set_defaults(function=command_reclassify)
+
+    scaffold = subparsers.add_parser(
+        "scaffold", help="Create the directories of templates over fields"
+    )
+    scaffold.add_argument(
+        "--template",
+        action="append",
+        required=True,
+        help="Template of directories (repeatable)",
+    )
+    scaffold.add_argument(
+        "--field",
+        action="append",
+        help="NAME=VALUE[,VALUE...], combined with the other fields",
+    )
+    scaffold.add_argument(
+        "--fields", help="NDJSON sets of fields, - for stdin (optional)"
+    )
+    scaffold.add_argument(
+        "--threads",
+        type=int,
+        default=16,
+        help="Number of threads creating the directories",
+    )
+    scaffold.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the directories to create without creating them",
+    )
+    scaffold.set_defaults(function=command_scaffold)
+
+    aggregate = subparsers.add_parser(
+        "aggregate",
+        help="Group NDJSON results (resolve, scan) and reduce each group",
+    )
+    aggregate.add_argument("input", nargs="?", default="-")
+    aggregate.add_argument(
+        "--root", help="Scan this directory instead of reading results"
+    )
+    aggregate.add_argument(
+        "--by",
+        action="append",
+        default=[],
+        help="Placeholder to group by, after the template (repeatable)",
+    )
+    aggregate.add_argument(
+        "--reduce",
+        action="append",
+        help="Reducer: count, size, max:FIELD, min:FIELD or set:FIELD "
+        "(repeatable, defaults to count)",
+    )
+    aggregate.add_argument(
+        "--template", action="append", help="Only aggregate this template"
+    )
+    aggregate.add_argument(
+        "--max-groups",
+        type=int,
+        help="Fail if there are more groups, to bound the memory",
+    )
+    aggregate.set_defaults(function=command_aggregate, config_required=False)
+
+    lint = subparsers.add_parser(
+        "lint", help="Estimate the cost of the templates, for CI"
+    )
+    lint.add_argument(
+        "--top", type=int, default=10, help="The number of worst templates"
+    )
+    for metric in ("variations", "adjacent", "ambiguity", "unanchored"):
+        lint.add_argument(
+            "--max-" + metric,
+            type=int,
+            help="Maximum %s of a template, negative to not check" % metric,
+        )
+    lint.add_argument(
+        "--max-score",
+        type=int,
+        help="Maximum estimated cost of a template, negative to not check",
+    )
+    lint.add_argument("--json", action="store_true", help="Print JSON")
+    lint.set_defaults(function=command_lint)
+
+    validate = subparsers.add_parser(
+        "validate-config", help="Load and check the configuration"
+    )
+    validate.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the load time and allocations by phase on stderr",
+    )
+    validate.set_defaults(function=command_validate_config)
+
+    serve = subparsers.add_parser(
+        "serve", help="Run the resolver daemon on a Unix socket"
+    )
+    serve.add_argument("socket")
+    serve.add_argument(
+        "--reload-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between two checks of the config files",
+    )
+    serve.set_defaults(function=command_serve)
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the command line
+
+    :param argv: The arguments, sys.argv if None
+    :type argv: list, optional
+    :return: The exit code
+    :rtype: int
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.config and getattr(args, "config_required", True):
+        parser.error("--config is required (or set $%s)" % CONFIG_ENV)
+
+    stats = collections.Counter()
+    start = time.perf_counter()
+    try:
+        code = args.function(args, stats)
+    except errors.ProdexTemplateError as error:
+        sys.stderr.write("error: %s\n" % error)
+        code = 1
+    sys.stdout.flush()
+    if args.stats:
+        _write_stats(stats, time.perf_counter() - start)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
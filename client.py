@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+#
+# - client.py -
+#
+# Thin client of the resolver daemon (see server.py). It has the same API as
+# ProdexTemplate and doesn't import yaml nor load any configuration.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import socket
+import pathlib
+import threading
+
+from utils import framing
+import errors
+
+CHUNK_SIZE = 1024
+
+
+class ProdexTemplateClient(object):
+    """Client of a :class:`server.ProdexTemplateServer`.
+
+    >>> client = ProdexTemplateClient("/tmp/prodex.sock")
+    >>> client.template_from_path("/prod/project/shot/work/maya/foo.v003.ma")
+    >>> <RemoteTemplate maya_shot_work: /prod/project/shot/work/maya/...>
+    """
+
+    def __init__(self, socket_path, **kwargs):
+        super(ProdexTemplateClient, self).__init__()
+
+        self.socket_path = socket_path
+        self.timeout = kwargs.get("timeout", None)
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        """Connect to the daemon (done automatically by the first call)"""
+        if self._socket is not None:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._socket = sock
+
+    def close(self):
+        """Close the connection to the daemon"""
+        if self._socket is None:
+            return
+        self._socket.close()
+        self._socket = None
+
+    def call(self, op, **kwargs):
+        """Send a request to the daemon and wait for its response
+
+        :param op: The operation
+        :type op: str
+        :raises errors.ProdexTemplateError: (or any subclass) The error raised
+        by the daemon.
+        :return: The result of the operation
+        :rtype: object
+        """
+        kwargs["op"] = op
+        with self._lock:
+            self.connect()
+            try:
+                framing.send_frame(self._socket, kwargs)
+                response = framing.recv_frame(self._socket)
+            except OSError:
+                self.close()
+                raise
+            if response is None:
+                self.close()
+                raise errors.ProdexTemplateError(
+                    "Connection closed by the daemon"
+                )
+        if not response.get("ok"):
+            error_class = getattr(
+                errors, response.get("error", ""), errors.ProdexTemplateError
+            )
+            raise error_class(response.get("message"))
+        return response.get("result")
+
+    @property
+    def templates(self):
+        """Return all templates
+
+        :return: Dictionnary of all templates (key: template name)
+        (value: :class:`RemoteTemplate`)
+        :rtype: dict
+        """
+        return {
+            name: RemoteTemplate(
+                client=self, name=name, path=path, definitions=definitions
+            )
+            for name, (path, definitions) in self.call("templates").items()
+        }
+
+    def templates_from_path(self, path):
+        """Finds templates that matches the given path
+
+        :param path: The path to match against a template
+        :type path: str
+        :return: List of :class:`RemoteTemplate` or [] if no match could be
+        found.
+        :rtype: list
+        """
+        names = self.call("templates_from_path", paths=[str(path)])[0]
+        return [RemoteTemplate(client=self, name=name) for name in names]
+
+    def template_from_path(self, path):
+        """Finds a template that matches the given path
+
+        :param path: The path to match against a template
+        :type path: str
+        :return: :class:`RemoteTemplate` or None if no match could be found.
+        :rtype: :class:`RemoteTemplate`
+        """
+        matched_templates = self.templates_from_path(path)
+
+        if not matched_templates:
+            return None
+        elif len(matched_templates) == 1:
+            return matched_templates[0]
+        else:
+            # Multiple templates
+            raise errors.ProdexTemplateError(
+                "Multiple templates found: {}".format(matched_templates)
+            )
+
+    def resolve(self, paths, **kwargs):
+        """Resolve a stream of paths. Paths are sent by batches.
+
+        :param paths: The paths to resolve
+        :type paths: iterable
+        :param chunk_size: (kwargs) Number of paths sent in one request
+        :type chunk_size: int
+        :return: Generator of (path, template, fields). template is None if
+        no match could be found (or if multiple templates have been found).
+        :rtype: generator
+        """
+        chunk_size = kwargs.get("chunk_size", CHUNK_SIZE)
+        chunk = []
+        for path in paths:
+            chunk.append(str(path))
+            if len(chunk) >= chunk_size:
+                for result in self._resolve_chunk(chunk):
+                    yield result
+                chunk = []
+        if chunk:
+            for result in self._resolve_chunk(chunk):
+                yield result
+
+    def _resolve_chunk(self, paths):
+        results = self.call("resolve", paths=paths)
+        for path, (name, fields) in zip(paths, results):
+            template = RemoteTemplate(client=self, name=name) if name else None
+            yield path, template, fields
+
+
+class RemoteTemplate(object):
+    """A template living in the daemon. Same API as :class:`Template`."""
+
+    def __init__(self, client, name, path=None, definitions=None):
+        self._client = client
+        self._name = name
+        self._path = path
+        self._definitions = definitions
+
+    def __repr__(self):
+        return self._get_repr()
+
+    def __str__(self):
+        return self._get_repr()
+
+    def __eq__(self, other):
+        if not isinstance(other, RemoteTemplate):
+            return NotImplemented
+        return self._client is other._client and self._name == other._name
+
+    def __hash__(self):
+        return hash(self._name)
+
+    def _get_repr(self):
+        return "<%s %s: %s>" % (
+            self.__class__.__name__,
+            self._name,
+            self.path,
+        )
+
+    def _fetch(self):
+        self._path, self._definitions = self._client.call("templates")[
+            self._name
+        ]
+
+    @property
+    def name(self):
+        """Return the name of this template
+
+        :return: The name of this template
+        :rtype: str
+        """
+        return self._name
+
+    @property
+    def path(self):
+        """Return the default path (from the config file) of this template
+
+        :return: The path of this template
+        :rtype: pathlib.Path
+        """
+        if self._path is None:
+            self._fetch()
+        return pathlib.Path(self._path)
+
+    @property
+    def definitions(self):
+        """Return a copy of all definitions found for this template
+
+        :return: List of all definitions
+        :rtype: list
+        """
+        if self._definitions is None:
+            self._fetch()
+        return list(self._definitions)
+
+    def validate(self, path):
+        """Validate or not the given path.
+
+        :param path: The path to validate
+        :type path: str
+        :return: True if the path is correct for this template, False if not
+        :rtype: bool
+        """
+        return self.validate_many([path])[0]
+
+    def validate_many(self, paths):
+        """Validate a batch of paths in one request
+
+        :param paths: The paths to validate
+        :type paths: list
+        :return: A boolean for each path
+        :rtype: list
+        """
+        return self._client.call(
+            "validate", template=self._name, paths=[str(x) for x in paths]
+        )
+
+    def get_placeholders_values(self, path, **kwargs):
+        """Gets the placeholders values from the given path.
+
+        :param path: The input path
+        :type path: str
+        :param discreet: (kwargs) Raise errors, optional
+        :type discreet: bool
+        :returns: Values found in the path based on placeholders in template
+        :rtype: dict
+        """
+        return self._client.call(
+            "get_placeholders_values",
+            template=self._name,
+            paths=[str(path)],
+            discreet=kwargs.get("discreet", False),
+        )[0]
+
+    def set_placeholders_values(self, placeholders):
+        """Apply given placeholders to the current template in order
+        to generate a path.
+
+        :param placeholders: Placeholders to apply
+        :type placeholders: dict
+        :return: The generated path
+        :rtype: pathlib.Path
+        """
+        return self.set_placeholders_values_many([placeholders])[0]
+
+    def set_placeholders_values_many(self, placeholders):
+        """Generate a batch of paths in one request
+
+        :param placeholders: List of placeholders dict
+        :type placeholders: list
+        :return: The generated paths (None if a path can't be generated)
+        :rtype: list
+        """
+        paths = self._client.call(
+            "format", template=self._name, fields=list(placeholders)
+        )
+        return [pathlib.Path(x) if x is not None else None for x in paths]
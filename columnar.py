@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+#
+# - columnar.py -
+#
+# Columnar results of a batch resolution. Values are stored in compact arrays
+# and strings are dictionary encoded, which is much smaller than a dict by path.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import array
+
+from placeholders import IntegerPlaceholder
+
+# Value of a missing field
+MISSING_CODE = -1
+MISSING_INTEGER = -(2**63)
+
+
+class StringDictionary(object):
+    """Encode strings as integers. Each distinct string is stored once.
+
+    >>> dictionary = StringDictionary()
+    >>> dictionary.encode("foo")
+    >>> 0
+    >>> dictionary.decode(0)
+    >>> 'foo'
+    """
+
+    def __init__(self):
+        super(StringDictionary, self).__init__()
+
+        self._values = []
+        self._codes = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def values(self):
+        """Return a copy of all values (the index is the code)
+
+        :rtype: list
+        """
+        return list(self._values)
+
+    def encode(self, value):
+        """Get the code of a string (added if it is new)
+
+        :param value: The string to encode
+        :type value: str
+        :return: The code
+        :rtype: int
+        """
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+        return code
+
+    def decode(self, code):
+        """Get the string of a code
+
+        :param code: The code
+        :type code: int
+        :return: The string
+        :rtype: str
+        """
+        return self._values[code]
+
+
+class ColumnarResult(object):
+    """Results of a batch resolution stored by columns. There is one array
+    of template ids and one array by placeholder: string codes (see
+    :class:`StringDictionary`) or integers for :class:`IntegerPlaceholder`.
+
+    >>> result = resolve_columnar(prodex_template, paths)
+    >>> result.template_names[result.template_ids[0]]
+    >>> 'maya_shot_work'
+    >>> result.row(0)
+    >>> ('maya_shot_work', {'name': 'foo', 'version': 3, ...})
+    """
+
+    def __init__(self, config, **kwargs):
+        super(ColumnarResult, self).__init__()
+
+        self._placeholders = config.placeholders
+        self.dictionary = kwargs.get("dictionary", None) or StringDictionary()
+        self.template_names = []
+        self._template_ids = {}
+        self.template_ids = array.array("i")
+        self.columns = {}
+        self.paths = [] if kwargs.get("keep_paths", False) else None
+
+    def __len__(self):
+        return len(self.template_ids)
+
+    def _is_integer(self, name):
+        return isinstance(self._placeholders.get(name), IntegerPlaceholder)
+
+    def _add_column(self, name):
+        if self._is_integer(name):
+            column = array.array("q", [MISSING_INTEGER]) * len(self)
+        else:
+            column = array.array("i", [MISSING_CODE]) * len(self)
+        self.columns[name] = column
+        return column
+
+    def append(self, path, template, fields):
+        """Append a result
+
+        :param path: The resolved path
+        :type path: str
+        :param template: The template or None if the path is unmatched
+        :type template: :class:`templates.Template`
+        :param fields: The fields of the path
+        :type fields: dict
+        """
+        if template is None:
+            self.template_ids.append(MISSING_CODE)
+        else:
+            template_id = self._template_ids.get(template.name)
+            if template_id is None:
+                template_id = len(self.template_names)
+                self._template_ids[template.name] = template_id
+                self.template_names.append(template.name)
+            self.template_ids.append(template_id)
+        if self.paths is not None:
+            self.paths.append(path)
+
+        for name in fields:
+            if name not in self.columns:
+                column = self._add_column(name)
+                # The current row is appended below
+                column.pop()
+        for name, column in self.columns.items():
+            value = fields.get(name)
+            if value is None:
+                column.append(
+                    MISSING_INTEGER
+                    if column.typecode == "q"
+                    else MISSING_CODE
+                )
+            elif column.typecode == "q":
+                column.append(value)
+            else:
+                column.append(self.dictionary.encode(value))
+
+    def row(self, index):
+        """Decode a row
+
+        :param index: The index of the row
+        :type index: int
+        :return: (template name, fields), template name is None if the path
+        is unmatched.
+        :rtype: tuple
+        """
+        template_id = self.template_ids[index]
+        if template_id == MISSING_CODE:
+            return None, {}
+        fields = {}
+        for name, column in self.columns.items():
+            value = column[index]
+            if column.typecode == "q":
+                if value != MISSING_INTEGER:
+                    fields[name] = value
+            elif value != MISSING_CODE:
+                fields[name] = self.dictionary.decode(value)
+        return self.template_names[template_id], fields
+
+    def rows(self):
+        """Decode all rows
+
+        :return: Generator of (template name, fields)
+        :rtype: generator
+        """
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def nbytes(self):
+        """Return the size of the arrays (the dictionary is not included)
+
+        :rtype: int
+        """
+        size = self.template_ids.itemsize * len(self.template_ids)
+        for column in self.columns.values():
+            size += column.itemsize * len(column)
+        return size
+
+    def to_numpy(self):
+        """Convert the columns into a NumPy structured array. Columns are
+        the template id ("template") and one field by placeholder (codes
+        for strings). NumPy is required.
+
+        :return: The structured array and the dictionary values (the index
+        is the code)
+        :rtype: tuple
+        """
+        import numpy
+
+        dtype = [("template", numpy.int32)]
+        for name, column in self.columns.items():
+            dtype.append(
+                (name, numpy.int64 if column.typecode == "q" else numpy.int32)
+            )
+        data = numpy.empty(len(self), dtype=dtype)
+        data["template"] = numpy.frombuffer(self.template_ids, numpy.int32)
+        for name, column in self.columns.items():
+            data[name] = numpy.frombuffer(column, dtype=data.dtype[name])
+        return data, numpy.array(self.dictionary.values, dtype=object)
+
+
+def resolve_columnar(config, paths, **kwargs):
+    """Resolve a stream of paths into a :class:`ColumnarResult`
+
+    :param config: The configuration
+    :type config: :class:`templates.ProdexTemplate`
+    :param paths: The paths to resolve
+    :type paths: iterable
+    :param keep_paths: (kwargs) Keep the paths in the result
+    :type keep_paths: bool
+    :param dictionary: (kwargs) Dictionary shared with other results
+    :type dictionary: :class:`StringDictionary`
+    :param stats: (kwargs) Counter updated with the match stages
+    :type stats: collections.Counter
+    :return: The columnar result
+    :rtype: :class:`ColumnarResult`
+    """
+    result = ColumnarResult(
+        config,
+        keep_paths=kwargs.get("keep_paths", False),
+        dictionary=kwargs.get("dictionary", None),
+    )
+    for path, template, fields in config.resolve(
+        paths, stats=kwargs.get("stats", None), discreet=True
+    ):
+        result.append(path, template, fields)
+    return result
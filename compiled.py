@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+#
+# - compiled.py -
+#
+# Flat compiled form of a configuration. The artifact is built once and worker
+# processes attach to it (memory mapped) instead of parsing YAML again.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import mmap
+import struct
+import marshal
+import pathlib
+
+import errors
+from utils import codegen
+
+MAGIC = b"PXTC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">4sHH")
+
+
+def build(config, path):
+    """Build the compiled artifact of a configuration. The configuration
+    is attached to the artifact, so it will be pickled by reference.
+
+    >>> config = ProdexTemplate("/prod/project/template.yml")
+    >>> build(config, "/tmp/project.pxtc")
+    >>> pool = multiprocessing.Pool(64, initializer=work, initargs=(config,))
+
+    :param config: The configuration to compile
+    :type config: :class:`templates.ProdexTemplate`
+    :param path: The path of the artifact
+    :type path: str
+    :raises errors.ProdexTemplateError: If the configuration contains values
+    which can't be compiled.
+    :return: The path of the artifact
+    :rtype: str
+    """
+    content = dict(config._content)
+    includes = [str(x) for x in config.includes]
+    content["includes"] = includes
+    mtimes = {}
+    for include in includes:
+        try:
+            mtimes[include] = os.stat(include).st_mtime_ns
+        except OSError:
+            mtimes[include] = None
+
+    data = {
+        "config": str(config.template_path),
+        "mtimes": mtimes,
+        "content": content,
+        "engine": config.engine,
+        "definitions": {
+            name: template.definitions
+            for name, template in config.templates.items()
+        },
+        # Generated matching functions, see engines.CodegenEngine
+        "code": {
+            template._engine.digest: template._engine.code
+            for template in config.templates.values()
+            if getattr(template._engine, "code", None) is not None
+        },
+    }
+    try:
+        payload = marshal.dumps(data)
+    except ValueError as error:
+        raise errors.ProdexTemplateError(
+            "The configuration can't be compiled: %s" % error
+        )
+
+    path = str(path)
+    temp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version))
+        f.write(payload)
+    # Workers never see a partially written artifact
+    os.replace(temp_path, path)
+    config._artifact = path
+    return path
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, marshal_version = HEADER.unpack_from(mapped)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise errors.ProdexTemplateError(
+                    "%s is not a compiled configuration" % path
+                )
+            if marshal_version != marshal.version:
+                raise errors.ProdexTemplateError(
+                    "%s has been compiled by another Python version" % path
+                )
+            view = memoryview(mapped)
+            try:
+                return marshal.loads(view[HEADER.size :])
+            finally:
+                view.release()
+
+
+def is_stale(path):
+    """Check if one of the config files changed since the artifact has
+    been built.
+
+    :param path: The path of the artifact
+    :type path: str
+    :return: True if the artifact must be built again
+    :rtype: bool
+    """
+    try:
+        data = _read(path)
+    except (OSError, ValueError, EOFError, errors.ProdexTemplateError):
+        return True
+    for include, mtime in data["mtimes"].items():
+        try:
+            if os.stat(include).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            if mtime is not None:
+                return True
+    return False
+
+
+def attach(path, **kwargs):
+    """Get the configuration from a compiled artifact. Neither the YAML
+    files nor the definitions variations are parsed again.
+
+    :param path: The path of the artifact
+    :type path: str
+    :param adaptive: (kwargs) Use an adaptive lookup, its ordering is
+    persisted next to the artifact (see :mod:`adaptive`), optional
+    :type adaptive: bool
+    :raises errors.ProdexTemplateError: If the file is not a compiled
+    configuration.
+    :return: The configuration
+    :rtype: :class:`templates.ProdexTemplate`
+    """
+    # Imported here, templates.py imports this module to unpickle configs
+    from templates import ProdexTemplate
+
+    data = _read(path)
+    # The generated functions are not compiled again
+    codegen.CODE_CACHE.update(data.get("code", {}))
+    content = data["content"]
+    content["includes"] = [pathlib.Path(x) for x in content["includes"]]
+    return ProdexTemplate(
+        path=data["config"],
+        content=content,
+        definitions=data["definitions"],
+        engine=data.get("engine", "reference"),
+        artifact=str(path),
+        adaptive=kwargs.get("adaptive", False),
+    )
+
+
+def load(config_path, path):
+    """Attach to the artifact, build it before if it is missing or stale
+
+    :param config_path: The path of the config file
+    :type config_path: str
+    :param path: The path of the artifact
+    :type path: str
+    :return: The configuration
+    :rtype: :class:`templates.ProdexTemplate`
+    """
+    if is_stale(path):
+        from templates import ProdexTemplate
+
+        config = ProdexTemplate(path=config_path)
+        build(config, path)
+        return config
+    return attach(path)
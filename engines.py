@@ -0,0 +1,626 @@
+# -*- coding: utf-8 -*-
+#
+# - engines.py -
+#
+# Matching engines of the templates. The reference engine is the original
+# algorithm, other engines must give exactly the same results.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import re
+import pathlib
+
+import errors
+from utils import templates_utils, codegen
+
+
+class ReferenceEngine(object):
+    """The original matching algorithm. Placeholders values are found from
+    the end of the path with ``rpartition`` on the static parts. It is the
+    reference for the other engines, see harness.py. Bytes paths are
+    decoded with :func:`os.fsdecode`."""
+
+    name = "reference"
+
+    def __init__(self, template):
+        super(ReferenceEngine, self).__init__()
+
+        self._template = template
+
+    def validate(self, path, **kwargs):
+        """Validate or not the given path.
+
+        :param path: The path to validate
+        :type path: str or bytes
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :return: True if the path is correct for this template, False if not
+        :rtype: bool
+        """
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        template = self._template
+        stats = kwargs.get("stats", None)
+        if stats is not None:
+            stats["tested"] += 1
+        # 1. Check if the number of parts in the given path correspond
+        # to the number of parts for an existing definition for this template
+        if not templates_utils.parts_matching(
+            path=path, definitions=template.definitions
+        ):
+            if stats is not None:
+                stats["rejected_parts"] += 1
+            return False
+
+        # 2. Try to resolve placeholders. If we found something, the path is
+        # correct, if not, the path doesn't fit the template.
+        resolved_placeholders = self.get_placeholders_values(
+            path=path, discreet=True
+        )
+        if not resolved_placeholders:
+            if stats is not None:
+                stats["rejected_values"] += 1
+            return False
+
+        # 3. Be sure that we can generate the same path
+        # with the resolved placeholders (ensure the paths are equals)
+        match = False
+        template._conform_input_placeholders(
+            placeholders=resolved_placeholders
+        )
+        for definition in template.definitions:
+            _path = template._set_placeholders_values(
+                definition=definition, placeholders=resolved_placeholders
+            )
+            if str(_path) == path:
+                match = True
+        if stats is not None:
+            stats["matched" if match else "rejected_format"] += 1
+        return match
+
+    def get_placeholders_values(self, path, **kwargs):
+        """Gets the placeholders values from the given path.
+
+        :param path: The input path
+        :type path: str or bytes
+        :param discreet: (kwargs) Raise errors, optional
+        :type discreet: bool
+        :returns: Values found Values in the path based on placeholders in template
+        :rtype: dict
+        """
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        template = self._template
+        discreet = kwargs.get("discreet", False)  # False: raise errors
+        error = None
+        # loop through all definitions
+        for definition in template.definitions:
+            resolved = {}  # All resolved placeholders
+            _definition = definition
+            _path = path
+            static_parts = templates_utils.find_static_parts(
+                definition=definition
+            )
+            static_parts.reverse()
+
+            if static_parts[0] not in template.placeholders:
+                static_part = static_parts[0]
+                # The first static_part is not a placeholder. So, transform the path
+                # and the definition in order to start by a placeholder
+                _path = path.rpartition(static_part)[0]
+                _definition = templates_utils.decompose_definition(
+                    definition=definition, static_part=static_part
+                )[0]
+                # Remove the first static_part because we want to start
+                # by a placeholder
+                static_parts = static_parts[1::]
+
+            static_parts = [
+                x for x in static_parts if x not in template.placeholders
+            ]
+            for static_part in static_parts:
+                path_decompose = _path.rpartition(static_part)
+                definition_decompose = templates_utils.decompose_definition(
+                    definition=_definition, static_part=static_part
+                )
+
+                key = definition_decompose[-1]
+                value = path_decompose[-1]
+
+                placeholder_obj = template.placeholders.get(key.strip("{}"))
+                if not placeholder_obj.validate(value):
+                    # The value is not conform for the given placeholder
+                    error = errors.ProdexTemplatePlaceholderValidation(
+                        "The value {0} is not conform for the placeholder {1}".format(
+                            value, placeholder_obj.name
+                        )
+                    )
+                    break
+
+                # All values are empty
+                if len(set(path_decompose)) == 1:
+                    # path and static_part are not synchronized,
+                    # so it is not the path what we are looking for
+                    error = errors.ProdexTemplatePathSync(
+                        "Path and the static_part aren't synchronised anymore"
+                    )
+                    break
+
+                if placeholder_obj.name in resolved:
+                    # already analysed, check that the value is the same
+                    _value = resolved.get(placeholder_obj.name)
+                    value = placeholder_obj.sanitize_value(value)
+                    if value != _value:
+                        error = errors.ProdexTemplatePlaceholderMultipleValues(
+                            "Got two differents values for the {0} [{1}, {2}]".format(
+                                placeholder_obj.name, _value, value
+                            )
+                        )
+                        break
+                else:
+                    error = None
+                    resolved[
+                        placeholder_obj.name
+                    ] = placeholder_obj.sanitize_value(value)
+
+                _path = path_decompose[0]
+                _definition = definition_decompose[0]
+
+            placeholders = list(
+                set(templates_utils.find_placeholder(definition))
+            )
+            if len(placeholders) == len(resolved) and not error:
+                # find all possible values.
+                return resolved
+            else:
+                resolved = {}
+        if not discreet:
+            if error is None:
+                # No definition fits the path, but no value was refused
+                error = errors.ProdexTemplatePathSync(
+                    "The path doesn't correspond to any definition"
+                )
+            raise error
+        return resolved
+
+
+class _Variation(object):
+    """Everything the compiled engine needs about a definition variation.
+    Only the path side of the reference algorithm is left for the match."""
+
+    def __init__(self, definition, placeholders):
+        super(_Variation, self).__init__()
+
+        self.definition = definition
+        self.parts = len(pathlib.Path(definition).parts)
+        self.expected = len(set(templates_utils.find_placeholder(definition)))
+        # Formatter: literals and placeholder names alternate. None when
+        # the definition has braces which are not placeholders, format_map
+        # is used for those ones.
+        self.tokens = re.split(r"{(\w+)}", definition)
+        if any("{" in x or "}" in x for x in self.tokens[::2]):
+            self.tokens = None
+        self._placeholders = placeholders
+        self._plan = None
+        self._encoded_plan = None
+
+    @property
+    def plan(self):
+        """The static parts to partition on, with the placeholder found at
+        their right. It is computed like the reference does, on the first
+        use only (the definition side doesn't depend on the path).
+
+        :return: The static part at the end of the definition (or None) and
+        the list of (static part, placeholder name)
+        :rtype: tuple
+        """
+        if self._plan is not None:
+            return self._plan
+        placeholders = self._placeholders
+        definition = self.definition
+        tail = None
+        static_parts = templates_utils.find_static_parts(
+            definition=definition
+        )
+        static_parts.reverse()
+        if static_parts[0] not in placeholders:
+            tail = static_parts[0]
+            definition = templates_utils.decompose_definition(
+                definition=definition, static_part=tail
+            )[0]
+            static_parts = static_parts[1::]
+        steps = []
+        for static_part in static_parts:
+            if static_part in placeholders:
+                continue
+            decompose = templates_utils.decompose_definition(
+                definition=definition, static_part=static_part
+            )
+            steps.append((static_part, decompose[-1].strip("{}")))
+            definition = decompose[0]
+        self._plan = (tail, steps)
+        return self._plan
+
+    @property
+    def encoded_plan(self):
+        """The plan with the static parts encoded with :func:`os.fsencode`,
+        to partition bytes paths.
+
+        :rtype: tuple
+        """
+        if self._encoded_plan is None:
+            tail, steps = self.plan
+            self._encoded_plan = (
+                os.fsencode(tail) if tail is not None else None,
+                [(os.fsencode(x), key) for x, key in steps],
+            )
+        return self._encoded_plan
+
+    def format(self, values, template):
+        """Generate the path of this variation like
+        :meth:`templates.Template._set_placeholders_values`
+
+        :param values: Conformed placeholders values
+        :type values: dict
+        :param template: The template of this variation
+        :type template: :class:`templates.Template`
+        :return: The generated path, None if a placeholder is missing
+        :rtype: str
+        """
+        if self.tokens is None:
+            return template._set_placeholders_values(
+                definition=self.definition, placeholders=values
+            )
+        tokens = self.tokens
+        chunks = [tokens[0]]
+        for index in range(1, len(tokens), 2):
+            value = values.get(tokens[index])
+            if value is None and tokens[index] not in values:
+                return None
+            chunks.append(format(value))
+            chunks.append(tokens[index + 1])
+        path = "".join(chunks)
+        if "{" in path and templates_utils.find_placeholder(path):
+            return None
+        return path
+
+
+def _count_parts(path):
+    """Count the parts of a bytes path like ``pathlib.PurePosixPath``: the
+    root is a part, the empty and ``.`` components are not.
+
+    :param path: The path
+    :type path: bytes
+    :rtype: int
+    """
+    parts = [x for x in path.split(b"/") if x and x != b"."]
+    return len(parts) + path.startswith(b"/")
+
+
+class CompiledEngine(object):
+    """Same results as the reference engine, with the work which doesn't
+    depend on the path done once per template:
+
+    - a regex made of all variations (placeholders match anything) rejects
+      the paths which can't be formatted by the template, before anything
+      else. Most of the paths tested against a template are rejected here.
+    - the static parts and placeholders to partition on are precomputed
+      for each variation.
+    - the placeholders are not copied for each access.
+
+    Bytes paths (``os.scandir`` of a bytes directory) are matched as bytes,
+    the prefilter and the static parts are encoded with :func:`os.fsencode`.
+    Only the values found are decoded, with :func:`os.fsdecode`, so names
+    which aren't valid in the filesystem encoding are matched too (their
+    values keep the undecodable bytes as surrogates).
+    """
+
+    name = "compiled"
+
+    def __init__(self, template):
+        super(CompiledEngine, self).__init__()
+
+        self._template = template
+        self._placeholders = template.placeholders
+        self._variations = [
+            _Variation(x, self._placeholders) for x in template.definitions
+        ]
+        self._parts = frozenset(x.parts for x in self._variations)
+        self._prefilter = self._compile_prefilter()
+        self._encoded_prefilter = None
+
+    def _compile_prefilter(self):
+        """Compile the regex matching every path the template could format.
+        A path which doesn't match can't be validated by the reference.
+
+        :return: The compiled regex or None if it can't be built
+        :rtype: re.Pattern
+        """
+        for variation in self._variations:
+            tail, steps = variation.plan
+            if any(x[1] not in self._placeholders for x in steps):
+                # Adjacent or undefined placeholders: the reference fails
+                # on some paths, let it fail the same way
+                return None
+        patterns = []
+        for variation in self._variations:
+            if variation.tokens is None:
+                # format_map escaping rules, don't try to mimic them
+                return None
+            pattern = ""
+            for index, token in enumerate(variation.tokens):
+                pattern += re.escape(token) if index % 2 == 0 else ".*"
+            patterns.append(pattern)
+        return re.compile("(?s:%s)" % "|".join(patterns))
+
+    @property
+    def encoded_prefilter(self):
+        """The prefilter of the bytes paths, compiled on the first use
+
+        :rtype: re.Pattern
+        """
+        if self._encoded_prefilter is None and self._prefilter is not None:
+            self._encoded_prefilter = re.compile(
+                os.fsencode(self._prefilter.pattern)
+            )
+        return self._encoded_prefilter
+
+    def validate(self, path, **kwargs):
+        """Validate or not the given path.
+
+        :param path: The path to validate
+        :type path: str or bytes
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :return: True if the path is correct for this template, False if not
+        :rtype: bool
+        """
+        stats = kwargs.get("stats", None)
+        if stats is not None:
+            stats["tested"] += 1
+        encoded = isinstance(path, bytes)
+        prefilter = self.encoded_prefilter if encoded else self._prefilter
+        if prefilter is not None and not prefilter.fullmatch(path):
+            if stats is not None:
+                stats["rejected_prefilter"] += 1
+            return False
+        if encoded:
+            parts = _count_parts(path)
+        else:
+            parts = len(pathlib.Path(path).parts)
+        if parts not in self._parts:
+            if stats is not None:
+                stats["rejected_parts"] += 1
+            return False
+
+        if encoded:
+            resolved = self._partition(path, True)[0]
+        else:
+            resolved = self._resolve(path)[0]
+        if not resolved:
+            if stats is not None:
+                stats["rejected_values"] += 1
+            return False
+
+        match = self._roundtrip(resolved, path)
+        if stats is not None:
+            stats["matched" if match else "rejected_format"] += 1
+        return match
+
+    def _roundtrip(self, resolved, path):
+        """Check that a variation generates the path with the values
+
+        :param resolved: The resolved values
+        :type resolved: dict
+        :param path: The path
+        :type path: str or bytes
+        :return: True if the path is generated again
+        :rtype: bool
+        """
+        values = self._conform(resolved)
+        encoded = isinstance(path, bytes)
+        for variation in self._variations:
+            # str() like the reference, a missing placeholder gives None
+            generated = str(variation.format(values, self._template))
+            if encoded:
+                generated = os.fsencode(generated)
+            if generated == path:
+                return True
+        return False
+
+    def get_placeholders_values(self, path, **kwargs):
+        """Gets the placeholders values from the given path.
+
+        :param path: The input path
+        :type path: str or bytes
+        :param discreet: (kwargs) Raise errors, optional
+        :type discreet: bool
+        :returns: Values found Values in the path based on placeholders in template
+        :rtype: dict
+        """
+        if isinstance(path, bytes):
+            resolved, error = self._partition(path, True)
+        else:
+            resolved, error = self._resolve(path)
+        if resolved is not None:
+            return resolved
+        if kwargs.get("discreet", False):
+            return {}
+        if error is None:
+            error = errors.ProdexTemplatePathSync(
+                "The path doesn't correspond to any definition"
+            )
+        raise error
+
+    def _resolve(self, path):
+        """Find the placeholders values with the first variation which
+        resolves all its placeholders.
+
+        :param path: The input path
+        :type path: str
+        :return: The values (None if nothing fits) and the last error
+        :rtype: tuple
+        """
+        return self._partition(path, False)
+
+    def _partition(self, path, encoded):
+        """Partition the path on the static parts of each variation, see
+        :meth:`_resolve`.
+
+        :param path: The input path
+        :type path: str or bytes
+        :param encoded: The path is bytes, only the values are decoded
+        :type encoded: bool
+        :return: The values (None if nothing fits) and the last error
+        :rtype: tuple
+        """
+        placeholders = self._placeholders
+        error = None
+        for variation in self._variations:
+            resolved = {}
+            tail, steps = variation.encoded_plan if encoded else variation.plan
+            _path = path
+            if tail is not None:
+                _path = path.rpartition(tail)[0]
+            for static_part, key in steps:
+                head, separator, raw = _path.rpartition(static_part)
+                value = os.fsdecode(raw) if encoded else raw
+                placeholder_obj = placeholders.get(key)
+                if not placeholder_obj.validate(value):
+                    error = errors.ProdexTemplatePlaceholderValidation(
+                        "The value {0} is not conform for the placeholder {1}".format(
+                            value, placeholder_obj.name
+                        )
+                    )
+                    break
+                if head == separator == raw:
+                    error = errors.ProdexTemplatePathSync(
+                        "Path and the static_part aren't synchronised anymore"
+                    )
+                    break
+                name = placeholder_obj.name
+                value = placeholder_obj.sanitize_value(value)
+                if name in resolved:
+                    if value != resolved[name]:
+                        error = errors.ProdexTemplatePlaceholderMultipleValues(
+                            "Got two differents values for the {0} [{1}, {2}]".format(
+                                name, resolved[name], value
+                            )
+                        )
+                        break
+                else:
+                    error = None
+                    resolved[name] = value
+                _path = head
+            if len(resolved) == variation.expected and not error:
+                return resolved, error
+        return None, error
+
+    def _conform(self, resolved):
+        """Conform the values like
+        :meth:`templates.Template._conform_input_placeholders`
+
+        :param resolved: The resolved values
+        :type resolved: dict
+        :return: The conformed values, defaults included
+        :rtype: dict
+        """
+        placeholders = self._placeholders
+        values = dict(resolved)
+        for key, value in resolved.items():
+            if key in placeholders:
+                values[key] = placeholders[key].conform_value(value)
+        for key, placeholder in placeholders.items():
+            if key not in resolved and placeholder.default:
+                values[key] = placeholder.default
+        return values
+
+
+class CodegenEngine(CompiledEngine):
+    """Same results as the reference engine, with Python functions
+    generated for the template (see utils/codegen.py): literals are found
+    with ``startswith``, ``find`` and ``endswith``, the partitions are
+    unrolled with inline checks of the integers and the choices, and the
+    paths are formatted with f-strings. The source is compiled once, the
+    code is shared by the identical templates and kept by the compiled
+    artifacts.
+
+    Templates which can't be prefiltered (see :class:`CompiledEngine`) use
+    the compiled engine.
+    """
+
+    name = "codegen"
+
+    def __init__(self, template):
+        super(CodegenEngine, self).__init__(template)
+
+        self.source = None
+        self.digest = None
+        self.code = None
+        self._match = None
+        if self._prefilter is None:
+            return
+        if any(x.name != k for k, x in self._placeholders.items()):
+            return
+        self.source, namespace = codegen.generate(
+            self._variations, self._placeholders
+        )
+        namespace["_roundtrip"] = super(CodegenEngine, self)._roundtrip
+        self.digest, self.code = codegen.compile_source(self.source)
+        exec(self.code, namespace)
+        self._match = namespace["match"]
+        self._resolve = namespace["resolve"]
+
+    def validate(self, path, **kwargs):
+        """Validate or not the given path.
+
+        :param path: The path to validate
+        :type path: str
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :return: True if the path is correct for this template, False if not
+        :rtype: bool
+        """
+        if self._match is None:
+            return super(CodegenEngine, self).validate(path, **kwargs)
+        stats = kwargs.get("stats", None)
+        if isinstance(path, bytes):
+            # The generated code works on str: the few paths the encoded
+            # prefilter doesn't reject are decoded
+            if not self.encoded_prefilter.fullmatch(path):
+                if stats is not None:
+                    stats["tested"] += 1
+                    stats["rejected_prefilter"] += 1
+                return False
+            path = os.fsdecode(path)
+        stage = self._match(path)
+        if stats is not None:
+            stats["tested"] += 1
+            stats[codegen.STAGES[stage]] += 1
+        return not stage
+
+
+ENGINES_MAPPING = {
+    ReferenceEngine.name: ReferenceEngine,
+    CompiledEngine.name: CompiledEngine,
+    CodegenEngine.name: CodegenEngine,
+}
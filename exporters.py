@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+#
+# - exporters.py -
+#
+# Export of the templates as filters for external tools: regex for find and
+# grep, GLOB and LIKE patterns for SQL databases.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import re
+
+from placeholders import IntegerPlaceholder
+import choices
+import errors
+
+# Static choices are exported as an alternation up to this number of values
+MAX_CHOICES = 100
+
+ERE_SPECIALS = frozenset(".[]()*+?{}|^$\\")
+GLOB_SPECIALS = frozenset("*?[")
+
+
+def _tokens(template):
+    """Split the variations of a template into literals and placeholders
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    :raises errors.ProdexTemplateError: If a definition has braces which
+    are not placeholders.
+    :return: For each variation, the literals and the placeholder names
+    alternate (the first and the last ones are literals)
+    :rtype: list
+    """
+    variations = []
+    for definition in template.definitions:
+        tokens = re.split(r"{(\w+)}", definition)
+        if any("{" in x or "}" in x for x in tokens[::2]):
+            raise errors.ProdexTemplateError(
+                "%s can't be exported: %s" % (template.name, definition)
+            )
+        variations.append(tokens)
+    return variations
+
+
+def _static_choices(placeholder):
+    if isinstance(placeholder.choices, choices.ChoicesProvider):
+        return None
+    values = list(placeholder.choices or [])
+    if not values or len(values) > MAX_CHOICES:
+        return None
+    return [str(placeholder.conform_value(x)) for x in values]
+
+
+def _digits(placeholder):
+    """Minimum number of digits of an integer placeholder, None for the
+    other placeholders"""
+    if not isinstance(placeholder, IntegerPlaceholder):
+        return None
+    return max(int(placeholder.format_spec or 1), 1)
+
+
+def _escape_ere(text):
+    return "".join("\\" + x if x in ERE_SPECIALS else x for x in text)
+
+
+def _escape_glob(text):
+    return "".join("[%s]" % x if x in GLOB_SPECIALS else x for x in text)
+
+
+def _escape_like(text, escape="\\"):
+    return "".join(
+        escape + x if x in ("%", "_", escape) else x for x in text
+    )
+
+
+def _regex(template, escape, group):
+    placeholders = template.placeholders
+    alternatives = []
+    for tokens in _tokens(template):
+        pattern = escape(tokens[0])
+        for index in range(1, len(tokens), 2):
+            placeholder = placeholders.get(tokens[index])
+            values = placeholder and _static_choices(placeholder)
+            digits = placeholder and _digits(placeholder)
+            if values:
+                pattern += group % "|".join(escape(x) for x in values)
+            elif digits:
+                pattern += "[0-9]{%d,}" % digits
+            else:
+                pattern += ".*"
+            pattern += escape(tokens[index + 1])
+        alternatives.append(pattern)
+    return "^%s$" % (group % "|".join(alternatives))
+
+
+def posix_ere(template):
+    """Export a template as a POSIX extended regex which matches the whole
+    path. Every path validated by the template matches, some paths which
+    match are not valid (see :func:`residual`).
+
+    >>> pattern = posix_ere(config.templates["maya_shot_work"])
+    >>> find /prod -regextype posix-extended -regex "$pattern"
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    :return: The regex
+    :rtype: str
+    """
+    return _regex(template, _escape_ere, "(%s)")
+
+
+def pcre(template):
+    """Export a template as a PCRE (grep -P, rg) which matches the whole
+    path. Every path validated by the template matches, some paths which
+    match are not valid (see :func:`residual`).
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    :return: The regex
+    :rtype: str
+    """
+    return "(?s)" + _regex(template, re.escape, "(?:%s)")
+
+
+def _patterns(template, escape, anything, digit):
+    placeholders = template.placeholders
+    patterns = []
+    for tokens in _tokens(template):
+        pattern = escape(tokens[0])
+        for index in range(1, len(tokens), 2):
+            placeholder = placeholders.get(tokens[index])
+            digits = placeholder and _digits(placeholder)
+            if digits:
+                pattern += digit * digits
+            # Adjacent placeholders need a single wildcard
+            if digits or index == 1 or tokens[index - 1]:
+                pattern += anything
+            pattern += escape(tokens[index + 1])
+        if pattern not in patterns:
+            patterns.append(pattern)
+    return patterns
+
+
+def sqlite_glob(template):
+    """Export a template as SQLite GLOB patterns, one by variation
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    :return: The patterns
+    :rtype: list
+    """
+    return _patterns(template, _escape_glob, "*", "[0-9]")
+
+
+def sql_like(template, escape="\\"):
+    """Export a template as SQL LIKE patterns, one by variation. They must
+    be used with ``ESCAPE`` (see :func:`sql_where`).
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    :param escape: The escape character, defaults to "\\"
+    :type escape: str, optional
+    :return: The patterns
+    :rtype: list
+    """
+    return _patterns(
+        template, lambda x: _escape_like(x, escape), "%", "_"
+    )
+
+
+def sql_where(template, column="path", operator="GLOB"):
+    """Build a WHERE clause selecting the candidates of a template
+
+    >>> clause, params = sql_where(template)
+    >>> rows = connection.execute(
+    ...     "SELECT path FROM files WHERE " + clause, params
+    ... )
+    >>> paths = residual(template, (x[0] for x in rows))
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    :param column: The column of the paths, defaults to "path"
+    :type column: str, optional
+    :param operator: "GLOB" (SQLite, case sensitive) or "LIKE", defaults
+    to "GLOB"
+    :type operator: str, optional
+    :raises errors.ProdexTemplateError: If the operator is not supported
+    :return: The clause and its parameters
+    :rtype: tuple
+    """
+    column = '"%s"' % column.replace('"', '""')
+    if operator.upper() == "GLOB":
+        patterns = sqlite_glob(template)
+        condition = "%s GLOB ?" % column
+    elif operator.upper() == "LIKE":
+        patterns = sql_like(template)
+        condition = "%s LIKE ? ESCAPE '\\'" % column
+    else:
+        raise errors.ProdexTemplateError("Unknown operator %s" % operator)
+    clause = " OR ".join([condition] * len(patterns))
+    return "(%s)" % clause, patterns
+
+
+def residual(template, candidates):
+    """Exact check of the candidates returned by an exported filter
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    :param candidates: The candidate paths
+    :type candidates: iterable
+    :return: Generator of (path, fields) of the valid paths
+    :rtype: generator
+    """
+    for path in candidates:
+        if template.validate(path):
+            yield path, template.get_placeholders_values(path)
+
+
+EXPORTERS_MAPPING = {
+    "ere": posix_ere,
+    "pcre": pcre,
+    "glob": sqlite_glob,
+    "like": sql_like,
+}
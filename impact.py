@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# - impact.py -
+#
+# Impact of a configuration change: changed templates and the catalogued
+# paths which must be classified again.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import re
+import pathlib
+
+from utils import templates_utils
+import exporters
+import choices
+import errors
+
+
+def _placeholder_signature(placeholder):
+    """Everything which changes the values a placeholder accepts or
+    generates"""
+    values = placeholder.choices
+    if isinstance(values, choices.ChoicesProvider):
+        values = (
+            values.__class__.__name__,
+            values.source,
+            getattr(values, "column", None),
+        )
+    else:
+        values = sorted(str(x) for x in (values or []))
+    return (
+        placeholder.__class__.__name__,
+        values,
+        placeholder.length,
+        placeholder.default,
+        getattr(placeholder, "format_spec", None),
+    )
+
+
+def _references(definition):
+    """Find the root path and the strings used by a raw definition
+
+    :return: (root name or None, [string names])
+    :rtype: tuple
+    """
+    root = None
+    strings = []
+    for index, part in enumerate(pathlib.Path(definition).parts):
+        if not part.startswith("@"):
+            continue
+        name = templates_utils.sanitize_link(link=part)[1:]
+        if index == 0:
+            root = name
+        else:
+            strings.append(name)
+    return root, strings
+
+
+def _prefilter(template):
+    """Regex matching at least the paths the template validates"""
+    try:
+        return re.compile(exporters.pcre(template))
+    except errors.ProdexTemplateError:
+        # Braces which are not placeholders, anything can match
+        return re.compile("")
+
+
+class ConfigDiff(object):
+    """Differences between two configurations, and the paths they affect
+
+    >>> diff = ConfigDiff(old_config, new_config)
+    >>> diff.changed
+    >>> {'maya_shot_work': ['placeholder version']}
+    >>> affected = list(diff.affected(
+    ...     (path, template) for path, template, _ in catalog.query()
+    ... ))
+    >>> catalog.update(affected)
+
+    A template is changed if its definition changed, directly or through a
+    root path or a string, or if the constraints of one of its
+    placeholders changed (type, choices, length, default, format).
+
+    :param old: The previous configuration
+    :type old: :class:`templates.ProdexTemplate`
+    :param new: The new configuration
+    :type new: :class:`templates.ProdexTemplate`
+    """
+
+    def __init__(self, old, new):
+        super(ConfigDiff, self).__init__()
+
+        self._old = old
+        self._new = new
+        old_templates = old.templates
+        new_templates = new.templates
+        self.added = [x for x in new_templates if x not in old_templates]
+        self.removed = [x for x in old_templates if x not in new_templates]
+        # Template name: reasons of the change
+        self.changed = {}
+        for name, template in new_templates.items():
+            if name not in old_templates:
+                continue
+            reasons = self._compare(name, old_templates[name], template)
+            if reasons:
+                self.changed[name] = reasons
+
+        # Candidates of the new versions of the templates
+        self._prefilters = [
+            _prefilter(new_templates[x])
+            for x in self.added + list(self.changed)
+        ]
+        # Ambiguous paths are not stored with a template, removing or
+        # changing one of their templates can resolve them
+        self._old_prefilters = [
+            _prefilter(old_templates[x])
+            for x in self.removed + list(self.changed)
+        ]
+        self._dirty = frozenset(self.removed).union(self.changed)
+
+    def __repr__(self):
+        return "<%s +%d -%d ~%d>" % (
+            self.__class__.__name__,
+            len(self.added),
+            len(self.removed),
+            len(self.changed),
+        )
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def _compare(self, name, old, new):
+        reasons = []
+        if old.definitions != new.definitions:
+            raw_old = self._old._paths[name].get("definition")
+            raw_new = self._new._paths[name].get("definition")
+            if raw_old != raw_new:
+                reasons.append("definition")
+            else:
+                root, strings = _references(raw_new)
+                old_root = self._old._root_paths.get(root)
+                if root and str(old_root) != str(self._new._root_paths[root]):
+                    reasons.append("root %s" % root)
+                old_strings, new_strings = self._old.strings, self._new.strings
+                for string in strings:
+                    if old_strings.get(string) != new_strings.get(string):
+                        reasons.append("string %s" % string)
+                if not reasons:
+                    reasons.append("definition")
+        old_placeholders = old.placeholders
+        new_placeholders = new.placeholders
+        # Placeholders added or removed come with a definition change
+        common = set(old_placeholders).intersection(new_placeholders)
+        for placeholder in sorted(common):
+            before = _placeholder_signature(old_placeholders[placeholder])
+            after = _placeholder_signature(new_placeholders[placeholder])
+            if before != after:
+                reasons.append("placeholder %s" % placeholder)
+        return reasons
+
+    def to_dict(self):
+        return {
+            "added": list(self.added),
+            "removed": list(self.removed),
+            "changed": dict(self.changed),
+        }
+
+    def affected(self, mapping):
+        """Find the paths which may be classified differently with the new
+        configuration: the paths of the changed and removed templates, the
+        paths the added or changed templates may now validate and the
+        unmatched paths the removed or changed templates validated
+        (ambiguous paths).
+
+        :param mapping: (path, template name) stored by the previous
+        classification, template name is None for unmatched paths.
+        :type mapping: iterable
+        :return: Generator of paths
+        :rtype: generator
+        """
+        for path, template in mapping:
+            name = getattr(template, "name", template)
+            if name in self._dirty:
+                yield path
+                continue
+            path_string = str(path)
+            if any(x.match(path_string) for x in self._prefilters):
+                yield path
+            elif name is None and any(
+                x.match(path_string) for x in self._old_prefilters
+            ):
+                yield path
+
+    def reclassify(self, mapping, **kwargs):
+        """Classify again the affected paths with the new configuration,
+        see :func:`templates.ProdexTemplate.resolve`
+
+        :param mapping: (path, template name) stored by the previous
+        classification
+        :type mapping: iterable
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :return: Generator of (path, template, fields)
+        :rtype: generator
+        """
+        return self._new.resolve(
+            self.affected(mapping),
+            stats=kwargs.get("stats", None),
+            discreet=True,
+        )
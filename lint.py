@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# - lint.py -
+#
+# Static cost of the templates and checks of the configuration (lint).
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import re
+
+from placeholders import IntegerPlaceholder
+
+# Weights of the problems in the score, in steps of the matching
+AMBIGUITY_WEIGHT = 10
+ADJACENT_WEIGHT = 100
+UNANCHORED_WEIGHT = 5
+
+# Metric: default maximum, None if not checked
+DEFAULT_THRESHOLDS = {
+    "variations": 32,
+    "adjacent": 0,
+    "ambiguity": None,
+    "unanchored": None,
+    "score": None,
+}
+
+
+def _is_broad(placeholder):
+    """A placeholder which can take any string"""
+    if placeholder is None:
+        return True
+    if isinstance(placeholder, IntegerPlaceholder):
+        return False
+    return not placeholder.choices and not placeholder.length
+
+
+class TemplateCost(object):
+    """Static cost of a template:
+
+    - variations: definitions generated by the optional sections, each
+      one is tried to match and to format a path.
+    - adjacent: placeholders without literal between them (``{a}{b}``),
+      they can't be split.
+    - ambiguity: string placeholders followed by a literal in the same
+      path component (``{name}_{asset}``): the literal can be in the value,
+      the split is a guess.
+    - unanchored: variations whose file name has no literal or which end
+      with a string placeholder, nothing rejects the paths early.
+    - match_cost and format_cost: steps to match (partitions of each
+      variation and the round trip) and to format a path.
+
+    :param template: The template
+    :type template: :class:`templates.Template`
+    """
+
+    def __init__(self, template):
+        super(TemplateCost, self).__init__()
+
+        self.name = template.name
+        self.definition = str(template.path)
+        self.variations = len(template.definitions)
+        self.optionals = self.definition.count("[")
+        self.adjacent = 0
+        self.ambiguity = 0
+        self.unanchored = 0
+        self.match_cost = 0
+        placeholders = template.placeholders
+        for definition in template.definitions:
+            tokens = re.split(r"{(\w+)}", definition)
+            # Each static part is a partition, then a format by variation
+            self.match_cost += len([x for x in tokens if x]) + self.variations
+            for index in range(1, len(tokens), 2):
+                after = tokens[index + 1] if index + 1 < len(tokens) else ""
+                if index + 2 < len(tokens) and not after:
+                    self.adjacent += 1
+                elif (
+                    after
+                    and index + 2 < len(tokens)
+                    and "/" not in after
+                    and _is_broad(placeholders.get(tokens[index]))
+                ):
+                    self.ambiguity += 1
+            file_name = definition.rpartition("/")[2]
+            literals = re.split(r"{\w+}", file_name)
+            ends_broad = not tokens[-1] and _is_broad(
+                placeholders.get(tokens[-2]) if len(tokens) > 1 else None
+            )
+            if not any(literals) or ends_broad:
+                self.unanchored += 1
+        self.format_cost = self.variations
+
+    def __repr__(self):
+        return "<%s %s %d>" % (self.__class__.__name__, self.name, self.score)
+
+    @property
+    def score(self):
+        """Return the estimated cost of a lookup with this template
+
+        :rtype: int
+        """
+        return (
+            self.match_cost
+            + self.format_cost
+            + AMBIGUITY_WEIGHT * self.ambiguity
+            + ADJACENT_WEIGHT * self.adjacent
+            + UNANCHORED_WEIGHT * self.unanchored
+        )
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "definition": self.definition,
+            "variations": self.variations,
+            "optionals": self.optionals,
+            "adjacent": self.adjacent,
+            "ambiguity": self.ambiguity,
+            "unanchored": self.unanchored,
+            "match_cost": self.match_cost,
+            "format_cost": self.format_cost,
+            "score": self.score,
+        }
+
+
+def analyze(config):
+    """Estimate the cost of each template of a configuration
+
+    >>> costs = analyze(prodex_template)
+    >>> worst(costs, 3)
+    >>> [<TemplateCost maya_shot_snapshot 131>, ...]
+
+    :param config: The configuration
+    :type config: :class:`templates.ProdexTemplate`
+    :return: The costs, in the config order
+    :rtype: list
+    """
+    return [TemplateCost(x) for x in config.templates.values()]
+
+
+def worst(costs, count=10):
+    """Get the most expensive templates
+
+    :param costs: The costs (see :func:`analyze`)
+    :type costs: list
+    :param count: The number of templates, defaults to 10
+    :type count: int, optional
+    :return: The costs sorted by score, the worst first
+    :rtype: list
+    """
+    return sorted(costs, key=lambda x: (-x.score, x.name))[:count]
+
+
+def check(costs, **thresholds):
+    """Check the costs against maximums, for CI
+
+    >>> check(costs, variations=16, ambiguity=2)
+    >>> [('maya_shot_snapshot', 'variations', 32, 16)]
+
+    :param costs: The costs (see :func:`analyze`)
+    :type costs: list
+    :param thresholds: Metric name: maximum (None to skip the metric),
+    see :data:`DEFAULT_THRESHOLDS` for the defaults.
+    :type thresholds: dict
+    :raises ValueError: If a metric doesn't exist
+    :return: The violations (template name, metric, value, maximum)
+    :rtype: list
+    """
+    limits = dict(DEFAULT_THRESHOLDS)
+    for metric, limit in thresholds.items():
+        if metric not in limits:
+            raise ValueError("Unknown metric %s" % metric)
+        limits[metric] = limit
+    violations = []
+    for cost in costs:
+        for metric, limit in sorted(limits.items()):
+            if limit is None:
+                continue
+            value = getattr(cost, metric)
+            if value > limit:
+                violations.append((cost.name, metric, value, limit))
+    return violations
@@ -24,17 +24,38 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import choices
+
+
 class Placeholder(object):
     """Basic class for Placeholders. A placeholder is represented by an
     ambrassed word in a path. e.g: {foo}"""
 
+    # Conversion of the values of the choices providers
+    choices_type = None
+
     def __init__(self, name, type, *args, **kwargs):
 
         self.name = name
-        self.choices = kwargs.get("choices", [])
         self.length = kwargs.get("length", None)
         self.default = kwargs.get("default", None)
 
+        # Choices from a file or a callable, see choices.py
+        values = kwargs.get("choices", [])
+        ttl = kwargs.get("choices_ttl", None)
+        if kwargs.get("choices_from"):
+            values = choices.file_choices(
+                path=kwargs.get("choices_from"),
+                column=kwargs.get("choices_column", None),
+                ttl=ttl,
+                convert=self.choices_type,
+            )
+        elif callable(values):
+            values = choices.callable_choices(
+                function=values, ttl=ttl, convert=self.choices_type
+            )
+        self.choices = values
+
     def __repr__(self):
         return "<%s %s>" % (
             self.__class__.__name__,
@@ -44,6 +65,33 @@ class Placeholder(object):
     def __str__(self):
         return "%s %s" % (self.__class__.__name__, self.name)
 
+    @property
+    def choices(self):
+        """Return the choices: a tuple of static values or a provider (see
+        choices.py). Static choices are frozen, assign new choices to
+        change them.
+
+        :rtype: tuple or :class:`choices.ChoicesProvider`
+        """
+        return self._choices
+
+    @choices.setter
+    def choices(self, values):
+        if not isinstance(values, choices.ChoicesProvider):
+            values = tuple(values or ())
+        self._choices = values
+        self._container = choices.as_container(values)
+
+    @property
+    def container(self):
+        """Return the container testing the membership of a value in the
+        choices, shared by all the engines: a frozenset for static choices,
+        the provider itself for the other ones.
+
+        :rtype: frozenset or :class:`choices.ChoicesProvider`
+        """
+        return self._container
+
     def validate(self, value):
         """
         Test if a value is valid for this placeholder::
@@ -57,8 +105,8 @@ class Placeholder(object):
         :return: True if the value is valid, False instead.
         :rtype: Bool
         """
-        if self.choices:
-            if value not in self.choices:
+        if self._choices:
+            if value not in self._container:
                 return False
         if self.length:
             if len(str(value)) != self.length:
@@ -92,6 +140,8 @@ class IntegerPlaceholder(Placeholder):
     which will contain an Integer.
     """
 
+    choices_type = int
+
     def __init__(self, name, *args, **kwargs):
         super(IntegerPlaceholder, self).__init__(name=name, *args, **kwargs)
 
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+# - profiler.py -
+#
+# Timings and allocations of the load of a configuration.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import contextlib
+import tracemalloc
+
+
+class Measure(object):
+    """Wall time and allocations of a phase"""
+
+    __slots__ = ("phase", "name", "depth", "seconds", "allocated", "extra")
+
+    def __init__(self, phase, name, depth):
+        self.phase = phase
+        self.name = name
+        self.depth = depth
+        self.seconds = 0.0
+        self.allocated = 0  # Bytes still allocated at the end of the phase
+        self.extra = {}
+
+    def __repr__(self):
+        return "<%s %s %s: %.6fs>" % (
+            self.__class__.__name__,
+            self.phase,
+            self.name,
+            self.seconds,
+        )
+
+    def to_dict(self):
+        data = {
+            "phase": self.phase,
+            "name": self.name,
+            "depth": self.depth,
+            "seconds": self.seconds,
+            "allocated": self.allocated,
+        }
+        data.update(self.extra)
+        return data
+
+
+class LoadProfile(object):
+    """Profile of the load of a configuration. Phases are nested: the
+    parse contains the reading of each file and the merge of each include,
+    the templates contain each template.
+
+    >>> config = ProdexTemplate("/prod/project/template.yml", profile=True)
+    >>> print(config.load_profile.report())
+
+    :param allocations: Trace the allocations with tracemalloc (slower),
+    defaults to True
+    :type allocations: bool, optional
+    """
+
+    def __init__(self, allocations=True):
+        super(LoadProfile, self).__init__()
+
+        self.allocations = allocations
+        self.measures = []
+        self.peak = 0
+        self._depth = 0
+        self._started = False
+
+    @contextlib.contextmanager
+    def measure(self, phase, name=None):
+        """Measure a phase
+
+        :param phase: The phase (parse, read, merge, placeholders...)
+        :type phase: str
+        :param name: The file or the template, optional
+        :type name: str, optional
+        :return: The measure, its extra dict can be filled
+        :rtype: :class:`Measure`
+        """
+        measure = Measure(phase, name and str(name), self._depth)
+        self.measures.append(measure)
+        if self._depth == 0:
+            self._start()
+        self._depth += 1
+        tracing = self.allocations and tracemalloc.is_tracing()
+        before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        try:
+            yield measure
+        finally:
+            measure.seconds = time.perf_counter() - start
+            if tracing:
+                measure.allocated = tracemalloc.get_traced_memory()[0] - before
+            self._depth -= 1
+            if self._depth == 0:
+                self._stop()
+
+    def _start(self):
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def _stop(self):
+        if tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def phases(self, phase=None):
+        """Get the measures
+
+        :param phase: Only this phase, optional
+        :type phase: str, optional
+        :return: The measures in order
+        :rtype: list
+        """
+        return [x for x in self.measures if phase in (None, x.phase)]
+
+    def slowest(self, phase, count=10):
+        """Get the slowest measures of a phase
+
+        :param phase: The phase (read, merge, template)
+        :type phase: str
+        :param count: Number of measures, defaults to 10
+        :type count: int, optional
+        :return: The measures, slowest first
+        :rtype: list
+        """
+        measures = sorted(
+            self.phases(phase), key=lambda x: x.seconds, reverse=True
+        )
+        return measures[:count]
+
+    def variations(self):
+        """Get the number of variations of each template
+
+        :return: Template name: number of variations
+        :rtype: dict
+        """
+        return {
+            x.name: x.extra["variations"]
+            for x in self.measures
+            if "variations" in x.extra
+        }
+
+    def to_dict(self):
+        """Get the profile as builtin types (JSON)
+
+        :rtype: dict
+        """
+        return {
+            "peak": self.peak,
+            "measures": [x.to_dict() for x in self.measures],
+        }
+
+    def report(self, count=10):
+        """Get a human readable report
+
+        :param count: Number of files and templates listed, defaults to 10
+        :type count: int, optional
+        :return: The report
+        :rtype: str
+        """
+        lines = ["%-40s %10s %12s" % ("phase", "seconds", "allocated")]
+        for measure in self.measures:
+            if measure.name is not None:
+                continue
+            lines.append(
+                "%-40s %10.4f %12s"
+                % (
+                    "  " * measure.depth + measure.phase,
+                    measure.seconds,
+                    _format_size(measure.allocated),
+                )
+            )
+        if self.peak:
+            lines.append("peak: %s" % _format_size(self.peak))
+        for phase, title in (
+            ("read", "slowest files to read"),
+            ("merge", "slowest includes to merge"),
+            ("template", "slowest templates"),
+        ):
+            measures = self.slowest(phase, count)
+            if not measures:
+                continue
+            lines.append("")
+            lines.append("%s:" % title)
+            for measure in measures:
+                extra = ""
+                if "variations" in measure.extra:
+                    extra = " (%d variations)" % measure.extra["variations"]
+                lines.append(
+                    "%10.4f %12s  %s%s"
+                    % (
+                        measure.seconds,
+                        _format_size(measure.allocated),
+                        measure.name,
+                        extra,
+                    )
+                )
+        return "\n".join(lines)
+
+
+def _format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return "%d %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GiB" % size
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# - registry.py -
+#
+# Registry shared between many ProdexTemplate in one process. Config files,
+# placeholders and templates are cached by content, so a studio wide include
+# is parsed and compiled only once whatever the number of projects.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import threading
+
+import yaml
+
+from placeholders import PLACEHOLDERS_MAPPING
+from utils import filesystem as filesystems
+
+
+def _freeze(value):
+    """Convert a parsed YAML value into a hashable value"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(x) for x in value)
+    return value
+
+
+def _copy_sections(data):
+    """Copy the containers of the first level. The values are shared."""
+    copy = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            value = dict(value)
+        elif isinstance(value, list):
+            value = list(value)
+        copy[key] = value
+    return copy
+
+
+class TemplateRegistry(object):
+    """Cache of parsed config files and compiled templates.
+
+    >>> registry = TemplateRegistry()
+    >>> project_a = registry.load("/prod/project_a/template.yml")
+    >>> project_b = registry.load("/prod/project_b/template.yml")
+
+    Templates, placeholders and config files which are identical in both
+    projects are the same objects.
+    """
+
+    def __init__(self, filesystem=None):
+        super(TemplateRegistry, self).__init__()
+
+        self._filesystem = filesystem or filesystems.LOCAL_FILESYSTEM
+        self._lock = threading.RLock()
+        self._files = {}  # path: (mtime, digest)
+        self._contents = {}  # digest: parsed data
+        self._placeholders = {}  # key: Placeholder
+        self._placeholder_keys = {}  # id(Placeholder): key
+        self._templates = {}  # key: Template
+
+    def load(self, path, engine="reference"):
+        """Load a configuration using this registry
+
+        :param path: The path of the config file
+        :type path: str
+        :param engine: The matching engine, defaults to "reference"
+        :type engine: str, optional
+        :return: The configuration
+        :rtype: :class:`templates.ProdexTemplate`
+        """
+        # Imported here, templates.py imports this module
+        from templates import ProdexTemplate
+
+        return ProdexTemplate(
+            path=path,
+            registry=self,
+            filesystem=self._filesystem,
+            engine=engine,
+        )
+
+    def read(self, path):
+        """Parse a config file. The file is parsed only if its content has
+        never been seen before.
+
+        :param path: The path of the config file
+        :type path: pathlib.Path
+        :return: The data of the config file. Sections are new containers
+        but their values are shared.
+        :rtype: dict
+        """
+        mtime = self._filesystem.mtime(str(path))
+        with self._lock:
+            cached = self._files.get(path)
+            if cached and mtime is not None and cached[0] == mtime:
+                digest = cached[1]
+            else:
+                raw = self._filesystem.read(str(path))
+                digest = hashlib.sha1(raw).hexdigest()
+                self._files[path] = (mtime, digest)
+                if digest not in self._contents:
+                    self._contents[digest] = yaml.full_load(raw)
+            return _copy_sections(self._contents[digest])
+
+    def placeholder(self, name, attributes):
+        """Get the shared placeholder for these attributes
+
+        :param name: The name of the placeholder
+        :type name: str
+        :param attributes: The attributes from the config
+        :type attributes: dict
+        :return: The placeholder
+        :rtype: :class:`placeholders.Placeholder`
+        """
+        key = (name, _freeze(attributes))
+        with self._lock:
+            placeholder = self._placeholders.get(key)
+            if placeholder is None:
+                class_object = PLACEHOLDERS_MAPPING.get(
+                    attributes.get("type")
+                )
+                placeholder = class_object(name=name, **attributes)
+                self._placeholders[key] = placeholder
+                self._placeholder_keys[id(placeholder)] = key
+            return placeholder
+
+    def template(
+        self,
+        definition,
+        name,
+        placeholders,
+        engine="reference",
+        filesystem=None,
+    ):
+        """Get the shared template for this definition
+
+        :param definition: The definition (links already resolved)
+        :type definition: pathlib.Path
+        :param name: The name of the template
+        :type name: str
+        :param placeholders: The placeholders of the template
+        :type placeholders: dict
+        :param engine: The matching engine, defaults to "reference"
+        :type engine: str, optional
+        :param filesystem: The backend of the lookups, defaults to None
+        :type filesystem: :class:`utils.filesystem.FileSystem`, optional
+        :return: The template
+        :rtype: :class:`templates.Template`
+        """
+        from templates import Template
+
+        with self._lock:
+            key = (
+                name,
+                str(definition),
+                engine,
+                id(filesystem) if filesystem is not None else None,
+                tuple(
+                    sorted(
+                        self._placeholder_keys.get(id(x), (x.name, id(x)))
+                        for x in placeholders.values()
+                    )
+                ),
+            )
+            template = self._templates.get(key)
+            if template is None:
+                template = Template(
+                    definition=definition,
+                    name=name,
+                    placeholders=placeholders,
+                    engine=engine,
+                    filesystem=filesystem,
+                )
+                self._templates[key] = template
+            return template
+
+    def stats(self):
+        """Return the number of unique objects held by the registry
+
+        :return: Number of files, contents, placeholders and templates
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "contents": len(self._contents),
+                "placeholders": len(self._placeholders),
+                "templates": len(self._templates),
+            }
+
+    def clear(self):
+        """Forget everything"""
+        with self._lock:
+            self._files.clear()
+            self._contents.clear()
+            self._placeholders.clear()
+            self._placeholder_keys.clear()
+            self._templates.clear()
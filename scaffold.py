@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# - scaffold.py -
+#
+# Bulk creation of the directories of templates over sets of fields.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import posixpath
+import itertools
+import collections
+from concurrent import futures
+
+from utils import filesystem as filesystems
+import errors
+
+# Number of threads creating the directories
+DEFAULT_JOBS = 16
+
+
+def _values(value):
+    """The values of a field: a single value or a list of values"""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted(value, key=str)
+    return [value]
+
+
+class Scaffold(object):
+    """Expand templates of directories over sets of fields and create the
+    directories.
+
+    >>> scaffold = Scaffold(prodex_template, templates=["shot_work_area"])
+    >>> scaffold.add({"shot": ["s010", "s020"], "step": ["anim", "fx"]})
+    >>> scaffold.plan()  # dry run
+    >>> ['/prod', '/prod/project', ...]
+    >>> scaffold.create()
+    >>> {'planned': 12, 'created': 8, 'existing': 4, 'failed': [], ...}
+
+    Shared parents are planned once. Directories are created from the top
+    of the tree with one ``mkdir`` by directory and no ``stat``: a parent is
+    known to exist once its own ``mkdir`` returned, its children are then
+    created in parallel.
+
+    :param config: The configuration
+    :type config: :class:`templates.ProdexTemplate`
+    :param templates: Names of the templates of directories (templates of
+    files would be created as directories)
+    :type templates: list
+    :param filesystem: (kwargs) The filesystem backend, defaults to the
+    local one
+    :type filesystem: :class:`utils.filesystem.FileSystem`
+    :param jobs: (kwargs) Number of threads, defaults to
+    :data:`DEFAULT_JOBS`
+    :type jobs: int
+    :raises errors.ProdexTemplateError: If there is no template or if a
+    template doesn't exist
+    """
+
+    def __init__(self, config, templates, **kwargs):
+        super(Scaffold, self).__init__()
+
+        names = list(templates or [])
+        if not names:
+            raise errors.ProdexTemplateError("No template to scaffold")
+        all_templates = config.templates
+        for name in names:
+            if name not in all_templates:
+                raise errors.ProdexTemplateError(
+                    "No template found for %s" % name
+                )
+        self._templates = [all_templates[x] for x in names]
+        self._placeholders = config.placeholders
+        self._filesystem = kwargs.get("filesystem", None)
+        self._filesystem = self._filesystem or filesystems.LOCAL_FILESYSTEM
+        self._jobs = kwargs.get("jobs", DEFAULT_JOBS)
+        self._directories = set()
+        # Template name: number of field sets without all its placeholders
+        self.skipped = collections.Counter()
+
+    def __repr__(self):
+        return "<%s %d directories>" % (
+            self.__class__.__name__,
+            len(self._directories),
+        )
+
+    def _conform(self, fields):
+        """Validate and conform each value once
+
+        :raises errors.ProdexTemplatePlaceholderValidation: If a value is
+        not valid
+        """
+        conformed = {}
+        for name, value in fields.items():
+            placeholder = self._placeholders.get(name)
+            values = []
+            for item in _values(value):
+                if placeholder is None:
+                    values.append(item)
+                    continue
+                if not placeholder.validate(item):
+                    raise errors.ProdexTemplatePlaceholderValidation(
+                        "The value {0} is not conform for the placeholder "
+                        "{1}".format(item, name)
+                    )
+                values.append(placeholder.conform_value(item))
+            conformed[name] = values
+        return conformed
+
+    def add(self, fields):
+        """Add the directories of the templates for a set of fields. Each
+        template is expanded over the combinations of the values of its own
+        placeholders.
+
+        >>> scaffold.add({"shot": ["s010", "s020"], "step": "anim"})
+
+        :param fields: Placeholder name: a value or a list of values
+        :type fields: dict
+        :raises errors.ProdexTemplatePlaceholderValidation: If a value is
+        not valid
+        :return: The number of new directories
+        :rtype: int
+        """
+        conformed = self._conform(fields)
+        count = len(self._directories)
+        for template in self._templates:
+            names = [x for x in conformed if x in template.placeholders]
+            for combination in itertools.product(
+                *[conformed[x] for x in names]
+            ):
+                values = dict(zip(names, combination))
+                path = template._format_conformed(values)
+                if path is None:
+                    self.skipped[template.name] += 1
+                    break
+                self._add_directory(posixpath.normpath(path))
+        return len(self._directories) - count
+
+    def _add_directory(self, path):
+        # Stop at the first parent already planned
+        while path not in self._directories:
+            parent = posixpath.dirname(path)
+            if parent == path:
+                break
+            self._directories.add(path)
+            path = parent
+
+    def plan(self):
+        """Return the directories to create, parents first (dry run)
+
+        :rtype: list
+        """
+        return sorted(self._directories)
+
+    def create(self):
+        """Create the planned directories
+
+        :return: The report: planned, created and existing directories,
+        failed (path, error) and the directories skipped below them
+        :rtype: dict
+        """
+        # Parent: children, sorted
+        children = collections.defaultdict(list)
+        roots = []
+        for path in self.plan():
+            parent = posixpath.dirname(path)
+            if parent in self._directories:
+                children[parent].append(path)
+            else:
+                roots.append(path)
+
+        report = {
+            "planned": len(self._directories),
+            "created": 0,
+            "existing": 0,
+            "failed": [],
+            "skipped": 0,
+        }
+        ready = collections.deque(roots)
+        running = {}
+        with futures.ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            while ready or running:
+                # Only a few directories are queued in the executor
+                while ready and len(running) < self._jobs * 2:
+                    path = ready.popleft()
+                    running[executor.submit(self._mkdir, path)] = path
+                done, _ = futures.wait(
+                    running, return_when=futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    path = running.pop(future)
+                    status, error = future.result()
+                    if error is not None:
+                        report["failed"].append((path, str(error)))
+                        report["skipped"] += self._count_below(path, children)
+                        continue
+                    report[status] += 1
+                    ready.extend(children.pop(path, []))
+        return report
+
+    def _mkdir(self, path):
+        try:
+            self._filesystem.mkdir(path)
+        except FileExistsError:
+            return self._existing(path, None)
+        except PermissionError as error:
+            # Read-only parents of existing directories
+            return self._existing(path, error)
+        except OSError as error:
+            return None, error
+        return "created", None
+
+    def _existing(self, path, error):
+        """Status of a path which couldn't be created: existing if it is a
+        directory, a failure if it is a file (or if it doesn't exist)"""
+        if self._filesystem.is_dir(path):
+            return "existing", None
+        if error is None and self._filesystem.exists(path):
+            error = NotADirectoryError("Not a directory: %s" % path)
+        return None, error or FileExistsError("File exists: %s" % path)
+
+    def _count_below(self, path, children):
+        count = 0
+        stack = list(children.pop(path, []))
+        while stack:
+            count += 1
+            stack.extend(children.pop(stack.pop(), []))
+        return count
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# - server.py -
+#
+# Resident resolver daemon. It loads a ProdexTemplate once, reloads it when one
+# of its config files changes and answers batched requests over a Unix socket.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import time
+import threading
+import socketserver
+
+from templates import ProdexTemplate
+from utils import framing
+import errors
+
+RELOAD_INTERVAL = 1.0
+
+
+class ProdexTemplateServer(socketserver.ThreadingUnixStreamServer):
+    """Serve a :class:`ProdexTemplate` over a Unix socket.
+
+    >>> server = ProdexTemplateServer("/tmp/prodex.sock", "template.yml")
+    >>> server.serve_forever()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, config_path, **kwargs):
+        self.config_path = config_path
+        self.reload_interval = kwargs.get("reload_interval", RELOAD_INTERVAL)
+        self._lock = threading.Lock()
+        self._config = None
+        self._mtimes = {}
+        self._last_check = 0.0
+        self._load()
+
+        if os.path.exists(socket_path):
+            # Stale socket from a previous daemon
+            os.unlink(socket_path)
+        super(ProdexTemplateServer, self).__init__(
+            socket_path, _RequestHandler
+        )
+
+    @property
+    def config(self):
+        """Return the loaded configuration, reload it before if one of its
+        config files changed.
+
+        :return: The configuration
+        :rtype: :class:`ProdexTemplate`
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return self._config
+        with self._lock:
+            self._last_check = now
+            if self._get_mtimes(self._mtimes) != self._mtimes:
+                try:
+                    self._load()
+                except (OSError, errors.ProdexTemplateError) as error:
+                    # Keep serving the previous configuration
+                    sys.stderr.write("reload failed: %s\n" % error)
+        return self._config
+
+    def _load(self):
+        config = ProdexTemplate(path=self.config_path)
+        self._mtimes = self._get_mtimes(config.includes)
+        self._config = config
+
+    def _get_mtimes(self, paths):
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def server_close(self):
+        super(ProdexTemplateServer, self).server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+    def handle_request_data(self, request):
+        """Process a decoded request
+
+        :param request: The request. "op" is the operation, other keys are
+        the arguments of the operation.
+        :type request: dict
+        :return: The response
+        :rtype: dict
+        """
+        if not isinstance(request, dict):
+            return _error_response(
+                "The request must be an object, not %s"
+                % request.__class__.__name__
+            )
+        op = request.get("op")
+        operation = OPERATIONS.get(op) if isinstance(op, str) else None
+        if not operation:
+            return _error_response("Unknown operation %s" % op)
+        try:
+            result = operation(self.config, request)
+        except errors.ProdexTemplateError as error:
+            return {
+                "ok": False,
+                "error": error.__class__.__name__,
+                "message": str(error),
+            }
+        except Exception as error:
+            # Bad arguments (KeyError, TypeError...) or a bug: the client
+            # gets an error instead of a closed connection
+            return _error_response(
+                "%s: %s" % (error.__class__.__name__, error)
+            )
+        return {"ok": True, "result": result}
+
+
+def _error_response(message):
+    return {"ok": False, "error": "ProdexTemplateError", "message": message}
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # A connection can send as many requests as it wants
+        while True:
+            try:
+                request = framing.recv_frame(self.request)
+            except ValueError as error:
+                framing.send_frame(self.request, _error_response(str(error)))
+                return
+            if request is None:
+                return
+            try:
+                response = self.server.handle_request_data(request)
+            except Exception as error:
+                response = _error_response(
+                    "%s: %s" % (error.__class__.__name__, error)
+                )
+            framing.send_frame(self.request, response)
+
+
+def _get_template(config, request):
+    template = config.templates.get(request["template"])
+    if not template:
+        raise errors.ProdexTemplateError(
+            "No template found for %s" % request["template"]
+        )
+    return template
+
+
+def _op_ping(config, request):
+    return "pong"
+
+
+def _op_templates(config, request):
+    return {
+        name: [str(template.path), template.definitions]
+        for name, template in config.templates.items()
+    }
+
+
+def _op_resolve(config, request):
+    return [
+        [template.name if template else None, fields]
+        for _, template, fields in config.resolve(
+            request["paths"], discreet=True
+        )
+    ]
+
+
+def _op_templates_from_path(config, request):
+    return [
+        [x.name for x in config.templates_from_path(path)]
+        for path in request["paths"]
+    ]
+
+
+def _op_validate(config, request):
+    template = _get_template(config, request)
+    return [template.validate(path) for path in request["paths"]]
+
+
+def _op_get_placeholders_values(config, request):
+    template = _get_template(config, request)
+    discreet = request.get("discreet", False)
+    return [
+        template.get_placeholders_values(path=path, discreet=discreet)
+        for path in request["paths"]
+    ]
+
+
+def _op_format(config, request):
+    template = _get_template(config, request)
+    paths = []
+    for placeholders in request["fields"]:
+        path = template.set_placeholders_values(placeholders=placeholders)
+        paths.append(str(path) if path is not None else None)
+    return paths
+
+
+OPERATIONS = {
+    "ping": _op_ping,
+    "templates": _op_templates,
+    "resolve": _op_resolve,
+    "templates_from_path": _op_templates_from_path,
+    "validate": _op_validate,
+    "get_placeholders_values": _op_get_placeholders_values,
+    "format": _op_format,
+}
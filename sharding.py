@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+#
+# - sharding.py -
+#
+# Deterministic partition of scans and path manifests across nodes. Each
+# node writes a partial result file, the files are merged with a coverage
+# check.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import json
+import zlib
+import hashlib
+
+from utils import filesystem as filesystems
+import errors
+
+STRATEGIES = ("hash", "template")
+# Number of directories of the prefixes hashed by the hash strategy
+DEFAULT_DEPTH = 4
+FORMAT_VERSION = 1
+# Keys of the first and last lines of a partial result file
+HEADER_KEY = "shard"
+TRAILER_KEY = "coverage"
+# The trailer is read from the end of the partial result files
+TRAILER_SIZE = 4096
+
+
+def _hash(text):
+    """Hash stable across processes and machines (unlike hash())"""
+    return zlib.crc32(text.encode("utf-8", "surrogateescape"))
+
+
+class Coverage(object):
+    """Paths for which a node decided if they were in its shard. All nodes
+    take the same decisions (the same paths in the same order), only the
+    owned part differs: the sum of the owned paths of all nodes must be the
+    number of decisions.
+    """
+
+    def __init__(self):
+        super(Coverage, self).__init__()
+
+        self.seen = 0
+        self.owned = 0
+        self.fingerprint = 0
+
+    def add(self, path, owned):
+        """Record a decision
+
+        :param path: The path
+        :type path: str
+        :param owned: True if the path is in the shard of the node
+        :type owned: bool
+        """
+        self.seen += 1
+        if owned:
+            self.owned += 1
+        self.fingerprint = (self.fingerprint + _hash(path)) & 0xFFFFFFFFFFFF
+
+    def to_dict(self):
+        return {
+            "seen": self.seen,
+            "owned": self.owned,
+            "fingerprint": self.fingerprint,
+        }
+
+
+class Sharder(object):
+    """Deterministic partition of paths in a number of shards. A path
+    belongs to the shard of its key:
+
+    - hash: the first directories of the path (see depth).
+    - template: the static directories of the templates and the next
+      component, a shot directory below `/prod/project/shot` for example.
+      Paths outside the templates fall back on the hash strategy.
+
+    All the paths below a directory share the same key once the key is
+    complete, so a node only walks the subtrees of its shard.
+
+    >>> sharder = Sharder(16, strategy="template", templates=templates)
+    >>> for path in sharder.walk("/prod/project", index=3):
+    ...     print(path)
+
+    :param count: The number of shards
+    :type count: int
+    :param strategy: (kwargs) hash or template, defaults to hash
+    :type strategy: str
+    :param depth: (kwargs) Number of directories of the hashed prefixes,
+    defaults to :data:`DEFAULT_DEPTH`
+    :type depth: int
+    :param templates: (kwargs) The templates, required by the template
+    strategy
+    :type templates: list
+    :raises errors.ProdexTemplateError: If the parameters are not valid
+    """
+
+    def __init__(self, count, **kwargs):
+        super(Sharder, self).__init__()
+
+        self._count = int(count)
+        self._strategy = kwargs.get("strategy", "hash")
+        self._depth = int(kwargs.get("depth", DEFAULT_DEPTH))
+        templates = kwargs.get("templates", None) or []
+        if self._count < 1 or self._depth < 1:
+            raise errors.ProdexTemplateError(
+                "The number of shards and the depth must be positive"
+            )
+        if self._strategy not in STRATEGIES:
+            raise errors.ProdexTemplateError(
+                "Unknown strategy %s, available strategies: %s"
+                % (self._strategy, ", ".join(STRATEGIES))
+            )
+        if self._strategy == "template" and not templates:
+            raise errors.ProdexTemplateError(
+                "The template strategy requires templates"
+            )
+
+        # Path component: child node, None: True ends a static directory
+        self._trie = {}
+        digest = hashlib.sha1()
+        for template in templates:
+            for definition in template.definitions:
+                digest.update(definition.encode("utf-8") + b"\0")
+                if self._strategy != "template":
+                    continue
+                node = self._trie
+                for component in definition.split("/")[:-1]:
+                    if "{" in component:
+                        break
+                    node = node.setdefault(component, {})
+                node[None] = True
+        self._digest = digest.hexdigest() if templates else None
+
+    def __repr__(self):
+        return "<%s %d %s>" % (
+            self.__class__.__name__,
+            self._count,
+            self._strategy,
+        )
+
+    @property
+    def count(self):
+        """Return the number of shards
+
+        :rtype: int
+        """
+        return self._count
+
+    @property
+    def strategy(self):
+        """Return the partition strategy
+
+        :rtype: str
+        """
+        return self._strategy
+
+    def _key_length(self, components):
+        """Get the number of components of the key of a path
+
+        :param components: The components of the path
+        :type components: list
+        :return: (length, complete). complete is False if the paths below
+        can have longer keys.
+        :rtype: tuple
+        """
+        length = None
+        node = self._trie
+        for index, component in enumerate(components):
+            if None in node:
+                length = index + 1
+            node = node.get(component)
+            if node is None:
+                break
+        else:
+            if node:
+                # The path is a static directory or above one
+                length = len(components) + 1 if None in node else length
+                return length or self._hash_length(components), False
+        if length is None:
+            return self._hash_length(components), True
+        return length, True
+
+    def _hash_length(self, components):
+        return self._depth + (1 if components and not components[0] else 0)
+
+    def key(self, path):
+        """Return the key of a path, its shard is given by the key
+
+        :param path: The path
+        :type path: str
+        :rtype: str
+        """
+        components = str(path).rstrip("/").split("/")
+        length, _ = self._key_length(components)
+        return "/".join(components[:length])
+
+    def shard(self, path):
+        """Return the shard of a path
+
+        :param path: The path
+        :type path: str
+        :rtype: int
+        """
+        return _hash(self.key(path)) % self._count
+
+    def _subtree_shard(self, directory):
+        """Return the shard of all paths below a directory, None if they
+        are not in the same shard.
+        """
+        components = directory.rstrip("/").split("/")
+        length, complete = self._key_length(components)
+        if not complete or len(components) < length:
+            return None
+        return _hash("/".join(components[:length])) % self._count
+
+    def split(self, paths, index, coverage=None):
+        """Keep the paths of a shard from a stream of paths (a manifest)
+
+        :param paths: All paths, in the same order for all nodes
+        :type paths: iterable
+        :param index: The shard of the node
+        :type index: int
+        :param coverage: Updated with the decisions, optional
+        :type coverage: :class:`Coverage`
+        :return: Generator of the paths of the shard
+        :rtype: generator
+        """
+        for path in paths:
+            owned = self.shard(path) == index
+            if coverage is not None:
+                coverage.add(path, owned)
+            if owned:
+                yield path
+
+    def walk(self, root, index, coverage=None, filesystem=None):
+        """Walk through the root and yield the directories and files of a
+        shard (sorted by name, depth first, like
+        :func:`utils.filesystem.FileSystem.walk`). Subtrees of other shards
+        are not listed.
+
+        :param root: The root directory
+        :type root: str
+        :param index: The shard of the node
+        :type index: int
+        :param coverage: Updated with the decisions, optional
+        :type coverage: :class:`Coverage`
+        :param filesystem: The filesystem backend, defaults to the local one
+        :type filesystem: :class:`utils.filesystem.FileSystem`, optional
+        :return: Generator of paths
+        :rtype: generator
+        """
+        filesystem = filesystem or filesystems.LOCAL_FILESYSTEM
+        root = str(root)
+        shard = self._subtree_shard(root)
+        if shard is not None:
+            # The whole root is in one shard
+            if coverage is not None:
+                coverage.add(root, shard == index)
+            if shard == index:
+                for path in filesystem.walk(root):
+                    yield path
+            return
+
+        # Directory, True if all its subtree is owned
+        stack = [(root, False)]
+        while stack:
+            directory, owned_subtree = stack.pop()
+            try:
+                entries = sorted(
+                    filesystem.scandir(directory), key=lambda x: x.name
+                )
+            except OSError:
+                continue
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if owned_subtree:
+                    yield entry.path
+                    if is_dir:
+                        stack.append((entry.path, True))
+                    continue
+                owned = self.shard(entry.path) == index
+                if coverage is not None:
+                    coverage.add(entry.path, owned)
+                if owned:
+                    yield entry.path
+                if not is_dir:
+                    continue
+                shard = self._subtree_shard(entry.path)
+                if shard is None:
+                    stack.append((entry.path, False))
+                elif shard == index:
+                    stack.append((entry.path, True))
+
+    def header(self, index, source):
+        """Return the header of a partial result file
+
+        :param index: The shard of the node
+        :type index: int
+        :param source: The scanned root or the manifest
+        :type source: str
+        :rtype: dict
+        """
+        return {
+            "version": FORMAT_VERSION,
+            "shard": index,
+            "shards": self._count,
+            "strategy": self._strategy,
+            "depth": self._depth,
+            "templates": self._digest,
+            "source": str(source),
+        }
+
+
+def header_line(header):
+    return json.dumps({HEADER_KEY: header}) + "\n"
+
+
+def trailer_line(coverage):
+    return json.dumps({TRAILER_KEY: coverage.to_dict()}) + "\n"
+
+
+def read_summary(path):
+    """Read the header and the coverage of a partial result file
+
+    :param path: The partial result file
+    :type path: str
+    :raises errors.ProdexTemplateError: If the file is not complete
+    :return: (header, coverage)
+    :rtype: tuple
+    """
+    with open(path, "rb") as stream:
+        first = stream.readline()
+        size = stream.seek(0, io.SEEK_END)
+        stream.seek(max(0, size - TRAILER_SIZE))
+        last = stream.read().rstrip(b"\n").rpartition(b"\n")[2]
+    try:
+        header = json.loads(first)[HEADER_KEY]
+        coverage = json.loads(last)[TRAILER_KEY]
+    except (ValueError, KeyError, TypeError):
+        raise errors.ProdexTemplateError(
+            "%s is not a complete partial result file" % path
+        )
+    return header, coverage
+
+
+def merge(paths, output):
+    """Check that the partial result files cover all shards of the same
+    job, and write their records in the order of the shards.
+
+    :param paths: The partial result files
+    :type paths: list
+    :param output: The stream on which write the records
+    :type output: io.TextIOBase
+    :raises errors.ProdexTemplateError: If a shard is missing or repeated,
+    if the files are not from the same job or if the decisions of the
+    nodes don't cover all the paths.
+    :return: The summary of the job
+    :rtype: dict
+    """
+    summaries = {}
+    reference = None
+    for path in paths:
+        header, coverage = read_summary(path)
+        job = dict(header)
+        index = job.pop("shard")
+        if reference is None:
+            reference = job
+        elif job != reference:
+            raise errors.ProdexTemplateError(
+                "%s is not a partial result of the same job" % path
+            )
+        if index in summaries:
+            raise errors.ProdexTemplateError(
+                "Shard %s found in %s and %s"
+                % (index, summaries[index][0], path)
+            )
+        summaries[index] = path, coverage
+    if reference is None:
+        raise errors.ProdexTemplateError("No partial result file to merge")
+
+    missing = set(range(reference["shards"])).difference(summaries)
+    if missing:
+        raise errors.ProdexTemplateError(
+            "Missing shards: %s" % ", ".join(str(x) for x in sorted(missing))
+        )
+    coverages = [summaries[x][1] for x in sorted(summaries)]
+    decisions = set((x["seen"], x["fingerprint"]) for x in coverages)
+    owned = sum(x["owned"] for x in coverages)
+    if len(decisions) != 1 or owned != coverages[0]["seen"]:
+        raise errors.ProdexTemplateError(
+            "The shards don't cover all the paths (the source changed "
+            "during the job?)"
+        )
+
+    records = 0
+    for index in sorted(summaries):
+        with open(summaries[index][0], "r", errors="surrogateescape") as f:
+            next(f)
+            for line in f:
+                if line.startswith('{"%s"' % TRAILER_KEY):
+                    break
+                output.write(line)
+                records += 1
+    return {
+        "shards": reference["shards"],
+        "paths": coverages[0]["seen"],
+        "records": records,
+    }
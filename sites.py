@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+#
+# - sites.py -
+#
+# Root paths of each site. The same storage is mounted under different
+# prefixes on each site, paths are translated with a longest-prefix trie.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import collections
+
+import errors
+
+DEFAULT_SITE = "default"
+
+# Where a path has been found: the root name, the sites mounting the storage
+# under this prefix and the rest of the path (always "/" separated)
+Location = collections.namedtuple("Location", "root sites remainder")
+
+
+class SiteMapper(object):
+    """Translate paths between the sites. The root paths of the `paths`
+    section are the ones of the default site, the other sites give their
+    own value for some root paths in the `sites` section:
+
+    .. code-block:: yaml
+
+        sites:
+            london:
+                shot_root: '/mnt/london/project/shot'
+            montreal:
+                shot_root: 'P:\\project\\shot'
+
+    >>> mapper = prodex_template.sites
+    >>> mapper.translate("/mnt/london/project/shot/work/foo.ma", "montreal")
+    >>> 'P:\\project\\shot\\work\\foo.ma'
+
+    Prefixes are matched on whole path components, the longest one wins.
+    Several root paths can share the same value, the first one defined for
+    the destination site is used to translate their paths.
+    """
+
+    def __init__(self, roots, sites=None, **kwargs):
+        super(SiteMapper, self).__init__()
+
+        self._default = kwargs.get("default", DEFAULT_SITE)
+        # Site name: {root name: root path}
+        self._sites = {self._default: {x: str(v) for x, v in roots.items()}}
+        for site, site_roots in (sites or {}).items():
+            if site == self._default:
+                raise errors.ProdexTemplateError(
+                    "The site %s is defined by the paths section" % site
+                )
+            unknown = set(site_roots).difference(roots)
+            if unknown:
+                raise errors.ProdexTemplateError(
+                    "Unknown root paths for the site %s: %s"
+                    % (site, ", ".join(sorted(unknown)))
+                )
+            self._sites[site] = {x: str(v) for x, v in site_roots.items()}
+
+        # Only the sites using them pay the normalization of backslashes
+        self._backslashes = any(
+            "\\" in x for roots in self._sites.values() for x in roots.values()
+        )
+        # Path component: child node. A node ending root paths holds the
+        # list of (root name, sites) under the None key, in definition order.
+        self._trie = {}
+        for site, site_roots in self._sites.items():
+            for name, path in site_roots.items():
+                self._insert(site, name, path)
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, ", ".join(self.sites))
+
+    @property
+    def default(self):
+        """Return the name of the site of the paths section
+
+        :rtype: str
+        """
+        return self._default
+
+    @property
+    def sites(self):
+        """Return the names of all sites, the default one first
+
+        :rtype: list
+        """
+        return list(self._sites)
+
+    def roots(self, site):
+        """Return the root paths of a site
+
+        :param site: The name of the site
+        :type site: str
+        :raises errors.ProdexTemplateError: If the site doesn't exist
+        :return: Dictionnary of root paths (key: root name)
+        :rtype: dict
+        """
+        return self._get_roots(site).copy()
+
+    def _get_roots(self, site):
+        roots = self._sites.get(site)
+        if roots is None:
+            raise errors.ProdexTemplateError(
+                "Unknown site %s, available sites: %s"
+                % (site, ", ".join(self.sites))
+            )
+        return roots
+
+    def _insert(self, site, name, path):
+        node = self._trie
+        for component in path.replace("\\", "/").rstrip("/").split("/"):
+            node = node.setdefault(component, {})
+        found = node.setdefault(None, [])
+        for root, sites in found:
+            if root == name:
+                sites.append(site)
+                return
+        found.append((name, [site]))
+
+    def _find(self, path):
+        """Return the (root name, sites) of the longest prefix of the path and
+        the remainder, or None"""
+        path = str(path)
+        if self._backslashes:
+            path = path.replace("\\", "/")
+        components = path.split("/")
+        node = self._trie
+        found = None
+        for index, component in enumerate(components):
+            node = node.get(component)
+            if node is None:
+                break
+            if None in node:
+                found = node[None], index + 1
+        if found is None:
+            return None
+        roots, length = found
+        return roots, "/".join(components[length:])
+
+    def locate(self, path):
+        """Find the root path under which the path is
+
+        >>> mapper.locate("/mnt/london/project/shot/work/foo.ma")
+        >>> Location(root='shot_root', sites=('london',), remainder='work/foo.ma')
+
+        :param path: The path to locate
+        :type path: str
+        :return: The location or None if the path isn't under a root path
+        :rtype: :class:`Location`
+        """
+        found = self._find(path)
+        if found is None:
+            return None
+        roots, remainder = found
+        name, sites = roots[0]
+        return Location(name, tuple(sites), remainder)
+
+    def _join(self, site, location):
+        prefix = self._get_roots(site).get(location.root)
+        if prefix is None:
+            raise errors.ProdexTemplateError(
+                "No root path %s for the site %s" % (location.root, site)
+            )
+        separator = "\\" if "\\" in prefix else "/"
+        prefix = prefix.rstrip(separator)
+        if not location.remainder:
+            return prefix or separator
+        remainder = location.remainder
+        if separator != "/":
+            remainder = remainder.replace("/", separator)
+        return prefix + separator + remainder
+
+    def translate(self, path, site):
+        """Translate a path of any site into a path of the given site
+
+        :param path: The path to translate
+        :type path: str
+        :param site: The name of the destination site
+        :type site: str
+        :raises errors.ProdexTemplateError: If the path isn't under a root
+        path or if the root path isn't defined for the site
+        :return: The translated path, a string as the destination can use
+        another separator.
+        :rtype: str
+        """
+        found = self._find(path)
+        if found is None:
+            raise errors.ProdexTemplateError(
+                "No root path found for %s" % path
+            )
+        roots, remainder = found
+        site_roots = self._get_roots(site)
+        for name, sites in roots:
+            if name in site_roots:
+                break
+        return self._join(site, Location(name, tuple(sites), remainder))
+
+    def translate_many(self, paths, site, **kwargs):
+        """Translate a stream of paths into paths of the given site. Paths
+        are consumed lazily.
+
+        :param paths: Paths of any site
+        :type paths: iterable
+        :param site: The name of the destination site
+        :type site: str
+        :param discreet: (kwargs) Yield None instead of raising errors
+        :type discreet: bool
+        :raises errors.ProdexTemplateError: If the site doesn't exist
+        :return: Generator of (path, translated path)
+        :rtype: generator
+        """
+        discreet = kwargs.get("discreet", False)
+        # Fail before consuming anything
+        self._get_roots(site)
+        for path in paths:
+            try:
+                yield path, self.translate(path, site)
+            except errors.ProdexTemplateError:
+                if not discreet:
+                    raise
+                yield path, None
+
+    def localize(self, path):
+        """Return the path of the default site, the templates are defined
+        with its root paths. Paths which aren't under a root path or already
+        on the default site are returned as is.
+
+        :param path: A path of any site
+        :type path: str
+        :rtype: str
+        """
+        found = self._find(path)
+        if found is None:
+            return path
+        roots, remainder = found
+        if any(self._default in sites for _, sites in roots):
+            return path
+        name, sites = roots[0]
+        location = Location(name, tuple(sites), remainder)
+        return self._join(self._default, location)
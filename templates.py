@@ -25,47 +25,126 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
 import re
 import yaml
 import pathlib
+import contextlib
 
-from utils import paths_utils, templates_utils
+from utils import paths_utils, templates_utils, filesystem
 from placeholders import (
     StringPlaceholder,
     IntegerPlaceholder,
     PLACEHOLDERS_MAPPING,
 )
+from translator import PathTranslator
+from engines import ENGINES_MAPPING
+from profiler import LoadProfile
+from sites import SiteMapper
+from adaptive import AdaptiveLookup
 import errors
 
 from pprint import pprint
 
 
 class ProdexTemplate(object):
-    def __init__(self, path):
+    def __init__(self, path, **kwargs):
         super(ProdexTemplate, self).__init__()
 
         # Constants
         self.template_path = pathlib.Path(path)
         self._paths = {}
         self._root_paths = {}
+        self._sites = None
         self._content = None
+        # Shared registry (see registry.py), optional
+        self._registry = kwargs.get("registry", None)
+        # Filesystem backend used to read the config files, optional
+        self._filesystem = kwargs.get("filesystem", None)
+        # Filesystem backend of the lookups on the disk (latest...),
+        # optional. A cache of the local filesystem if a TTL is given.
+        self._lookup_filesystem = kwargs.get("lookup_filesystem", None)
+        lookup_ttl = kwargs.get("lookup_ttl", None)
+        if self._lookup_filesystem is None and lookup_ttl is not None:
+            self._lookup_filesystem = filesystem.CachingFileSystem(
+                filesystem.LOCAL_FILESYSTEM, ttl=lookup_ttl
+            )
+        # Compiled artifact (see compiled.py), optional
+        self._artifact = kwargs.get("artifact", None)
+        self._definitions = kwargs.get("definitions", {})
+        # Matching engine of the templates (see engines.py)
+        self._engine = kwargs.get("engine", "reference")
+        if self._engine not in ENGINES_MAPPING:
+            raise errors.ProdexTemplateError(
+                "Unknown engine %s, available engines: %s"
+                % (self._engine, ", ".join(sorted(ENGINES_MAPPING)))
+            )
 
         self._placeholders = {}
         self._templates = {}
         self._strings = {}
-
+        # Placeholder name: ([mandatory for], [optional for]) templates
+        self._fields_index = {}
+        # Template name: (position, number of mandatory placeholders)
+        self._fields_requirements = {}
+        self._fields_free = []
+
+        # Load profile (see profiler.py), optional
+        self._profile = kwargs.get("profile", None) or None
+        if self._profile is True:
+            self._profile = LoadProfile()
+
+        with self._measure("load"):
+            self._load(kwargs.get("content", None))
+
+        # Adaptive lookup (see adaptive.py), optional
+        self._adaptive = kwargs.get("adaptive", None) or None
+        if self._adaptive is True:
+            self._adaptive = AdaptiveLookup(self)
+
+    def _load(self, content):
         # Init vars
-        self._content = paths_utils.recurssive_parser(
-            path=self.template_path, visited=[]
-        )
-        self._paths, self._root_paths = templates_utils.paths_categorization(
-            paths=self._content.get("paths", {})
-        )
+        self._content = content
+        if self._content is None:
+            with self._measure("parse"):
+                self._content = paths_utils.recurssive_parser(
+                    path=self.template_path,
+                    visited=[],
+                    reader=self._registry.read if self._registry else None,
+                    filesystem=self._filesystem,
+                    profile=self._profile,
+                )
+        with self._measure("categorize"):
+            paths, root_paths = templates_utils.paths_categorization(
+                paths=self._content.get("paths", {})
+            )
+            # Root paths of the other sites
+            self._sites = SiteMapper(
+                root_paths, self._content.get("sites") or {}
+            )
+        self._paths, self._root_paths = paths, root_paths
         self._strings = self._content.get("strings", {})
 
         #
-        self._parse_placeholders()
-        self._parse_templates()
+        with self._measure("placeholders"):
+            self._parse_placeholders()
+        with self._measure("templates"):
+            self._parse_templates()
+        with self._measure("index"):
+            self._build_fields_index()
+
+    def _measure(self, phase, name=None):
+        if self._profile is None:
+            return contextlib.nullcontext()
+        return self._profile.measure(phase, name)
+
+    def __reduce_ex__(self, protocol):
+        if not self._artifact:
+            return super(ProdexTemplate, self).__reduce_ex__(protocol)
+        # Pickled by reference to the compiled artifact
+        import compiled
+
+        return compiled.attach, (self._artifact,)
 
     @property
     def templates(self):
@@ -87,6 +166,59 @@ class ProdexTemplate(object):
         """
         return self._placeholders.copy()
 
+    @property
+    def artifact(self):
+        """Return the compiled artifact this configuration is attached to
+
+        :return: The path of the artifact or None
+        :rtype: str
+        """
+        return self._artifact
+
+    @property
+    def engine(self):
+        """Return the name of the matching engine of the templates
+
+        :rtype: str
+        """
+        return self._engine
+
+    @property
+    def load_profile(self):
+        """Return the profile of the load, see :class:`profiler.LoadProfile`
+
+        :return: The profile or None if the load has not been profiled
+        :rtype: :class:`profiler.LoadProfile`
+        """
+        return self._profile
+
+    @property
+    def adaptive(self):
+        """Return the adaptive lookup, see :class:`adaptive.AdaptiveLookup`
+
+        :return: The lookup or None if the templates are tried in the
+        config order
+        :rtype: :class:`adaptive.AdaptiveLookup`
+        """
+        return self._adaptive
+
+    @property
+    def sites(self):
+        """Return the root paths of each site, see :class:`sites.SiteMapper`
+
+        :rtype: :class:`sites.SiteMapper`
+        """
+        return self._sites
+
+    @property
+    def includes(self):
+        """Return a copy of all config files which have been parsed
+
+        :return: List of all config files (the root config included)
+        :rtype: list
+        """
+        return list(self._content.get("includes", []))
+
     @property
     def strings(self):
         """Return a copy of all strings
@@ -126,7 +258,6 @@ class ProdexTemplate(object):
                     parts[index] = found
 
             new_path = pathlib.Path(*parts)
-            template_path["definition"] = new_path
 
             placeholders_found = templates_utils.find_placeholder(
                 path=str(new_path)
@@ -137,45 +268,137 @@ class ProdexTemplate(object):
                 if x in placeholders_found
             }
 
-            template = Template(
+            with self._measure("template", template_name) as measure:
+                template = self._get_template(
+                    template_name, new_path, placeholders
+                )
+            if measure is not None:
+                measure.extra["variations"] = len(template.definitions)
+            self._templates[template_name] = template
+
+    def _get_template(self, template_name, new_path, placeholders):
+        if self._registry:
+            return self._registry.template(
                 definition=new_path,
                 name=template_name,
                 placeholders=placeholders,
+                engine=self._engine,
+                filesystem=self._lookup_filesystem,
             )
-            self._templates[template_name] = template
+        return Template(
+            definition=new_path,
+            name=template_name,
+            placeholders=placeholders,
+            definitions=self._definitions.get(template_name),
+            engine=self._engine,
+            filesystem=self._lookup_filesystem,
+        )
+
+    def _build_fields_index(self):
+        """Index the templates by the placeholders they use. A placeholder
+        is mandatory for a template if all its definitions use it and if it
+        has no default value.
+        """
+        for position, template in enumerate(self._templates.values()):
+            mandatory = 0
+            for name in template.required_placeholders:
+                placeholder = self._placeholders.get(name)
+                if placeholder is not None and placeholder.default:
+                    self._fields_index.setdefault(name, ([], []))[1].append(
+                        template
+                    )
+                    continue
+                mandatory += 1
+                self._fields_index.setdefault(name, ([], []))[0].append(
+                    template
+                )
+            for name in template.optional_placeholders:
+                self._fields_index.setdefault(name, ([], []))[1].append(
+                    template
+                )
+            self._fields_requirements[template.name] = (position, mandatory)
+            if not mandatory:
+                self._fields_free.append(template.name)
 
     def _parse_placeholders(self):
         """Parses placeholders of the configuration"""
         placeholders = self._content.get("placeholders")
         for placehodler_name, attributes in placeholders.items():
+            choices_from = attributes.get("choices_from")
+            if choices_from and not pathlib.Path(choices_from).is_absolute():
+                # Relative to the root config file
+                attributes = dict(attributes)
+                attributes["choices_from"] = str(
+                    self.template_path.parent / choices_from
+                )
+            if self._registry:
+                placeholder = self._registry.placeholder(
+                    name=placehodler_name, attributes=attributes
+                )
+                self._placeholders[placehodler_name] = placeholder
+                continue
             class_object = PLACEHOLDERS_MAPPING.get(attributes.get("type"))
             placeholder = class_object(name=placehodler_name, **attributes)
             self._placeholders[placehodler_name] = placeholder
 
-    def templates_from_path(self, path):
+    def templates_from_path(self, path, **kwargs):
         """Finds templates that matches the given path
 
-        :param path: The path to match against a template
-        :type path: str
+        :param path: The path to match against a template, bytes are
+        matched without decoding the whole path (see
+        :class:`engines.CompiledEngine`)
+        :type path: str or bytes
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :param any_site: (kwargs) The path can be on any site, it is
+        localized on the default site before the matching, optional
+        :type any_site: bool
         :return: List of :class:`Template` or [] if no match could be found.
         :rtype: list
         """
+        if kwargs.pop("any_site", False):
+            path = self._sites.localize(os.fsdecode(path))
+        if self._adaptive is not None:
+            return self._adaptive.templates_from_path(path, **kwargs)
         found = []
         for template_name, template in self._templates.items():
-            if not template.validate(path):
+            if not template.validate(path, **kwargs):
                 continue
             found.append(template)
         return found
 
-    def template_from_path(self, path):
+    def first_template_from_path(self, path, **kwargs):
+        """Finds the first template (in the config order) that matches the
+        given path. Unlike :func:`template_from_path`, the other templates
+        are not tested.
+
+        :param path: The path to match against a template
+        :type path: str
+        :param any_site: (kwargs) The path can be on any site, optional
+        :type any_site: bool
+        :return: :class:`Template` or None if no match could be found.
+        :rtype: :class:`Template`
+        """
+        if kwargs.pop("any_site", False):
+            path = self._sites.localize(os.fsdecode(path))
+        if self._adaptive is not None:
+            return self._adaptive.first_template_from_path(path, **kwargs)
+        for template in self._templates.values():
+            if template.validate(path, **kwargs):
+                return template
+        return None
+
+    def template_from_path(self, path, **kwargs):
         """Finds a template that matches the given path
 
         :param path: The path to match against a template
         :type path: str
+        :param any_site: (kwargs) The path can be on any site, optional
+        :type any_site: bool
         :return: :class:`Template` or None if no match could be found.
         :rtype: :class:`Template`
         """
-        matched_templates = self.templates_from_path(path)
+        matched_templates = self.templates_from_path(path, **kwargs)
 
         if not matched_templates:
             return None
@@ -187,6 +410,179 @@ class ProdexTemplate(object):
                 "Multiple templates found: {}".format(matched_templates)
             )
 
+    def templates_from_fields(self, fields, **kwargs):
+        """Finds templates which can generate a path with the given fields.
+        Placeholders with a default value don't need to be given.
+
+        >>> prodex_template.templates_from_fields({"name": "foo", "version": 1})
+        >>> [<Template maya_shot_work: ...>, <Template maya_shot_publish: ...>]
+
+        :param fields: The placeholders values
+        :type fields: dict
+        :param strict: (kwargs) Only keep templates which use all given
+        fields, optional
+        :type strict: bool
+        :return: List of :class:`Template` (in the config order)
+        :rtype: list
+        """
+        strict = kwargs.get("strict", False)
+        counts = {}
+        for key in fields:
+            mandatory, optional = self._fields_index.get(key, ((), ()))
+            for template in mandatory:
+                counts[template.name] = counts.get(template.name, 0) + 1
+
+        # Templates without mandatory placeholders are always candidates
+        candidates = [
+            name
+            for name, count in counts.items()
+            if count == self._fields_requirements[name][1]
+        ]
+        candidates.extend(self._fields_free)
+        candidates.sort(key=lambda x: self._fields_requirements[x][0])
+        candidates = [self._templates[x] for x in candidates]
+
+        valid = {}  # Placeholder name: the given value is valid
+        found = []
+        for template in candidates:
+            if strict and any(
+                x not in template.required_placeholders
+                and x not in template.optional_placeholders
+                for x in fields
+            ):
+                continue
+            is_valid = True
+            for key, placeholder in template._placeholders.items():
+                if key not in fields:
+                    continue
+                if key not in valid:
+                    valid[key] = placeholder.validate(fields[key])
+                if not valid[key]:
+                    is_valid = False
+                    break
+            if is_valid:
+                found.append(template)
+        return found
+
+    def paths_from_fields(self, fields, **kwargs):
+        """Generate the paths of all templates which can be generated with
+        the given fields. Values are conformed only once for all templates.
+
+        :param fields: The placeholders values
+        :type fields: dict
+        :param strict: (kwargs) Only keep templates which use all given
+        fields, optional
+        :type strict: bool
+        :return: Dictionnary of paths (key: template name)
+        (value: pathlib.Path)
+        :rtype: dict
+        """
+        conformed = {}
+        for key, value in fields.items():
+            placeholder = self._placeholders.get(key)
+            conformed[key] = (
+                placeholder.conform_value(value) if placeholder else value
+            )
+
+        paths = {}
+        for template in self.templates_from_fields(fields, **kwargs):
+            path = template._format_conformed(conformed)
+            if path is not None:
+                paths[template.name] = pathlib.Path(path)
+        return paths
+
+    def translator(self, source, destination, **kwargs):
+        """Get a translator of paths from a template to another one
+
+        >>> translator = prodex_template.translator(
+        ...     "maya_shot_work", "maya_shot_publish"
+        ... )
+        >>> translator.translate("/prod/project/shot/work/maya/foo.v003.ma")
+        >>> PosixPath('/prod/project/shot/publish/maya/foo.v003.ma')
+
+        :param source: The name of the source template
+        :type source: str
+        :param destination: The name of the destination template
+        :type destination: str
+        :param mapping: (kwargs) Destination placeholder name: source
+        placeholder name, optional
+        :type mapping: dict
+        :param defaults: (kwargs) Values of destination placeholders which
+        are not in the source, optional
+        :type defaults: dict
+        :raises errors.ProdexTemplateError: If a template doesn't exist
+        :return: The translator
+        :rtype: :class:`translator.PathTranslator`
+        """
+        for name in (source, destination):
+            if name not in self._templates:
+                raise errors.ProdexTemplateError(
+                    "No template found for %s" % name
+                )
+        return PathTranslator(
+            source=self._templates[source],
+            destination=self._templates[destination],
+            **kwargs
+        )
+
+    def resolve(self, paths, **kwargs):
+        """Resolve a stream of paths. Paths are consumed lazily, so any
+        iterable (a file, a generator...) can be given without loading
+        everything in memory.
+
+        >>> for path, template, fields in prodex_template.resolve(paths):
+        ...     print(path, template, fields)
+
+        :param paths: The paths to resolve (str or bytes)
+        :type paths: iterable
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
+        :param discreet: (kwargs) Don't raise when multiple templates are
+        found, the path is yielded as unmatched instead, optional
+        :type discreet: bool
+        :param any_site: (kwargs) Paths can be on any site, they are
+        yielded as given with the fields found on the default site, optional
+        :type any_site: bool
+        :raises errors.ProdexTemplateError: If multiple templates are found
+        and discreet is False.
+        :return: Generator of (path, template, fields). template is None if
+        no match could be found, fields are empty in this case.
+        :rtype: generator
+        """
+        stats = kwargs.get("stats", None)
+        discreet = kwargs.get("discreet", False)
+        any_site = kwargs.get("any_site", False)
+        for path in paths:
+            if any_site:
+                local_path = self._sites.localize(os.fsdecode(path))
+            else:
+                local_path = path
+            matched_templates = self.templates_from_path(
+                local_path, stats=stats
+            )
+            if stats is not None:
+                stats["paths"] += 1
+            if not matched_templates:
+                if stats is not None:
+                    stats["unmatched"] += 1
+                yield path, None, {}
+                continue
+            if len(matched_templates) > 1:
+                if stats is not None:
+                    stats["ambiguous"] += 1
+                if discreet:
+                    yield path, None, {}
+                    continue
+                raise errors.ProdexTemplateError(
+                    "Multiple templates found: {}".format(matched_templates)
+                )
+            template = matched_templates[0]
+            if stats is not None:
+                stats["resolved"] += 1
+            yield path, template, template.get_placeholders_values(
+                path=local_path
+            )
+
 
 class String(object):
     def __init__(self):
@@ -194,15 +590,36 @@ class String(object):
 
 
 class Template(object):
-    def __init__(self, definition, name, placeholders):
+    def __init__(self, definition, name, placeholders, **kwargs):
 
         self._path = definition
         self._name = name
         self._placeholders = placeholders
 
-        self._all_definitions = templates_utils.find_definition_variations(
-            self._path
+        # Variations can be given when they are already known (compiled)
+        self._all_definitions = kwargs.get("definitions", None)
+        if self._all_definitions is None:
+            self._all_definitions = (
+                templates_utils.find_definition_variations(self._path)
+            )
+        # Placeholders used by each variation
+        self._variations_placeholders = [
+            frozenset(templates_utils.find_placeholder(x))
+            for x in self._all_definitions
+        ]
+        self._required_placeholders = frozenset.intersection(
+            *self._variations_placeholders
         )
+        self._optional_placeholders = (
+            frozenset.union(*self._variations_placeholders)
+            - self._required_placeholders
+        )
+        engine = kwargs.get("engine", "reference")
+        if engine not in ENGINES_MAPPING:
+            raise errors.ProdexTemplateError("Unknown engine %s" % engine)
+        self._engine = ENGINES_MAPPING[engine](self)
+        # Backend of the lookups on the disk, the shared cache if None
+        self._filesystem = kwargs.get("filesystem", None)
 
     def __repr__(self):
         return self._get_repr()
@@ -217,6 +634,15 @@ class Template(object):
             self._path,
         )
 
+    @property
+    def name(self):
+        """Return the name of this template
+
+        :return: The name of this template
+        :rtype: str
+        """
+        return self._name
+
     @property
     def path(self):
         """Return the default path (from the config file) of this template
@@ -236,6 +662,25 @@ class Template(object):
         """
         return self._placeholders.copy()
 
+    @property
+    def required_placeholders(self):
+        """Return the placeholders used by all definitions
+
+        :return: Names of the required placeholders
+        :rtype: frozenset
+        """
+        return self._required_placeholders
+
+    @property
+    def optional_placeholders(self):
+        """Return the placeholders only used by some definitions (they are
+        inside an optional section)
+
+        :return: Names of the optional placeholders
+        :rtype: frozenset
+        """
+        return self._optional_placeholders
+
     @property
     def definitions(self):
         """Return a copy of all definitions found for this template
@@ -245,40 +690,25 @@ class Template(object):
         """
         return self._all_definitions.copy()
 
-    def validate(self, path):
+    @property
+    def engine(self):
+        """Return the name of the matching engine
+
+        :rtype: str
+        """
+        return self._engine.name
+
+    def validate(self, path, **kwargs):
         """Validate or not the given path.
 
         :param path: The path to validate
         :type path: str
+        :param stats: (kwargs) Counter updated with the match stages, optional
+        :type stats: collections.Counter
         :return: True if the path is correct for this template, False if not
         :rtype: bool
         """
-        # 1. Check if the number of parts in the given path correspond
-        # to the number of parts for an existing definition for this template
-        if not templates_utils.parts_matching(
-            path=path, definitions=self.definitions
-        ):
-            return False
-
-        # 2. Try to resolve placeholders. If we found something, the path is
-        # correct, if not, the path doesn't fit the template.
-        resolved_placeholders = self.get_placeholders_values(
-            path=path, discreet=True
-        )
-        if not resolved_placeholders:
-            return False
-
-        # 3. Be sure that we can generate the same path
-        # with the resolved placeholders (ensure the paths are equals)
-        match = False
-        self._conform_input_placeholders(placeholders=resolved_placeholders)
-        for definition in self.definitions:
-            _path = self._set_placeholders_values(
-                definition=definition, placeholders=resolved_placeholders
-            )
-            if str(_path) == path:
-                match = True
-        return match
+        return self._engine.validate(path, **kwargs)
 
     def get_placeholders_values(self, path, **kwargs):
         """Gets the placeholders values from the given path.
@@ -298,92 +728,132 @@ class Template(object):
         :returns: Values found Values in the path based on placeholders in template
         :rtype: dict
         """
-        discreet = kwargs.get("discreet", False)  # False: raise errors
-        error = None
-        # loop through all definitions
-        for definition in self.definitions:
-            resolved = {}  # All resolved placeholders
-            _definition = definition
-            _path = path
-            static_parts = templates_utils.find_static_parts(
-                definition=definition
-            )
-            static_parts.reverse()
-
-            if static_parts[0] not in self.placeholders:
-                static_part = static_parts[0]
-                # The first static_part is not a placeholder. So, transform the path
-                # and the definition in order to start by a placeholder
-                _path = path.rpartition(static_part)[0]
-                _definition = templates_utils.decompose_definition(
-                    definition=definition, static_part=static_part
-                )[0]
-                # Remove the first static_part because we want to start
-                # by a placeholder
-                static_parts = static_parts[1::]
-
-            static_parts = [
-                x for x in static_parts if x not in self.placeholders
-            ]
-            for static_part in static_parts:
-                path_decompose = _path.rpartition(static_part)
-                definition_decompose = templates_utils.decompose_definition(
-                    definition=_definition, static_part=static_part
+        return self._engine.get_placeholders_values(path, **kwargs)
+
+    def latest(self, fields, key="version", **kwargs):
+        """Find the latest value of a placeholder on the disk. Only the
+        directory which contains the varying placeholder is listed.
+
+        >>> template = prodex_template.templates["maya_shot_work"]
+        >>> template.latest({"name": "foo", "maya_extension": "ma"})
+        >>> 3
+
+        :param fields: The values of the other placeholders. Placeholders
+        which are not given (and are in the same directory entry as the key)
+        match anything.
+        :type fields: dict
+        :param key: The varying placeholder, defaults to "version"
+        :type key: str, optional
+        :param filesystem: (kwargs) The filesystem backend, the one of the
+        configuration (see ``lookup_filesystem``) or the shared cache of
+        the local filesystem by default
+        :type filesystem: :class:`utils.filesystem.FileSystem`
+        :raises errors.ProdexTemplateError: If the key is not an integer
+        placeholder of this template.
+        :raises errors.ProdexTemplateMissingPlaceholders: If the directory
+        to list can't be resolved with the given fields.
+        :return: The latest value or None if nothing has been found
+        :rtype: int
+        """
+        backend = kwargs.get("filesystem", None)
+        if backend is None:
+            backend = self._filesystem
+        if backend is None:
+            backend = filesystem.CACHED_FILESYSTEM
+        placeholder = self._placeholders.get(key)
+        if not isinstance(placeholder, IntegerPlaceholder):
+            raise errors.ProdexTemplateError(
+                "{0} is not an integer placeholder of {1}".format(
+                    key, self._name
                 )
+            )
+        directory, pattern, groups = self._get_lookup(fields, key)
+
+        found = None
+        try:
+            names = backend.listdir(directory)
+        except OSError:
+            names = []
+        for name in names:
+            match = pattern.fullmatch(name)
+            if not match:
+                continue
+            text = match.group(groups[key])
+            value = placeholder.sanitize_value(text)
+            if placeholder.conform_value(value) != text:
+                # Not generated by this template (bad padding)
+                continue
+            if not placeholder.validate(value):
+                continue
+            if found is None or value > found:
+                found = value
+        return found
 
-                key = definition_decompose[-1]
-                value = path_decompose[-1]
-
-                placeholder_obj = self.placeholders.get(key.strip("{}"))
-                if not placeholder_obj.validate(value):
-                    # The value is not conform for the given placeholder
-                    error = errors.ProdexTemplatePlaceholderValidation(
-                        "The value {0} is not conform for the placeholder {1}".format(
-                            value, placeholder_obj.name
-                        )
-                    )
-                    break
-
-                # All values are empty
-                if len(set(path_decompose)) == 1:
-                    # path and static_part are not synchronized,
-                    # so it is not the path what we are looking for
-                    error = errors.ProdexTemplatePathSync(
-                        "Path and the static_part aren't synchronised anymore"
-                    )
-                    break
+    def next_value(self, fields, key="version", **kwargs):
+        """Find the next value of a placeholder on the disk (latest + 1)
+
+        :param fields: The values of the other placeholders
+        :type fields: dict
+        :param key: The varying placeholder, defaults to "version"
+        :type key: str, optional
+        :param filesystem: (kwargs) The filesystem backend, optional
+        :type filesystem: :class:`utils.filesystem.FileSystem`
+        :return: The next value (1 if nothing has been found)
+        :rtype: int
+        """
+        latest = self.latest(fields, key=key, **kwargs)
+        return (latest or 0) + 1
+
+    def _get_lookup(self, fields, key):
+        """Get the directory to list and the pattern of its entries in order
+        to find the values of the key.
+
+        :param fields: The values of the other placeholders
+        :type fields: dict
+        :param key: The varying placeholder
+        :type key: str
+        :return: The directory, the compiled pattern and its group ids (see
+        :func:`utils.templates_utils.component_pattern`)
+        :rtype: tuple
+        """
+        if not self._check_input_placeholders(placeholders=fields):
+            raise errors.ProdexTemplatePlaceholderValidation(
+                "Values are not conform for {0}: {1}".format(
+                    self._name, fields
+                )
+            )
+        conformed = self._conform_input_placeholders(
+            placeholders={x: v for x, v in fields.items() if x != key}
+        )
 
-                if placeholder_obj.name in resolved:
-                    # already analysed, check that the value is the same
-                    _value = resolved.get(placeholder_obj.name)
-                    value = placeholder_obj.sanitize_value(value)
-                    if value != _value:
-                        error = errors.ProdexTemplatePlaceholderMultipleValues(
-                            "Got two differents values for the {0} [{1}, {2}]".format(
-                                placeholder_obj.name, _value, value
-                            )
-                        )
+        # Prefer a definition which doesn't need wildcards
+        for wildcards in (False, True):
+            for definition in self.definitions:
+                components = definition.split("/")
+                for index, component in enumerate(components):
+                    if "{%s}" % key in component:
                         break
                 else:
-                    error = None
-                    resolved[
-                        placeholder_obj.name
-                    ] = placeholder_obj.sanitize_value(value)
-
-                _path = path_decompose[0]
-                _definition = definition_decompose[0]
-
-            placeholders = list(
-                set(templates_utils.find_placeholder(definition))
+                    continue
+                parent = "/".join(components[:index])
+                if templates_utils.find_placeholder(
+                    parent.format_map(templates_utils.SafeDict(**conformed))
+                ):
+                    continue
+                names = templates_utils.find_placeholder(component)
+                if not wildcards and any(
+                    x not in conformed for x in names if x != key
+                ):
+                    continue
+                pattern, groups = templates_utils.component_pattern(
+                    component=component, key=key, values=conformed
+                )
+                return parent.format_map(conformed) or "/", pattern, groups
+        raise errors.ProdexTemplateMissingPlaceholders(
+            "Can't find the directory of {0} in {1} with {2}".format(
+                key, self._name, fields
             )
-            if len(placeholders) == len(resolved) and not error:
-                # find all possible values.
-                return resolved
-            else:
-                resolved = {}
-        if not discreet:
-            raise error
-        return resolved
+        )
 
     def set_placeholders_values(self, placeholders):
         """Apply given placeholders to the current template in order
@@ -414,6 +884,32 @@ class Template(object):
                 return pathlib.Path(path)
         return None
 
+    def _format_conformed(self, conformed):
+        """Generate a path from already conformed values. Default values are
+        used for missing placeholders.
+
+        :param conformed: Conformed values (key: placeholder name)
+        :type conformed: dict
+        :return: The generated path or None if values are missing
+        :rtype: str
+        """
+        missing = [
+            x
+            for x in self._placeholders
+            if x not in conformed and self._placeholders[x].default
+        ]
+        if missing:
+            conformed = dict(conformed)
+            for key in missing:
+                conformed[key] = self._placeholders[key].default
+
+        for definition, names in zip(
+            self._all_definitions, self._variations_placeholders
+        ):
+            if all(x in conformed for x in names):
+                return definition.format_map(conformed)
+        return None
+
     def _set_placeholders_values(self, definition, placeholders):
         """Apply placeholders on a definition
 
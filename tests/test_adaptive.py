@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# - test_adaptive.py -
+#
+# Unit testing arround the overlaps analysis and the adaptive lookup.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pytest
+
+from templates import ProdexTemplate
+from utils.overlap import Analysis
+import compiled
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+CONTENT = {
+    "placeholders": {
+        "name": {"type": "str"},
+        "other": {"type": "str"},
+        "version": {"type": "int", "format_spec": 3},
+        "extension": {"type": "str", "choices": ["ma", "mb"]},
+    },
+    "paths": {
+        "any_file": {"definition": "/r/{name}.{other}"},
+        "hip": {"definition": "/r/{name}.hip"},
+        "maya": {"definition": "/r/{name}_v{version}.{extension}"},
+        "versions": {"definition": "/r/v{version}"},
+        "static": {"definition": "/r/vfoo"},
+        "deep": {"definition": "/r/{name}/{other}.hip"},
+    },
+}
+
+PATHS = ["/r/foo.hip", "/r/foo_v001.ma", "/r/v012", "/r/vfoo", "/r/a/b.hip"]
+
+
+def test_overlaps():
+    """Only templates which can't validate the same path are disjoint"""
+    config = ProdexTemplate(path="<test>", content=CONTENT)
+    analysis = Analysis(config.templates.values())
+    assert analysis.overlaps("any_file") == {"hip", "maya"}
+    assert analysis.overlaps("hip") == {"any_file"}
+    assert analysis.exclusive() == {"versions", "static", "deep"}
+
+
+def test_adaptive_order():
+    """Hot templates move first, overlapping templates keep their order"""
+    plain = ProdexTemplate(path="<test>", content=CONTENT)
+    config = ProdexTemplate(path="<test>", content=CONTENT, adaptive=True)
+    lookup = config.adaptive
+    assert lookup.order == list(plain.templates)
+    for path in ["/r/a/b.hip"] * 10 + ["/r/foo_v001.ma"] * 5:
+        config.first_template_from_path(path)
+    lookup.reorder()
+    order = lookup.order
+    assert order[:2] == ["deep", "any_file"]
+    assert order.index("any_file") < order.index("hip")
+    assert order.index("any_file") < order.index("maya")
+    for path in PATHS:
+        first = config.first_template_from_path(path)
+        expected = plain.first_template_from_path(path)
+        assert getattr(first, "name", None) == getattr(expected, "name", None)
+        found = [x.name for x in config.templates_from_path(path)]
+        assert found == [x.name for x in plain.templates_from_path(path)]
+
+
+def test_persist(tmp_path):
+    """The ordering is saved next to the compiled artifact"""
+    artifact = compiled.build(
+        ProdexTemplate(path=CONFIG_FILENAME), str(tmp_path / "config.pxtc")
+    )
+    config = compiled.attach(artifact, adaptive=True)
+    for _ in range(3):
+        config.template_from_path("/prod/project/shot/work/maya/foo.v003.ma")
+    config.adaptive.reorder()
+    assert config.adaptive.order[0] == "maya_shot_work"
+    config.adaptive.save()
+    assert os.path.exists(artifact + ".order")
+
+    warm = compiled.attach(artifact, adaptive=True)
+    assert warm.adaptive.order == config.adaptive.order
+    assert warm.adaptive.scores["maya_shot_work"] == pytest.approx(
+        config.adaptive.scores["maya_shot_work"]
+    )
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+# - test_aggregate.py -
+#
+# Unit testing arround the aggregation of the classification results.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import pytest
+
+from templates import ProdexTemplate
+from aggregate import Aggregator
+from utils import filesystem
+import errors
+import cli
+
+CONTENT = {
+    "placeholders": {
+        "asset": {"type": "str"},
+        "step": {"type": "str", "choices": ["model", "rig"]},
+        "version": {"type": "int", "format_spec": 3},
+        "ext": {"type": "str", "choices": ["ma", "mb"]},
+    },
+    "paths": {
+        "work": {"definition": "/prod/{asset}/{step}/{asset}.v{version}.{ext}"}
+    },
+}
+
+PATHS = [
+    "/prod/foo/model/foo.v001.ma",
+    "/prod/foo/model/foo.v003.mb",
+    "/prod/foo/rig/foo.v002.ma",
+    "/prod/bar/model/bar.v010.ma",
+    "/prod/unknown.txt",
+]
+
+
+@pytest.fixture
+def config():
+    return ProdexTemplate(path="<test>", content=CONTENT, engine="compiled")
+
+
+@pytest.fixture
+def disk():
+    disk = filesystem.MemoryFileSystem()
+    for index, path in enumerate(PATHS):
+        disk.write(path, b"x" * (index + 1))
+    return disk
+
+
+def test_aggregate(config, disk):
+    """Results are grouped by template and placeholders, then reduced"""
+    aggregator = Aggregator(
+        by=["asset"],
+        reducers=["max:version", "min:version", "count", "size", "set:ext"],
+        filesystem=disk,
+    )
+    aggregator.consume(config.resolve(iter(PATHS), discreet=True))
+    assert aggregator.skipped == 1
+    assert list(aggregator.results()) == [
+        {
+            "template": "work",
+            "asset": "bar",
+            "max_version": 10,
+            "min_version": 10,
+            "count": 1,
+            "size": 4,
+            "set_ext": ["ma"],
+        },
+        {
+            "template": "work",
+            "asset": "foo",
+            "max_version": 3,
+            "min_version": 1,
+            "count": 3,
+            "size": 1 + 2 + 3,
+            "set_ext": ["ma", "mb"],
+        },
+    ]
+
+
+def test_merge(config):
+    """Partial aggregations give the result of a single one"""
+    results = list(config.resolve(PATHS, discreet=True))
+    reducers = ["max:version", "count", "set:ext"]
+    expected = Aggregator(by=["asset", "step"], reducers=reducers)
+    expected.consume(results)
+    first = Aggregator(by=["asset", "step"], reducers=reducers)
+    second = Aggregator(by=["asset", "step"], reducers=reducers)
+    first.consume(results[:2])
+    second.consume(results[2:])
+    merged = first.merge(second)
+    assert list(merged.results()) == list(expected.results())
+    assert len(merged) == 3
+    with pytest.raises(ValueError):
+        merged.merge(Aggregator(by=["asset"], reducers=reducers))
+    with pytest.raises(ValueError):
+        Aggregator(reducers=["median:version"])
+    with pytest.raises(ValueError):
+        Aggregator(reducers=["max"])
+
+
+def test_bounds(config):
+    """Groups are limited and templates filtered"""
+    results = config.resolve(PATHS, discreet=True)
+    aggregator = Aggregator(by=["asset", "step"], max_groups=2)
+    with pytest.raises(errors.ProdexTemplateError):
+        aggregator.consume(results)
+    aggregator = Aggregator(templates=["other"])
+    aggregator.consume(config.resolve(PATHS, discreet=True))
+    assert (len(aggregator), aggregator.skipped) == (0, len(PATHS))
+
+
+def test_cli(config, tmp_path, capsys):
+    """The NDJSON results of resolve are aggregated"""
+    results = tmp_path / "results.ndjson"
+    results.write_text(
+        "".join(
+            json.dumps(
+                {
+                    "path": path,
+                    "template": template.name if template else None,
+                    "fields": fields,
+                }
+            )
+            + "\n"
+            for path, template, fields in config.resolve(
+                PATHS, discreet=True
+            )
+        )
+    )
+    code = cli.main(
+        ["aggregate", "--by", "step", "--reduce", "set:asset", str(results)]
+    )
+    assert code == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(x) for x in lines] == [
+        {"template": "work", "step": "model", "set_asset": ["bar", "foo"]},
+        {"template": "work", "step": "rig", "set_asset": ["foo"]},
+    ]
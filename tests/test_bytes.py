@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# - test_bytes.py -
+#
+# Unit testing arround the matching of bytes paths.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import pytest
+
+from templates import ProdexTemplate
+from utils import harness, filesystem
+import cli
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+CONTENT = {
+    "placeholders": {
+        "name": {"type": "str"},
+        "version": {"type": "int", "format_spec": 3},
+    },
+    "paths": {"work": {"definition": "/prod/{name}/{name}.v{version}.ma"}},
+}
+
+
+@pytest.mark.parametrize("engine", ["reference", "compiled", "codegen"])
+def test_same_results(engine):
+    """Bytes paths give the results of the decoded paths"""
+    config = ProdexTemplate(path=CONFIG_FILENAME, engine=engine)
+    paths = [
+        "/prod/project/shot/work/maya/foo.v003.ma",
+        "/prod/project/shot/work/maya/foo.v003.mb.bak",
+        "/prod/project/asset/review/nuke/foo_bar_v001.mov",
+        "/prod/project/shot/work/maya",
+        "/prod/project/shot/work/maya/f\udcffo.v003.ma",
+    ]
+    for path in paths:
+        for template in config.templates.values():
+            for method, kwargs in [
+                ("validate", {}),
+                ("get_placeholders_values", {}),
+            ]:
+                function = getattr(template, method)
+                expected = harness._outcome(function, path, **kwargs)
+                result = harness._outcome(function, os.fsencode(path))
+                assert result == expected
+    found = config.templates_from_path(os.fsencode(paths[0]))
+    assert [x.name for x in found] == ["maya_shot_work"]
+
+
+@pytest.mark.parametrize("engine", ["compiled", "codegen"])
+def test_undecodable(engine):
+    """Names which aren't valid UTF-8 are matched, the values keep the
+    bytes as surrogates"""
+    config = ProdexTemplate(path="<test>", content=CONTENT, engine=engine)
+    template = config.templates["work"]
+    path = b"/prod/caf\xe9/caf\xe9.v012.ma"
+    assert template.validate(path)
+    fields = template.get_placeholders_values(path)
+    assert fields == {"name": "caf\udce9", "version": 12}
+    assert os.fsencode(fields["name"]) == b"caf\xe9"
+    assert os.fsencode(template.set_placeholders_values(dict(fields))) == path
+    assert not template.validate(b"/prod/caf\xe9/cafe.v012.ma")
+
+
+def test_scan_bytes(tmp_path, capsys):
+    """Walk a bytes root and resolve the bytes names"""
+    root = os.fsencode(str(tmp_path))
+    os.mkdir(os.path.join(root, b"sh\xff"))
+    open(os.path.join(root, b"sh\xff", b"sh\xff.v001.ma"), "w").close()
+    paths = list(filesystem.LOCAL_FILESYSTEM.walk(root))
+    assert all(isinstance(x, bytes) for x in paths)
+    config = tmp_path / "config.yml"
+    config.write_text(
+        "placeholders:\n"
+        "    name:\n"
+        "        type: str\n"
+        "    version:\n"
+        "        type: int\n"
+        "        format_spec: 3\n"
+        "paths:\n"
+        "    root: '%s'\n"
+        "    work:\n"
+        "        definition: '@root/{name}/{name}.v{version}.ma'\n" % tmp_path
+    )
+    code = cli.main(
+        ["--config", str(config), "--engine", "compiled"]
+        + ["scan", "--bytes", str(tmp_path)]
+    )
+    assert code == 0
+    record = json.loads(capsys.readouterr().out)
+    assert record["template"] == "work"
+    assert record["fields"] == {"name": "sh\udcff", "version": 1}
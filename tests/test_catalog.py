@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# - test_catalog.py -
+#
+# Unit testing arround the catalog of resolved paths.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pytest
+
+from catalog import Catalog
+from templates import ProdexTemplate
+import errors
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+CACHE_PATH = (
+    "/prod/project/asset/work/houdini/cache/alembic/"
+    "{name}/render/v{version:03d}/{asset}_{name}_v{version:03d}.abc"
+)
+
+
+@pytest.fixture
+def config():
+    return ProdexTemplate(path=CONFIG_FILENAME)
+
+
+@pytest.fixture
+def catalog(tmp_path, config):
+    paths = [
+        CACHE_PATH.format(name=name, asset=asset, version=version)
+        for name in ("foo", "bar")
+        for asset in ("chair", "table")
+        for version in range(1, 13)
+    ]
+    paths.append("/prod/project/shot/work/maya/foo.v003.ma")
+    paths.append("/prod/project/unknown.txt")
+    with Catalog(str(tmp_path / "catalog.db"), config) as catalog:
+        catalog.add(config.resolve(paths, discreet=True), batch_size=10)
+        yield catalog
+
+
+def test_query(catalog):
+    """Query catalogued paths with placeholders predicates"""
+    results = list(
+        catalog.query(
+            templates=["houdini_asset_work_alembic_cache"],
+            name="foo",
+            asset="chair",
+            version=(">=", 10),
+        )
+    )
+    assert [x[2]["version"] for x in results] == [10, 11, 12]
+    assert results[0] == (
+        CACHE_PATH.format(name="foo", asset="chair", version=10),
+        "houdini_asset_work_alembic_cache",
+        {
+            "name": "foo",
+            "asset": "chair",
+            "version": 10,
+            "houdini_node": "render",
+        },
+    )
+    assert catalog.count() == 49
+
+
+def test_update(catalog):
+    """Changed paths are classified again"""
+    path = "/prod/project/shot/work/maya/foo.v003.ma"
+    catalog.update([path])
+    assert catalog.count(["maya_shot_work"]) == 1
+    catalog.add([(path, None, {})])
+    assert catalog.count(["maya_shot_work"]) == 0
+
+
+def test_bytes_paths(catalog, config):
+    """Bytes paths are stored decoded, like str paths"""
+    path = os.fsencode("/prod/project/shot/work/maya/bar.v001.ma")
+    catalog.update([path])
+    results = list(catalog.query(templates=["maya_shot_work"], name="bar"))
+    assert [x[0] for x in results] == [os.fsdecode(path)]
+    catalog.add([(path, config.templates["maya_shot_work"], {"name": "baz"})])
+    assert [x[0] for x in catalog.query(name="baz")] == [os.fsdecode(path)]
+    catalog.remove([path])
+    assert catalog.count(["maya_shot_work"]) == 1
+
+
+def test_query_errors(catalog):
+    """Unknown placeholders and operators are refused"""
+    with pytest.raises(errors.ProdexTemplateError):
+        list(catalog.query(foo=1))
+    with pytest.raises(errors.ProdexTemplateError):
+        list(catalog.query(version=("~", 1)))
+
+
+def test_reopen(tmp_path, config, catalog):
+    """The catalog persists"""
+    catalog.close()
+    with Catalog(catalog.path, config) as reopened:
+        assert reopened.count() == 49
+
+
+def test_reserved_names(tmp_path):
+    """Placeholders named like the fixed columns have their own columns"""
+    config = ProdexTemplate(
+        path="<test>",
+        content={
+            "placeholders": {
+                "path": {"type": "str"},
+                "template": {"type": "str"},
+            },
+            "paths": {"work": {"definition": "/prod/{path}/{template}.ma"}},
+        },
+    )
+    with Catalog(str(tmp_path / "catalog.db"), config) as catalog:
+        catalog.add(config.resolve(["/prod/foo/bar.ma"], discreet=True))
+        assert list(catalog.query(template="bar")) == [
+            ("/prod/foo/bar.ma", "work", {"path": "foo", "template": "bar"})
+        ]
+        assert catalog.count(templates=["work"]) == 1
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# - test_choices.py -
+#
+# Unit testing arround the choices providers.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import pytest
+
+from templates import ProdexTemplate
+from placeholders import IntegerPlaceholder, StringPlaceholder
+import choices
+import errors
+
+CONFIG = """
+placeholders:
+    asset:
+        type: str
+        choices_from: assets.csv
+        choices_column: name
+    name:
+        type: str
+paths:
+    asset_work:
+        definition: /prod/{asset}/{name}.ma
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_providers():
+    choices.clear()
+    yield
+    choices.clear()
+
+
+def test_file_choices_config(tmp_path):
+    """Choices of a CSV file relative to the config, shared by configs"""
+    (tmp_path / "assets.csv").write_text("id,name\n1,chair\n2,table\n")
+    (tmp_path / "template.yml").write_text(CONFIG)
+    config = ProdexTemplate(path=str(tmp_path / "template.yml"))
+    template = config.templates["asset_work"]
+    assert template.validate("/prod/chair/foo.ma")
+    assert not template.validate("/prod/lamp/foo.ma")
+
+    other = ProdexTemplate(path=str(tmp_path / "template.yml"))
+    assert (
+        other.placeholders["asset"].choices
+        is config.placeholders["asset"].choices
+    )
+
+
+def test_file_choices_refresh(tmp_path):
+    """The file is read again when the ttl expires and it changed"""
+    path = tmp_path / "assets.json"
+    path.write_text(json.dumps([{"name": "chair"}]))
+    provider = choices.file_choices(str(path), column="name", ttl=0)
+    assert "chair" in provider
+    path.write_text(json.dumps([{"name": "table"}]))
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert "table" in provider
+    assert "chair" not in provider
+
+
+def test_file_choices_invalid(tmp_path):
+    """A value which can't be converted is reported with its file"""
+    path = tmp_path / "versions.txt"
+    path.write_text("1\n2\nfoo\n")
+    version = IntegerPlaceholder(
+        name="version", type="int", choices_from=str(path)
+    )
+    with pytest.raises(errors.ProdexTemplateError) as error:
+        version.validate(1)
+    assert str(path) in str(error.value)
+    assert "'foo'" in str(error.value)
+
+
+def test_callable_choices():
+    """Choices returned by a callable, converted for integers"""
+    calls = []
+
+    def get_versions():
+        calls.append(1)
+        return ["1", "2", "10"]
+
+    version = IntegerPlaceholder(
+        name="version", type="int", choices=get_versions
+    )
+    assert version.validate("10")
+    assert not version.validate("3")
+    assert calls == [1]
+
+    asset = StringPlaceholder(
+        name="asset", type="str", choices=lambda: ["chair", "chain", "table"]
+    )
+    assert asset.choices.startswith("cha") == ["chain", "chair"]
+    assert asset.choices.startswith("z") == []
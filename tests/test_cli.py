@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#
+# - test_cli.py -
+#
+# Unit testing arround the command line.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import pytest
+
+import cli
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+
+@pytest.fixture
+def paths_file(tmp_path):
+    path = tmp_path / "paths.txt"
+    path.write_text(
+        "\0".join(
+            [
+                "/prod/project/shot/work/maya/foo.v003.ma",
+                "/prod/project/unknown/foo.txt",
+            ]
+        )
+    )
+    return str(path)
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_resolve(paths_file, capsys, jobs):
+    """Resolve NUL delimited paths into NDJSON"""
+    code = cli.main(
+        ["--config", CONFIG_FILENAME, "--jobs", jobs, "resolve", "-0"]
+        + [paths_file]
+    )
+    lines = capsys.readouterr().out.splitlines()
+    assert code == 0
+    assert [json.loads(x) for x in lines] == [
+        {
+            "path": "/prod/project/shot/work/maya/foo.v003.ma",
+            "template": "maya_shot_work",
+            "fields": {"name": "foo", "version": 3, "maya_extension": "ma"},
+        },
+        {
+            "path": "/prod/project/unknown/foo.txt",
+            "template": None,
+            "fields": {},
+        },
+    ]
+
+
+def test_format(tmp_path, capsys):
+    """Generate paths from NDJSON fields"""
+    records = tmp_path / "fields.ndjson"
+    records.write_text(
+        json.dumps(
+            {
+                "template": "maya_asset_publish",
+                "fields": {"name": "foo", "version": 1},
+            }
+        )
+    )
+    code = cli.main(["--config", CONFIG_FILENAME, "format", str(records)])
+    assert code == 0
+    assert capsys.readouterr().out == (
+        "/prod/project/asset/publish/maya/foo.v001.ma\n"
+    )
+
+
+def test_format_errors(tmp_path, capsys):
+    """Records which aren't objects are reported, the others formatted"""
+    record = {
+        "template": "maya_asset_publish",
+        "fields": {"name": "foo", "version": 1},
+    }
+    records = tmp_path / "fields.ndjson"
+    records.write_text(
+        "\n".join(
+            [
+                "[1, 2]",
+                '"x"',
+                '{"template": "maya_asset_publish", "fields": [1]}',
+                "{",
+                json.dumps(record),
+            ]
+        )
+    )
+    cli.main(["--config", CONFIG_FILENAME, "format", str(records)])
+    captured = capsys.readouterr()
+    assert captured.out == "/prod/project/asset/publish/maya/foo.v001.ma\n"
+    assert captured.err.count("error: ") == 4
+    assert "Not a JSON object" in captured.err
+
+
+def test_scan_stats(tmp_path, capsys):
+    """Scan a directory and print the match stages counters"""
+    config = tmp_path / "config.yml"
+    config.write_text(
+        "placeholders:\n"
+        "    name:\n"
+        "        type: str\n"
+        "    version:\n"
+        "        type: int\n"
+        "        format_spec: 3\n"
+        "paths:\n"
+        "    root: '%s'\n"
+        "    work:\n"
+        "        definition: '@root/{name}.v{version}.ma'\n" % tmp_path
+    )
+    (tmp_path / "foo.v001.ma").write_text("")
+    code = cli.main(
+        ["--config", str(config), "--stats", "scan", str(tmp_path)]
+    )
+    captured = capsys.readouterr()
+    assert code == 0
+    assert json.loads(captured.out) == {
+        "path": str(tmp_path / "foo.v001.ma"),
+        "template": "work",
+        "fields": {"name": "foo", "version": 1},
+    }
+    assert "resolved: 1" in captured.err
+    assert "rejected_values: 1" in captured.err
+
+
+def test_validate_config(capsys):
+    """A correct configuration is validated"""
+    assert cli.main(["--config", CONFIG_FILENAME, "validate-config"]) == 0
+    assert "templates" in capsys.readouterr().out
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# - test_codegen.py -
+#
+# Unit testing arround the generated matching functions.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import collections
+import pytest
+
+from templates import ProdexTemplate
+from utils import codegen, harness
+import compiled
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+
+@pytest.fixture
+def config():
+    return ProdexTemplate(path=CONFIG_FILENAME, engine="codegen")
+
+
+def test_generated_source(config):
+    """Each template has its own functions, identical sources share the
+    same code"""
+    template = config.templates["maya_shot_work"]
+    assert "def match(path):" in template._engine.source
+    assert codegen.CODE_CACHE[template._engine.digest] is template._engine.code
+    path = "/prod/project/shot/work/maya/foo.v003.ma"
+    stats = collections.Counter()
+    assert template.validate(path, stats=stats)
+    assert stats == {"tested": 1, "matched": 1}
+    assert template.get_placeholders_values(path) == {
+        "name": "foo",
+        "version": 3,
+        "maya_extension": "ma",
+    }
+
+
+def test_same_results():
+    """No divergence with the reference engine on random configurations"""
+    report = harness.run("codegen", iterations=4, paths=50, seed=3)
+    assert report["divergences"] == []
+
+
+def test_artifact_code(config, tmp_path, monkeypatch):
+    """The code objects are kept by the compiled artifacts"""
+    artifact = compiled.build(config, str(tmp_path / "config.pxtc"))
+    monkeypatch.setattr(codegen, "CODE_CACHE", {})
+
+    def fail(*args):
+        raise AssertionError("compiled again")
+
+    monkeypatch.setattr(codegen, "compile", fail, raising=False)
+    attached = compiled.attach(artifact)
+    path = "/prod/project/shot/work/maya/foo.v003.ma"
+    assert attached.templates["maya_shot_work"].validate(path)
+
+
+def test_choices_changes():
+    """The engines agree when the choices change after the generation"""
+    configs = [
+        ProdexTemplate(path=CONFIG_FILENAME, engine=x)
+        for x in ("reference", "compiled", "codegen")
+    ]
+    path = "/prod/project/shot/work/maya/foo.v003.mb"
+    for config in configs:
+        assert config.template_from_path(path).name == "maya_shot_work"
+        placeholder = config.placeholders["maya_extension"]
+        placeholder.choices = list(placeholder.choices) + ["abc"]
+    changed = path.replace(".mb", ".abc")
+    found = [config.template_from_path(changed) for config in configs]
+    assert [x and x.name for x in found] == ["maya_shot_work"] * 3
+    for config in configs:
+        config.placeholders["maya_extension"].choices = ["ma"]
+    found = [config.template_from_path(path) for config in configs]
+    assert found == [None, None, None]
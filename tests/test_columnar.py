@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# - test_columnar.py -
+#
+# Unit testing arround the columnar results.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pytest
+
+from columnar import resolve_columnar
+from templates import ProdexTemplate
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+PATHS = [
+    "/prod/project/shot/work/maya/foo.v003.ma",
+    "/prod/project/unknown.txt",
+    "/prod/project/shot/work/maya/snapshots/foo/bar_foo.v001.12h.mb",
+    "/prod/project/shot/work/maya/foo.v004.ma",
+]
+
+
+@pytest.fixture
+def result():
+    config = ProdexTemplate(path=CONFIG_FILENAME)
+    return resolve_columnar(config, PATHS, keep_paths=True)
+
+
+def test_rows(result):
+    """Rows are decoded back into the original fields"""
+    assert len(result) == 4
+    assert result.paths == PATHS
+    assert list(result.rows()) == [
+        (
+            "maya_shot_work",
+            {"name": "foo", "version": 3, "maya_extension": "ma"},
+        ),
+        (None, {}),
+        (
+            "maya_shot_snapshot",
+            {
+                "name": "foo",
+                "version": 1,
+                "maya_extension": "mb",
+                "shot": "bar",
+                "timestamp": "12h",
+            },
+        ),
+        (
+            "maya_shot_work",
+            {"name": "foo", "version": 4, "maya_extension": "ma"},
+        ),
+    ]
+
+
+def test_dictionary_encoding(result):
+    """Repeated values are stored once"""
+    assert result.dictionary.values.count("foo") == 1
+    assert result.columns["version"].typecode == "q"
+    assert list(result.columns["version"])[-1] == 4
+
+
+def test_to_numpy(result):
+    """Convert the columns into a structured array"""
+    numpy = pytest.importorskip("numpy")
+    data, values = result.to_numpy()
+    assert list(data["template"]) == [0, -1, 1, 0]
+    assert data["version"][3] == 4
+    assert values[data["name"][0]] == "foo"
+    assert isinstance(data, numpy.ndarray)
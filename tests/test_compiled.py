@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# - test_compiled.py -
+#
+# Unit testing arround the compiled configurations.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pickle
+import shutil
+import pytest
+
+from templates import ProdexTemplate
+import compiled
+import errors
+
+SCRIPT_PATH = os.path.dirname(__file__)
+FIXTURES_PATH = os.path.join(SCRIPT_PATH, "fixtures")
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    for name in ("template.yml", "template_nuke.yml"):
+        shutil.copy(os.path.join(FIXTURES_PATH, name), str(tmp_path))
+    return str(tmp_path / "template.yml")
+
+
+@pytest.fixture
+def artifact(tmp_path, config_path):
+    config = ProdexTemplate(path=config_path)
+    return compiled.build(config, str(tmp_path / "template.pxtc"))
+
+
+def test_attach(config_path, artifact):
+    """An attached configuration has the same templates"""
+    config = ProdexTemplate(path=config_path)
+    attached = compiled.attach(artifact)
+    assert attached.artifact == artifact
+    assert sorted(attached.templates) == sorted(config.templates)
+    for name, template in config.templates.items():
+        assert attached.templates[name].definitions == template.definitions
+    path = "/prod/project/shot/work/maya/foo.v003.ma"
+    assert attached.template_from_path(path).name == "maya_shot_work"
+
+
+def test_pickle_by_reference(artifact):
+    """An attached configuration is pickled by reference"""
+    config = compiled.attach(artifact)
+    data = pickle.dumps(config)
+    assert len(data) < 256
+    assert sorted(pickle.loads(data).templates) == sorted(config.templates)
+
+
+def test_stale(config_path, artifact):
+    """The artifact is stale when a config file changes"""
+    assert not compiled.is_stale(artifact)
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert compiled.is_stale(artifact)
+    compiled.load(config_path, artifact)
+    assert not compiled.is_stale(artifact)
+
+
+def test_not_an_artifact(config_path):
+    """A config file can't be attached"""
+    with pytest.raises(errors.ProdexTemplateError):
+        compiled.attach(config_path)
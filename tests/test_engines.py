@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# - test_engines.py -
+#
+# Unit testing arround the matching engines.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pytest
+
+from templates import ProdexTemplate
+from utils import harness
+import compiled
+import errors
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+
+@pytest.fixture
+def configs():
+    return (
+        ProdexTemplate(path=CONFIG_FILENAME),
+        ProdexTemplate(path=CONFIG_FILENAME, engine="compiled"),
+    )
+
+
+def test_engine_selection(configs):
+    """The reference engine is the default one"""
+    reference, other = configs
+    assert reference.engine == "reference"
+    assert other.engine == "compiled"
+    assert other.templates["maya_shot_work"].engine == "compiled"
+    with pytest.raises(errors.ProdexTemplateError):
+        ProdexTemplate(path=CONFIG_FILENAME, engine="foo")
+
+
+def test_compiled_same_results(configs):
+    """Both engines give the same results on the example config"""
+    reference, other = configs
+    paths = [
+        "/prod/project/shot/work/maya/foo.v003.ma",
+        "/prod/project/shot/work/maya/foo.v003.mb.bak",
+        "/prod/project/shot/publish/maya/foo.v003.mb",
+        "/prod/project/asset/review/nuke/foo_bar_v001.mov",
+        "/prod/project/shot/work/maya",
+    ]
+    for path in paths:
+        assert harness.compare(path, reference, other) == []
+    expected = [x.name for x in reference.templates_from_path(paths[0])]
+    assert expected
+    assert [x.name for x in other.templates_from_path(paths[0])] == expected
+
+
+def test_compiled_artifact(configs, tmp_path):
+    """The engine is kept by the compiled artifacts"""
+    artifact = compiled.build(configs[1], str(tmp_path / "config.pxtc"))
+    assert compiled.attach(artifact).engine == "compiled"
+
+
+def test_harness():
+    """No divergence on random configurations"""
+    report = harness.run("compiled", iterations=4, paths=50, seed=7)
+    assert report["paths"] == 200
+    assert report["divergences"] == []
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# - test_exporters.py -
+#
+# Unit testing arround the export of the templates as filters.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import re
+import random
+import sqlite3
+import pytest
+
+from templates import ProdexTemplate
+from utils import harness, synthetic
+import exporters
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+
+@pytest.fixture
+def config():
+    content = synthetic.generate_content(templates=20, optionals=2, seed=4)
+    return ProdexTemplate(path="<synthetic>", content=content)
+
+
+@pytest.fixture
+def paths(config):
+    rnd = random.Random(4)
+    paths = [x for x, _ in synthetic.generate_paths(config, 300, seed=4)]
+    return paths + [harness.mutate(x, rnd) for x in paths]
+
+
+def test_regex(config, paths):
+    """Valid paths always match the regex, the residual check is exact"""
+    for template in config.templates.values():
+        ere = re.compile(exporters.posix_ere(template))
+        pcre = re.compile(exporters.pcre(template))
+        valid = [x for x in paths if template.validate(x)]
+        candidates = [x for x in paths if pcre.match(x)]
+        assert set(valid).issubset(candidates)
+        assert set(valid).issubset(x for x in paths if ere.match(x))
+        assert [x for x, _ in exporters.residual(template, candidates)] == (
+            valid
+        )
+
+
+@pytest.mark.parametrize("operator", ["GLOB", "LIKE"])
+def test_sql(config, paths, operator):
+    """The SQL filters select a few candidates, valid paths included"""
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE files (path TEXT)")
+    connection.executemany(
+        "INSERT INTO files VALUES (?)", [(x,) for x in paths]
+    )
+    for template in config.templates.values():
+        clause, params = exporters.sql_where(template, operator=operator)
+        rows = connection.execute(
+            "SELECT path FROM files WHERE " + clause, params
+        )
+        candidates = [x[0] for x in rows]
+        valid = [x for x in paths if template.validate(x)]
+        assert len(candidates) < len(paths)
+        matched = exporters.residual(template, candidates)
+        assert sorted(x for x, _ in matched) == sorted(valid)
+
+
+def test_escape():
+    """Special characters of the definitions are escaped"""
+    config = ProdexTemplate(path=CONFIG_FILENAME)
+    template = config.templates["maya_shot_work"]
+    assert exporters.sqlite_glob(template) == [
+        "/prod/project/shot/work/maya/*.v[0-9][0-9][0-9]*.*"
+    ]
+    assert exporters.sql_like(template) == [
+        "/prod/project/shot/work/maya/%.v___%.%"
+    ]
+    assert exporters.posix_ere(template) == (
+        r"^(/prod/project/shot/work/maya/.*\.v[0-9]{3,}\.(ma|mb))$"
+    )
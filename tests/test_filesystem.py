@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# - test_filesystem.py -
+#
+# Unit testing arround the filesystem backends.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pickle
+import pytest
+
+from templates import ProdexTemplate
+from utils.filesystem import (
+    CachingFileSystem,
+    LocalFileSystem,
+    MemoryFileSystem,
+)
+
+SCRIPT_PATH = os.path.dirname(__file__)
+FIXTURES_PATH = os.path.join(SCRIPT_PATH, "fixtures")
+
+
+@pytest.fixture
+def memory():
+    return MemoryFileSystem.from_paths(
+        [
+            "/prod/project/shot/work/maya/foo.v001.ma",
+            "/prod/project/shot/work/maya/foo.v002.ma",
+            "/prod/project/shot/work/maya/snapshots/",
+        ]
+    )
+
+
+def test_memory_filesystem(memory):
+    """Populate a filesystem from paths"""
+    assert sorted(memory.listdir("/prod/project/shot/work/maya")) == [
+        "foo.v001.ma",
+        "foo.v002.ma",
+        "snapshots",
+    ]
+    assert memory.exists("/prod/project/shot/work/maya/snapshots")
+    assert not memory.exists("/prod/project/asset")
+    assert list(memory.walk("/prod/project/shot/work/maya")) == [
+        "/prod/project/shot/work/maya/foo.v001.ma",
+        "/prod/project/shot/work/maya/foo.v002.ma",
+        "/prod/project/shot/work/maya/snapshots",
+    ]
+    with pytest.raises(OSError):
+        memory.listdir("/prod/project/asset")
+
+
+def test_size(memory, tmp_path):
+    """Size of the files, 0 for the directories, None if missing"""
+    memory.write("/prod/foo.ma", b"abc")
+    assert memory.size("/prod/foo.ma") == 3
+    assert memory.size("/prod/project") == 0
+    assert memory.size("/prod/bar.ma") is None
+    (tmp_path / "foo.ma").write_bytes(b"abcd")
+    local = CachingFileSystem(LocalFileSystem())
+    assert local.size(str(tmp_path / "foo.ma")) == 4
+    assert local.size(str(tmp_path)) == 0
+    assert local.size(str(tmp_path / "bar.ma")) is None
+
+
+def test_caching_filesystem(memory):
+    """Listings are cached until the directory changes"""
+    cache = CachingFileSystem(memory, ttl=60)
+    directory = "/prod/project/shot/work/maya"
+    assert len(cache.listdir(directory)) == 3
+    memory.write(directory + "/foo.v003.ma", b"")
+    assert len(cache.listdir(directory)) == 3
+    cache.invalidate(directory)
+    assert len(cache.listdir(directory)) == 4
+
+
+def test_caching_filesystem_mtime(memory, monkeypatch):
+    """Once expired, a listing is only refreshed if the mtime changed"""
+    calls = []
+    scandir = memory.scandir
+    monkeypatch.setattr(
+        memory, "scandir", lambda x: calls.append(x) or scandir(x)
+    )
+    cache = CachingFileSystem(memory, ttl=0)
+    directory = "/prod/project/shot/work/maya"
+    cache.listdir(directory)
+    cache.listdir(directory)
+    assert len(calls) == 1
+    memory.write(directory + "/foo.v003.ma", b"")
+    assert len(cache.listdir(directory)) == 4
+    assert len(calls) == 2
+
+
+def test_caching_filesystem_bounded(memory):
+    """The least recently used listings are dropped"""
+    cache = CachingFileSystem(memory, ttl=60, max_listings=2)
+    cache.listdir("/prod")
+    cache.listdir("/prod/project")
+    cache.listdir("/prod")
+    cache.listdir("/prod/project/shot")
+    assert len(cache._listings) == 2
+    assert list(cache._listings) == ["/prod", "/prod/project/shot"]
+    local = pickle.loads(pickle.dumps(CachingFileSystem(LocalFileSystem())))
+    assert local.listdir(FIXTURES_PATH) and len(local._listings) == 1
+
+
+def test_caching_filesystem_symlinks(tmp_path):
+    """Symlinks to directories are not followed by the walk"""
+    (tmp_path / "foo").mkdir()
+    (tmp_path / "foo" / "loop").symlink_to(tmp_path)
+    cache = CachingFileSystem(LocalFileSystem(), ttl=60)
+    entry = cache.scandir(str(tmp_path / "foo"))[0]
+    assert entry.is_dir() and entry.is_symlink()
+    assert not entry.is_dir(follow_symlinks=False)
+    assert list(cache.walk(str(tmp_path))) == [
+        str(tmp_path / "foo"),
+        str(tmp_path / "foo" / "loop"),
+    ]
+
+
+def test_lookup_filesystem(memory):
+    """A configuration can have its own lookup backend"""
+    config = ProdexTemplate(
+        path=os.path.join(FIXTURES_PATH, "template.yml"),
+        lookup_filesystem=memory,
+    )
+    template = config.templates["maya_shot_work"]
+    fields = {"name": "foo", "maya_extension": "ma"}
+    assert template.latest(fields) == 2
+    config = ProdexTemplate(
+        path=os.path.join(FIXTURES_PATH, "template.yml"), lookup_ttl=1
+    )
+    backend = config.templates["maya_shot_work"]._filesystem
+    assert isinstance(backend, CachingFileSystem)
+    assert backend.ttl == 1
+
+
+def test_load_config_from_memory():
+    """Load the configuration from an in-memory filesystem"""
+    memory = MemoryFileSystem()
+    local = LocalFileSystem()
+    for name in ("template.yml", "template_nuke.yml"):
+        memory.write(
+            "/configs/" + name, local.read(os.path.join(FIXTURES_PATH, name))
+        )
+    config = ProdexTemplate(path="/configs/template.yml", filesystem=memory)
+    assert "nuke_shot_work" in config.templates
+
+
+def test_latest_in_memory(memory):
+    """Versions lookup without any disk"""
+    config = ProdexTemplate(
+        path=os.path.join(FIXTURES_PATH, "template.yml")
+    )
+    template = config.templates["maya_shot_work"]
+    assert template.next_value({"name": "foo"}, filesystem=memory) == 3
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+# - test_impact.py -
+#
+# Unit testing arround the impact of configuration changes.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import copy
+import pytest
+
+from templates import ProdexTemplate
+from impact import ConfigDiff
+from utils import synthetic
+
+CONTENT = {
+    "placeholders": {
+        "name": {"type": "str"},
+        "version": {"type": "int", "format_spec": 3},
+        "extension": {"type": "str", "choices": ["ma", "mb"]},
+    },
+    "strings": {"maya_file": "{name}.v{version}.{extension}"},
+    "paths": {
+        "shot_root": "/prod/shot",
+        "asset_root": "/prod/asset",
+        "shot_work": {"definition": "@shot_root/work/@maya_file"},
+        "shot_cache": {"definition": "@shot_root/cache/{name}.abc"},
+        "asset_work": {"definition": "@asset_root/work/{name}.v{version}.ma"},
+        "asset_publish": {"definition": "@asset_root/publish/{name}.ma"},
+    },
+}
+
+
+def _load(content, engine="reference"):
+    return ProdexTemplate(
+        path="<test>", content=copy.deepcopy(content), engine=engine
+    )
+
+
+def test_diff():
+    """Changes through references and placeholders are reported"""
+    content = copy.deepcopy(CONTENT)
+    content["paths"]["shot_root"] = "/mnt/shot"
+    content["strings"]["maya_file"] = "{name}_v{version}.{extension}"
+    content["placeholders"]["version"]["format_spec"] = 4
+    del content["paths"]["asset_publish"]
+    content["paths"]["asset_cache"] = {"definition": "@asset_root/{name}"}
+    diff = ConfigDiff(_load(CONTENT), _load(content))
+    assert diff.to_dict() == {
+        "added": ["asset_cache"],
+        "removed": ["asset_publish"],
+        "changed": {
+            "shot_work": [
+                "root shot_root",
+                "string maya_file",
+                "placeholder version",
+            ],
+            "shot_cache": ["root shot_root"],
+            "asset_work": ["placeholder version"],
+        },
+    }
+    assert not ConfigDiff(_load(CONTENT), _load(CONTENT))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_reclassify(seed):
+    """Reclassifying the affected paths gives the full classification"""
+    content = synthetic.generate_content(templates=60, seed=seed)
+    old = _load(content, engine="compiled")
+    paths = [x for x, _ in synthetic.generate_paths(old, 1000, seed=seed)]
+    stored = {
+        path: template.name if template else None
+        for path, template, _ in old.resolve(paths, discreet=True)
+    }
+
+    names = [x for x, y in content["paths"].items() if isinstance(y, dict)]
+    content["placeholders"]["extension"]["choices"].remove("ma")
+    content["paths"]["root_1"] = "/mnt/project_1"
+    content["paths"]["duplicate"] = dict(content["paths"][names[0]])
+    del content["paths"][names[1]]
+    new = _load(content, engine="compiled")
+
+    diff = ConfigDiff(old, new)
+    affected = list(diff.affected(stored.items()))
+    assert 0 < len(affected) < len(paths)
+    for path, template, _ in diff.reclassify(stored.items()):
+        stored[path] = template.name if template else None
+    assert stored == {
+        path: template.name if template else None
+        for path, template, _ in new.resolve(paths, discreet=True)
+    }
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# - test_lint.py -
+#
+# Unit testing arround the cost analysis of the templates.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import pytest
+
+from templates import ProdexTemplate
+import lint
+
+CONTENT = {
+    "placeholders": {
+        "shot": {"type": "str"},
+        "name": {"type": "str"},
+        "step": {"type": "str", "choices": ["anim", "fx"]},
+        "version": {"type": "int", "format_spec": 3},
+        "ext": {"type": "str", "choices": ["ma", "mb"]},
+    },
+    "paths": {
+        "clean": {"definition": "/prod/{shot}/{step}/v{version}/scene.{ext}"},
+        "ambiguous": {
+            "definition": "/prod/{shot}/{name}_{step}_v{version}.{ext}"
+        },
+        "adjacent": {"definition": "/prod/{shot}/{step}{version}.{ext}"},
+        "optionals": {
+            "definition": "/prod/{shot}[/{step}][/v{version}]/{name}"
+        },
+    },
+}
+
+
+@pytest.fixture
+def costs():
+    config = ProdexTemplate(path="<test>", content=CONTENT, engine="compiled")
+    return {x.name: x for x in lint.analyze(config)}
+
+
+def test_analyze(costs):
+    """Each problem is counted in its own metric"""
+    clean = costs["clean"]
+    assert (clean.variations, clean.adjacent, clean.ambiguity) == (1, 0, 0)
+    assert clean.unanchored == 0
+    assert costs["ambiguous"].ambiguity == 1
+    assert costs["ambiguous"].adjacent == 0
+    assert costs["adjacent"].adjacent == 1
+    optionals = costs["optionals"]
+    assert (optionals.variations, optionals.optionals) == (4, 2)
+    assert optionals.unanchored == 4
+    assert optionals.score > clean.score
+    assert optionals.to_dict()["score"] == optionals.score
+
+
+def test_worst(costs):
+    """The most expensive templates come first"""
+    worst = lint.worst(costs.values(), 2)
+    assert [x.name for x in worst] == ["adjacent", "optionals"]
+
+
+def test_check(costs):
+    """Violations are reported against the maximums"""
+    violations = lint.check(costs.values())
+    assert violations == [("adjacent", "adjacent", 1, 0)]
+    violations = lint.check(costs.values(), adjacent=None, variations=2)
+    assert violations == [("optionals", "variations", 4, 2)]
+    with pytest.raises(ValueError):
+        lint.check(costs.values(), speed=1)
@@ -96,3 +96,16 @@ def test_choice_integer_validation(
 # def test_format_spec_integer_validation(integer_placeholder_format_spec, integer, expected):
 #     """Test the validation with the format spec"""
 #     assert integer_placeholder_format_spec.validate(integer) == expected
+
+
+def test_choices_changes():
+    """Static choices are frozen, validation follows the new choices"""
+    values = ["anim", "fx"]
+    placeholder = StringPlaceholder(name="step", type="str", choices=values)
+    values.append("light")
+    assert placeholder.choices == ("anim", "fx")
+    assert not placeholder.validate("light")
+    assert placeholder.container == frozenset(["anim", "fx"])
+    placeholder.choices = {"comp": "Compositing"}
+    assert placeholder.validate("comp")
+    assert not placeholder.validate("anim")
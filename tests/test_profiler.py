@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# - test_profiler.py -
+#
+# Unit testing arround the load profile.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+
+from templates import ProdexTemplate
+from profiler import LoadProfile
+import cli
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+
+def test_load_profile():
+    """Phases, files and templates are measured"""
+    config = ProdexTemplate(path=CONFIG_FILENAME, profile=True)
+    profile = config.load_profile
+    phases = [x.phase for x in profile.phases() if x.name is None]
+    assert phases == [
+        "load",
+        "parse",
+        "categorize",
+        "placeholders",
+        "templates",
+        "index",
+    ]
+    files = [os.path.basename(x.name) for x in profile.phases("read")]
+    assert files == ["template.yml", "template_nuke.yml"]
+    assert len(profile.phases("merge")) == 1
+    variations = profile.variations()
+    assert variations.keys() == config.templates.keys()
+    assert variations["maya_shot_snapshot"] == 4
+    assert profile.peak > 0
+    assert profile.to_dict()["measures"][0]["allocated"] > 0
+    assert "slowest templates" in profile.report()
+
+
+def test_load_profile_without_allocations():
+    """Allocations are not traced when they are not needed"""
+    profile = LoadProfile(allocations=False)
+    ProdexTemplate(path=CONFIG_FILENAME, profile=profile)
+    assert profile.peak == 0
+    assert all(x.allocated == 0 for x in profile.measures)
+    assert ProdexTemplate(path=CONFIG_FILENAME).load_profile is None
+
+
+def test_cli_profile(capsys):
+    """The report is printed on stderr"""
+    argv = ["--config", CONFIG_FILENAME, "validate-config", "--profile"]
+    assert cli.main(argv) == 0
+    assert "placeholders" in capsys.readouterr().err
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# - test_registry.py -
+#
+# Unit testing arround the shared registry.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import pytest
+
+from registry import TemplateRegistry
+
+SCRIPT_PATH = os.path.dirname(__file__)
+FIXTURES_PATH = os.path.join(SCRIPT_PATH, "fixtures")
+
+
+@pytest.fixture
+def projects(tmp_path):
+    """Two projects including the same studio config"""
+    shutil.copy(os.path.join(FIXTURES_PATH, "template.yml"), str(tmp_path))
+    shutil.copy(
+        os.path.join(FIXTURES_PATH, "template_nuke.yml"), str(tmp_path)
+    )
+    paths = []
+    for name in ("a", "b"):
+        project = tmp_path / name
+        project.mkdir()
+        (project / "template.yml").write_text(
+            "includes:\n"
+            "    - '../template.yml'\n"
+            "paths:\n"
+            "    report:\n"
+            "        definition: '@shot_root/%s/{name}.txt'\n" % name
+        )
+        paths.append(str(project / "template.yml"))
+    return paths
+
+
+def test_shared_templates(projects):
+    """Identical templates are shared between projects"""
+    registry = TemplateRegistry()
+    project_a, project_b = [registry.load(x) for x in projects]
+    assert (
+        project_a.templates["flame_shot_clip"]
+        is project_b.templates["flame_shot_clip"]
+    )
+    assert project_a.placeholders["name"] is project_b.placeholders["name"]
+    # 2 projects + the studio config + the nuke include
+    assert registry.stats()["contents"] == 4
+
+
+def test_project_overrides(projects):
+    """Overrides of a project are not shared"""
+    registry = TemplateRegistry()
+    project_a, project_b = [registry.load(x) for x in projects]
+    assert project_a.templates["report"] is not project_b.templates["report"]
+    path = "/prod/project/shot/b/foo.txt"
+    assert project_a.template_from_path(path) is None
+    assert project_b.template_from_path(path).name == "report"
+
+
+def test_cache_not_modified(projects):
+    """Loading a project again gives the same result"""
+    registry = TemplateRegistry()
+    registry.load(projects[0])
+    project = registry.load(projects[0])
+    template = project.templates["maya_shot_work"]
+    assert template.set_placeholders_values(
+        {"name": "foo", "version": 3}
+    ).as_posix() == ("/prod/project/shot/work/maya/foo.v003.ma")
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# - test_scaffold.py -
+#
+# Unit testing arround the scaffolding of directories.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import pytest
+
+from templates import ProdexTemplate
+from scaffold import Scaffold
+from utils import filesystem
+import errors
+
+CONTENT = {
+    "placeholders": {
+        "shot": {"type": "str"},
+        "step": {"type": "str", "choices": ["anim", "fx", "light"]},
+        "dcc": {"type": "str"},
+        "version": {"type": "int", "format_spec": 3},
+    },
+    "paths": {
+        "shot_root": "/prod/project/shot",
+        "shot_area": {"definition": "@shot_root/{shot}"},
+        "step_area": {"definition": "@shot_root/{shot}/{step}/{dcc}"},
+        "version_area": {"definition": "@shot_root/{shot}/v{version}"},
+    },
+}
+
+
+class CountingFileSystem(filesystem.MemoryFileSystem):
+    def __init__(self):
+        super(CountingFileSystem, self).__init__()
+
+        self.calls = []
+
+    def mkdir(self, path):
+        self.calls.append(path)
+        return super(CountingFileSystem, self).mkdir(path)
+
+    def exists(self, path):
+        self.calls.append(("exists", path))
+        return super(CountingFileSystem, self).exists(path)
+
+
+@pytest.fixture
+def config():
+    return ProdexTemplate(path="<test>", content=CONTENT)
+
+
+def test_plan(config):
+    """Templates are expanded over their own fields, parents are shared"""
+    scaffold = Scaffold(config, templates=["shot_area", "step_area"])
+    added = scaffold.add(
+        {"shot": ["s010", "s020"], "step": ["anim", "fx"], "dcc": "maya"}
+    )
+    plan = scaffold.plan()
+    assert added == len(plan) == 3 + 2 + 4 + 4
+    assert plan[:4] == [
+        "/prod",
+        "/prod/project",
+        "/prod/project/shot",
+        "/prod/project/shot/s010",
+    ]
+    assert "/prod/project/shot/s020/fx/maya" in plan
+    scaffold = Scaffold(config, templates=["version_area"])
+    scaffold.add({"shot": "s010"})
+    assert scaffold.plan() == []
+    assert scaffold.skipped == {"version_area": 1}
+    with pytest.raises(errors.ProdexTemplatePlaceholderValidation):
+        scaffold.add({"step": "comp"})
+
+
+def test_create(config):
+    """Each directory costs one mkdir, existing ones included"""
+    memory = CountingFileSystem()
+    memory.makedirs("/prod/project/shot/s010/anim")
+    templates = ["shot_area", "step_area", "version_area"]
+    scaffold = Scaffold(config, templates, filesystem=memory, jobs=4)
+    scaffold.add(
+        {
+            "shot": ["s%03d" % x for x in range(0, 100, 10)],
+            "step": ["anim", "fx", "light"],
+            "dcc": ["maya", "houdini"],
+            "version": [1, 2],
+        }
+    )
+    report = scaffold.create()
+    assert report == {
+        "planned": 3 + 10 + 30 + 60 + 20,
+        "created": 3 + 10 + 30 + 60 + 20 - 5,
+        "existing": 5,
+        "failed": [],
+        "skipped": 0,
+    }
+    assert sorted(memory.calls) == scaffold.plan()
+    assert memory.listdir("/prod/project/shot/s090/light") == [
+        "houdini",
+        "maya",
+    ]
+
+
+def test_create_failures(config):
+    """Directories below a failure (a file in the way) are skipped"""
+    memory = CountingFileSystem()
+    memory.write("/prod/project/shot/s010", b"")
+    scaffold = Scaffold(config, templates=["step_area"], filesystem=memory)
+    scaffold.add({"shot": ["s010", "s020"], "step": "fx", "dcc": "maya"})
+    report = scaffold.create()
+    assert [x[0] for x in report["failed"]] == ["/prod/project/shot/s010"]
+    assert "Not a directory" in report["failed"][0][1]
+    assert report["skipped"] == 2
+    assert memory.exists("/prod/project/shot/s020/fx/maya")
+    with pytest.raises(errors.ProdexTemplateError):
+        Scaffold(config, templates=[])
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# - test_server.py -
+#
+# Unit testing arround the resolver daemon and its client.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import pathlib
+import threading
+import pytest
+
+from client import ProdexTemplateClient
+from server import ProdexTemplateServer
+from utils import framing
+import errors
+
+SCRIPT_PATH = os.path.dirname(__file__)
+FIXTURES_PATH = os.path.join(SCRIPT_PATH, "fixtures")
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    for name in ("template.yml", "template_nuke.yml"):
+        shutil.copy(os.path.join(FIXTURES_PATH, name), str(tmp_path))
+    return str(tmp_path / "template.yml")
+
+
+@pytest.fixture
+def client(tmp_path, config_path):
+    socket_path = str(tmp_path / "prodex.sock")
+    server = ProdexTemplateServer(socket_path, config_path, reload_interval=0)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}
+    )
+    thread.daemon = True
+    thread.start()
+    with ProdexTemplateClient(socket_path) as client:
+        yield client
+    server.shutdown()
+    server.server_close()
+
+
+def test_template_from_path(client):
+    """Get the corresponding template from the daemon"""
+    path = "/prod/project/shot/work/maya/foo.v003.ma"
+    template = client.template_from_path(path)
+    assert template == client.templates.get("maya_shot_work")
+    assert template.get_placeholders_values(path=path) == {
+        "name": "foo",
+        "version": 3,
+        "maya_extension": "ma",
+    }
+    assert template.validate(path)
+
+
+def test_set_placeholder(client):
+    """Generate paths from the daemon"""
+    template = client.templates.get("maya_asset_publish")
+    placeholders = {"maya_extension": "mb", "version": 1, "name": "foo"}
+    expected = pathlib.Path("/prod/project/asset/publish/maya/foo.v001.mb")
+    assert (
+        template.set_placeholders_values(placeholders=placeholders) == expected
+    )
+
+
+def test_errors(client):
+    """Errors raised by the daemon are raised by the client"""
+    template = client.templates.get("maya_shot_work")
+    with pytest.raises(errors.ProdexTemplatePlaceholderValidation):
+        template.get_placeholders_values(path="/prod/project/foo")
+
+
+def test_malformed_requests(client):
+    """Requests which are not objects or crash an operation get an error
+    response, the connection stays usable"""
+    client.connect()
+    sock = client._socket
+    for request in ([1, 2], "ping", {"op": ["ping"]}):
+        framing.send_frame(sock, request)
+        response = framing.recv_frame(sock)
+        assert response["ok"] is False
+    framing.send_frame(sock, {"op": "resolve", "paths": 42})
+    response = framing.recv_frame(sock)
+    assert response["ok"] is False
+    assert "TypeError" in response["message"]
+    assert client.call("ping") == "pong"
+
+
+def test_resolve_batch(client):
+    """Resolve paths by batches"""
+    paths = ["/prod/project/shot/work/maya/foo.v003.ma", "/foo"] * 3
+    results = list(client.resolve(paths, chunk_size=4))
+    assert [x[1].name if x[1] else None for x in results] == [
+        "maya_shot_work",
+        None,
+    ] * 3
+
+
+def test_hot_reload(client, config_path):
+    """The daemon reloads the configuration when an include changes"""
+    include = pathlib.Path(config_path).parent / "template_nuke.yml"
+    assert "nuke_new" not in client.templates
+    include.write_text(
+        include.read_text().replace(
+            "\npaths:\n",
+            "\npaths:\n"
+            "  nuke_new:\n"
+            "    definition: '@shot_root/new/{name}.nk'\n",
+        )
+    )
+    stat = include.stat()
+    os.utime(str(include), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert "nuke_new" in client.templates
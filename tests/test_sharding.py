@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# - test_sharding.py -
+#
+# Unit testing arround the sharding of scans and manifests.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+from templates import ProdexTemplate
+from utils import filesystem, synthetic
+import sharding
+import errors
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CLI = os.path.join(os.path.dirname(SCRIPT_PATH), "cli.py")
+
+CONFIG = """
+placeholders:
+    shot:
+        type: str
+    name:
+        type: str
+    version:
+        type: int
+        format_spec: 3
+paths:
+    shot_root: '{0}/shot'
+    shot_work:
+        definition: '@shot_root/{{shot}}/work/{{name}}.v{{version}}.ma'
+    shot_publish:
+        definition: '@shot_root/{{shot}}/publish/{{name}}.v{{version}}.ma'
+"""
+
+
+@pytest.fixture
+def config():
+    content = synthetic.generate_content(templates=20, seed=2)
+    return ProdexTemplate(path="<synthetic>", content=content)
+
+
+@pytest.mark.parametrize("strategy", ["hash", "template"])
+def test_partition(config, strategy):
+    """Each path is walked by exactly one shard"""
+    paths = [x for x, _ in synthetic.generate_paths(config, 500, seed=2)]
+    memory = filesystem.MemoryFileSystem.from_paths(paths)
+    expected = list(memory.walk("/"))
+    sharder = sharding.Sharder(
+        5,
+        strategy=strategy,
+        depth=2,
+        templates=list(config.templates.values()),
+    )
+    found = []
+    coverages = []
+    for index in range(5):
+        coverage = sharding.Coverage()
+        walked = list(sharder.walk("/", index, coverage, filesystem=memory))
+        assert all(sharder.shard(x) == index for x in walked)
+        assert walked == list(sharder.split(expected, index))
+        found.extend(walked)
+        coverages.append(coverage.to_dict())
+    assert sorted(found) == sorted(expected)
+    assert len(set((x["seen"], x["fingerprint"]) for x in coverages)) == 1
+    assert sum(x["owned"] for x in coverages) == coverages[0]["seen"]
+
+
+def test_shards_processes(tmp_path):
+    """Shards run as separate processes, the merge checks the coverage"""
+    root = tmp_path / "prod"
+    for shot in range(12):
+        for step in ("work", "publish"):
+            directory = root / "shot" / ("s%02d" % shot) / step
+            directory.mkdir(parents=True)
+            (directory / "foo.v001.ma").touch()
+    config_path = tmp_path / "config.yml"
+    config_path.write_text(CONFIG.format(root))
+
+    partials = [str(tmp_path / ("shard%d.ndjson" % x)) for x in range(3)]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, CLI, "--config", str(config_path), "shard"]
+            + ["--root", str(root), "--strategy", "template"]
+            + ["--index", str(x), "--count", "3", "--output", partial]
+        )
+        for x, partial in enumerate(partials)
+    ]
+    assert [x.wait() for x in processes] == [0, 0, 0]
+
+    merged = subprocess.run(
+        [sys.executable, CLI, "merge-shards"] + partials,
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    records = [json.loads(x) for x in merged.stdout.splitlines()]
+    assert sorted(x["path"] for x in records) == sorted(
+        str(x) for x in root.rglob("*.ma")
+    )
+    indexes = [sharding.read_summary(x)[0]["shard"] for x in partials]
+    assert indexes == [0, 1, 2]
+
+    with pytest.raises(errors.ProdexTemplateError):
+        sharding.merge(partials[:2], io.StringIO())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# - test_sites.py -
+#
+# Unit testing arround the root paths of the sites.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import itertools
+import pytest
+
+from templates import ProdexTemplate
+from sites import SiteMapper
+import errors
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+SITES = """
+includes:
+    - '{0}'
+sites:
+    london:
+        shot_root: '/mnt/london/project/shot'
+        asset_root: '/mnt/london/project/asset'
+    montreal:
+        shot_root: 'P:\\project\\shot'
+"""
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "sites.yml"
+    path.write_text(SITES.format(CONFIG_FILENAME))
+    return ProdexTemplate(path=str(path))
+
+
+def test_translate(config):
+    """Translate paths between sites on whole path components"""
+    mapper = config.sites
+    assert mapper.sites == ["default", "london", "montreal"]
+    path = "/mnt/london/project/shot/work/maya/foo.v003.ma"
+    assert mapper.translate(path, "montreal") == (
+        "P:\\project\\shot\\work\\maya\\foo.v003.ma"
+    )
+    assert mapper.translate("P:\\project\\shot\\work", "london") == (
+        "/mnt/london/project/shot/work"
+    )
+    assert mapper.localize(path) == "/prod/project/shot/work/maya/foo.v003.ma"
+    assert mapper.localize("/prod/project/shotgun") == "/prod/project/shotgun"
+    with pytest.raises(errors.ProdexTemplateError):
+        mapper.translate("/mnt/london/project/asset/foo", "montreal")
+    with pytest.raises(errors.ProdexTemplateError):
+        mapper.translate(path, "tokyo")
+
+
+def test_longest_prefix():
+    """Nested root paths are found with the longest prefix"""
+    mapper = SiteMapper(
+        {"project": "/prod/project", "shot": "/prod/project/shot"},
+        {"london": {"project": "/mnt/project", "shot": "/mnt/shot"}},
+    )
+    assert mapper.locate("/prod/project/shot/foo").root == "shot"
+    translated = mapper.translate("/prod/project/foo", "london")
+    assert translated == "/mnt/project/foo"
+    assert mapper.translate("/prod/project/shot", "london") == "/mnt/shot"
+    with pytest.raises(errors.ProdexTemplateError):
+        SiteMapper({"shot": "/prod/shot"}, {"london": {"asset": "/mnt"}})
+
+
+def test_translate_many(config):
+    """Paths are translated lazily"""
+    paths = (
+        "/mnt/london/project/asset/%d" % x if x % 2 else "/foo/%d" % x
+        for x in itertools.count()
+    )
+    translated = config.sites.translate_many(paths, "default", discreet=True)
+    assert list(itertools.islice(translated, 2)) == [
+        ("/foo/0", None),
+        ("/mnt/london/project/asset/1", "/prod/project/asset/1"),
+    ]
+
+
+def test_resolve_any_site(config):
+    """Paths of any site are resolved without translating them first"""
+    path = "/mnt/london/project/shot/work/maya/foo.v003.ma"
+    assert config.template_from_path(path) is None
+    template = config.template_from_path(path, any_site=True)
+    assert template.name == "maya_shot_work"
+    ((found, template, fields),) = config.resolve([path], any_site=True)
+    assert found == path
+    assert fields == {"name": "foo", "version": 3, "maya_extension": "ma"}
+
+
+def test_duplicate_roots(tmp_path):
+    """Root paths can share the same value, with or without sites"""
+    path = tmp_path / "roots.yml"
+    path.write_text(
+        "placeholders:\n"
+        "    name:\n"
+        "        type: str\n"
+        "paths:\n"
+        "    project_root: '/prod/project'\n"
+        "    other_root: '/prod/project'\n"
+        "    scene:\n"
+        "        definition: '@other_root/{name}.ma'\n"
+    )
+    config = ProdexTemplate(path=str(path))
+    assert config.template_from_path("/prod/project/foo.ma").name == "scene"
+    assert config.sites.localize("/prod/project/foo") == "/prod/project/foo"
+
+    mapper = SiteMapper(
+        {"project": "/prod/project", "other": "/prod/project"},
+        {"london": {"other": "/mnt/other"}},
+    )
+    assert mapper.locate("/prod/project/foo").root == "project"
+    assert mapper.translate("/prod/project/foo", "london") == "/mnt/other/foo"
+    assert mapper.localize("/mnt/other/foo") == "/prod/project/foo"
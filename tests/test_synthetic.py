@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# - test_synthetic.py -
+#
+# Unit testing arround the synthetic configurations.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from templates import ProdexTemplate
+from utils import synthetic
+
+
+def test_generate_config(tmp_path):
+    """A generated configuration can be loaded"""
+    path = synthetic.generate_config(
+        str(tmp_path / "config.yml"), templates=20, optionals=2
+    )
+    config = ProdexTemplate(path=str(path))
+    assert len(config.templates) == 20
+    assert max(len(x.definitions) for x in config.templates.values()) > 1
+
+
+def test_generate_paths(tmp_path):
+    """Generated paths are deterministic and match their template"""
+    path = synthetic.generate_config(str(tmp_path / "config.yml"))
+    config = ProdexTemplate(path=str(path))
+    paths = list(synthetic.generate_paths(config, 50, seed=1))
+    assert paths == list(synthetic.generate_paths(config, 50, seed=1))
+    for path, name in paths:
+        if name is None:
+            assert not config.templates_from_path(path)
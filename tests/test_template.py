@@ -28,7 +28,8 @@ import os
 import pathlib
 import pytest
 
-from templates import ProdexTemplate
+from templates import ProdexTemplate, Template
+from utils import filesystem
 
 SCRIPT_PATH = os.path.dirname(__file__)
 CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
@@ -75,3 +76,56 @@ def test_validation_path(config):
     path = "/prod/project/shot/work/photoshop/snapshots/foo_bar.v003.0001.psd"
     expected = True
     assert template.validate(path=path) == expected
+
+
+def test_templates_from_fields(config):
+    """Get all templates which can be generated with the given fields"""
+    fields = {"name": "foo", "version": 3, "timestamp": "bar"}
+    templates = config.templates_from_fields(fields, strict=True)
+    assert "maya_shot_snapshot" not in [x.name for x in templates]
+    assert "nuke_shot_snapshot" in [x.name for x in templates]
+    # Required placeholders are missing (shot)
+    templates = config.templates_from_fields({"name": "foo"})
+    assert "maya_shot_snapshot" not in [x.name for x in templates]
+
+
+def test_paths_from_fields(config):
+    """Generate the paths of all templates at once"""
+    fields = {"name": "foo", "version": 1}
+    paths = config.paths_from_fields(fields)
+    assert paths["maya_asset_publish"] == pathlib.Path(
+        "/prod/project/asset/publish/maya/foo.v001.ma"
+    )
+    for name, path in paths.items():
+        template = config.templates.get(name)
+        assert template.set_placeholders_values(dict(fields)) == path
+
+
+@pytest.fixture
+def work_area(tmp_path):
+    """Files of a work area on the disk"""
+    area = tmp_path / "maya"
+    area.mkdir()
+    for name in ("foo.v001.ma", "foo.v012.ma", "foo.v3.ma", "bar.v020.ma"):
+        (area / name).write_text("")
+    return area
+
+
+def test_latest(config, work_area):
+    """Find the latest and the next version on the disk"""
+    template = Template(
+        definition=str(work_area / "{name}.v{version}.{maya_extension}"),
+        name="maya_work",
+        placeholders=config.placeholders,
+    )
+    cache = filesystem.CachingFileSystem(filesystem.LocalFileSystem(), 60)
+    fields = {"name": "foo"}
+    assert template.latest(fields, filesystem=cache) == 12
+    assert template.next_value(fields, filesystem=cache) == 13
+    assert template.latest({"name": "baz"}, filesystem=cache) is None
+
+    # The listing is cached
+    (work_area / "foo.v013.ma").write_text("")
+    assert template.latest(fields, filesystem=cache) == 12
+    cache.invalidate(work_area)
+    assert template.latest(fields, filesystem=cache) == 13
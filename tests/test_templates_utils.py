@@ -147,3 +147,27 @@ def test_get_definitions():
         templates_utils.find_definition_variations(definition=definition)
         == expected
     )
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [("foo_bar.v003.ma", "003"), ("foo_bar.v003.mb", None), ("foo.ma", None)],
+)
+def test_component_pattern(name, expected):
+    """Extract the key from a directory entry"""
+    pattern, groups = templates_utils.component_pattern(
+        component="{name}.v{version}.{maya_extension}",
+        key="version",
+        values={"maya_extension": "ma"},
+    )
+    match = pattern.fullmatch(name)
+    assert (match.group(groups["version"]) if match else None) == expected
+
+
+def test_component_pattern_names():
+    """Placeholder names which aren't valid group names are extracted"""
+    pattern, groups = templates_utils.component_pattern(
+        component="{2d}_v{1st}.{1st}", key="1st", values={}
+    )
+    assert pattern.fullmatch("foo_v004.004").group(groups["1st"]) == "004"
+    assert not pattern.fullmatch("foo_v004.005")
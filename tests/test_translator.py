@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# - test_translator.py -
+#
+# Unit testing arround the translation of paths.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pathlib
+import pytest
+
+from templates import ProdexTemplate
+import errors
+
+SCRIPT_PATH = os.path.dirname(__file__)
+CONFIG_FILENAME = os.path.join(SCRIPT_PATH, "fixtures", "template.yml")
+
+
+@pytest.fixture
+def config():
+    return ProdexTemplate(path=CONFIG_FILENAME)
+
+
+def test_translate(config):
+    """Translate a work path into a publish path"""
+    translator = config.translator("maya_shot_work", "maya_shot_publish")
+    path = "/prod/project/shot/work/maya/foo.v003.mb"
+    expected = pathlib.Path("/prod/project/shot/publish/maya/foo.v003.mb")
+    assert translator.translate(path) == expected
+
+
+def test_translate_mapping_defaults(config):
+    """Translate with a fields mapping and defaults values"""
+    translator = config.translator(
+        "maya_shot_work",
+        "houdini_asset_work_alembic_cache",
+        mapping={"asset": "name"},
+        defaults={"houdini_node": "out"},
+    )
+    path = "/prod/project/shot/work/maya/foo.v003.ma"
+    expected = pathlib.Path(
+        "/prod/project/asset/work/houdini/cache/alembic/foo/out/v003/"
+        "foo_foo_v003.abc"
+    )
+    assert translator.translate(path) == expected
+
+
+def test_translate_many(config):
+    """Translate a stream of paths"""
+    translator = config.translator("maya_shot_work", "maya_shot_publish")
+    paths = ["/prod/project/shot/work/maya/foo.v003.ma", "/foo"]
+    results = list(translator.translate_many(paths, discreet=True))
+    assert results[1] == ("/foo", None)
+    with pytest.raises(errors.ProdexTemplateError):
+        list(translator.translate_many(paths))
+
+
+def test_translate_missing(config):
+    """A destination placeholder can't be found in the source"""
+    translator = config.translator("maya_shot_work", "maya_shot_snapshot")
+    with pytest.raises(errors.ProdexTemplateMissingPlaceholders):
+        translator.translate("/prod/project/shot/work/maya/foo.v003.ma")
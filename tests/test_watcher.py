@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+#
+# - test_watcher.py -
+#
+# Unit testing arround the live classification of files.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import errno
+import ctypes
+import asyncio
+import threading
+import pytest
+
+from templates import ProdexTemplate
+from watcher import Watcher, Reachability
+import watcher as watcher_module
+import errors
+
+CONFIG = """
+placeholders:
+    shot:
+        type: str
+    name:
+        type: str
+    frame:
+        type: int
+        format_spec: 4
+paths:
+    root: {root}
+    render:
+        definition: '@root/shots/{{shot}}/render/{{name}}.{{frame}}.exr'
+"""
+
+
+@pytest.fixture
+def config(tmp_path):
+    root = tmp_path / "prod"
+    (root / "shots" / "sh010" / "render").mkdir(parents=True)
+    (root / "other").mkdir()
+    path = tmp_path / "template.yml"
+    path.write_text(CONFIG.format(root=root))
+    return ProdexTemplate(path=str(path))
+
+
+def _collect(watcher, count, timeout=5.0):
+    events = []
+    for _ in range(int(timeout / 0.1)):
+        events.extend(watcher.poll(timeout=0.1))
+        if len(events) >= count:
+            break
+    return events
+
+
+def test_reachability(config, tmp_path):
+    """Only the directories of the templates are watched"""
+    reachable = Reachability(config.templates.values())
+    root = str(tmp_path / "prod")
+    assert reachable.roots == [root + "/shots"]
+    assert reachable(root + "/shots/sh020/render")
+    assert not reachable(root + "/shots/sh020/comp")
+    assert not reachable(root + "/other")
+
+
+def test_unknown_template(config):
+    """Unknown template names are reported before watching anything"""
+    with pytest.raises(errors.ProdexTemplateError):
+        Watcher(config, templates=["foo"])
+
+
+@pytest.mark.parametrize("backend", ["inotify", "polling"])
+def test_watch(config, tmp_path, backend):
+    """New files are debounced and classified, even in new directories"""
+    watcher = Watcher(
+        config, backend=backend, debounce=0.05, poll_interval=0.05
+    )
+    assert watcher.backend == backend
+    shots = tmp_path / "prod" / "shots"
+    render = shots / "sh010" / "render"
+    try:
+        for frame in range(1, 4):
+            (render / ("foo.%04d.exr" % frame)).write_text("x")
+        (render / "notes.txt").write_text("x")
+        (shots / "sh020" / "render").mkdir(parents=True)
+        (shots / "sh020" / "render" / "bar.0001.exr").write_text("x")
+        events = _collect(watcher, 4)
+        assert sorted((x.event, x.path) for x in events) == [
+            ("created", str(shots / "sh010/render/foo.0001.exr")),
+            ("created", str(shots / "sh010/render/foo.0002.exr")),
+            ("created", str(shots / "sh010/render/foo.0003.exr")),
+            ("created", str(shots / "sh020/render/bar.0001.exr")),
+        ]
+        assert events[0].template.name == "render"
+        frames = sorted(x.fields["frame"] for x in events)
+        assert frames == [1, 1, 2, 3]
+
+        os.remove(str(render / "foo.0001.exr"))
+        events = _collect(watcher, 1)
+        assert [(x.event, x.fields["name"]) for x in events] == [
+            ("deleted", "foo")
+        ]
+    finally:
+        watcher.stop()
+
+
+def test_watch_callback_and_async(config, tmp_path):
+    """Events are delivered to a callback or an async iterator"""
+    render = tmp_path / "prod" / "shots" / "sh010" / "render"
+    received = threading.Event()
+    events = []
+
+    def callback(event):
+        events.append(event)
+        received.set()
+
+    with Watcher(config, callback=callback, debounce=0.05):
+        (render / "foo.0001.exr").write_text("x")
+        assert received.wait(5)
+    assert events[0].fields["frame"] == 1
+
+    async def first_event(watcher):
+        async for event in watcher:
+            return event
+
+    watcher = Watcher(config, debounce=0.05)
+    (render / "foo.0002.exr").write_text("x")
+    try:
+        event = asyncio.run(asyncio.wait_for(first_event(watcher), 5))
+    finally:
+        watcher.stop()
+    assert event.fields["frame"] == 2
+
+
+@pytest.mark.parametrize("backend", ["inotify", "polling"])
+def test_watch_moves(config, tmp_path, backend):
+    """Moved directories are reported at their new path"""
+    shots = tmp_path / "prod" / "shots"
+    (shots / "sh010" / "render" / "foo.0001.exr").write_text("x")
+    watcher = Watcher(
+        config, backend=backend, debounce=0.05, poll_interval=0.05
+    )
+    try:
+        os.rename(str(shots / "sh010"), str(shots / "sh030"))
+        events = _collect(watcher, 2)
+        assert sorted((x.event, x.fields["shot"]) for x in events) == [
+            ("created", "sh030"),
+            ("deleted", "sh010"),
+        ]
+        (shots / "sh030" / "render" / "foo.0002.exr").write_text("x")
+        events = _collect(watcher, 1)
+        assert [x.path for x in events] == [
+            str(shots / "sh030" / "render" / "foo.0002.exr")
+        ]
+
+        # Moved out of the watched directories
+        os.rename(str(shots / "sh030"), str(tmp_path / "sh030"))
+        events = _collect(watcher, 1)
+        if backend == "inotify":
+            assert [(x.event, x.path) for x in events] == [
+                ("overflow", str(shots / "sh030"))
+            ]
+        else:
+            assert {x.event for x in events} == {"deleted"}
+    finally:
+        watcher.stop()
+
+
+class _FailingLibc(object):
+    """libc whose inotify watches fail for the render directories"""
+
+    def __init__(self, libc):
+        self._libc = libc
+
+    def inotify_add_watch(self, fd, path, mask):
+        if path.endswith(b"/render"):
+            ctypes.set_errno(errno.ENOSPC)
+            return -1
+        return self._libc.inotify_add_watch(fd, path, mask)
+
+    def __getattr__(self, name):
+        return getattr(self._libc, name)
+
+
+def test_watch_fallback(config, tmp_path, monkeypatch):
+    """Directories which can't be watched are polled"""
+    cdll = ctypes.CDLL
+    monkeypatch.setattr(
+        watcher_module.ctypes,
+        "CDLL",
+        lambda *args, **kwargs: _FailingLibc(cdll(*args, **kwargs)),
+    )
+    watcher = Watcher(
+        config, backend="inotify", debounce=0.05, poll_interval=0.05
+    )
+    render = tmp_path / "prod" / "shots" / "sh010" / "render"
+    try:
+        assert watcher._backend.polled == [str(render)]
+        (render / "foo.0001.exr").write_text("x")
+        events = _collect(watcher, 1)
+        assert [(x.event, x.path) for x in events] == [
+            ("created", str(render / "foo.0001.exr"))
+        ]
+    finally:
+        watcher.stop()
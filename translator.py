@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# - translator.py -
+#
+# Translation of paths from a template to another one (work to publish...).
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import pathlib
+
+import errors
+
+
+class PathTranslator(object):
+    """Translate paths of a source template into paths of a destination
+    template. Everything which doesn't depend on the path (fields mapping,
+    defaults, destination definition) is computed once.
+
+    >>> translator = PathTranslator(
+    ...     source=prodex_template.templates["maya_shot_work"],
+    ...     destination=prodex_template.templates["maya_shot_publish"],
+    ... )
+    >>> translator.translate("/prod/project/shot/work/maya/foo.v003.ma")
+    >>> PosixPath('/prod/project/shot/publish/maya/foo.v003.ma')
+    """
+
+    def __init__(self, source, destination, **kwargs):
+        super(PathTranslator, self).__init__()
+
+        self._source = source
+        self._destination = destination
+        # Destination placeholder name: source placeholder name
+        self._mapping = kwargs.get("mapping", {})
+        self._defaults = {}
+        self._plans = {}
+
+        source_placeholders = source.placeholders
+        destination_placeholders = destination.placeholders
+
+        # Destination placeholder name: (source placeholder name,
+        # placeholder to validate the value or None)
+        self._fields = {}
+        for name, placeholder in destination_placeholders.items():
+            source_name = self._mapping.get(name, name)
+            source_placeholder = source_placeholders.get(source_name)
+            if source_placeholder is None:
+                continue
+            check = None
+            if source_placeholder is not placeholder:
+                # Not validated by the extraction
+                check = placeholder
+            self._fields[name] = (source_name, check)
+
+        # Defaults are conformed only once
+        defaults = {
+            name: placeholder.default
+            for name, placeholder in destination_placeholders.items()
+            if placeholder.default
+        }
+        defaults.update(kwargs.get("defaults", {}))
+        for name, value in defaults.items():
+            placeholder = destination_placeholders.get(name)
+            if placeholder is None:
+                self._defaults[name] = value
+                continue
+            if not placeholder.validate(value):
+                raise errors.ProdexTemplatePlaceholderValidation(
+                    "The value {0} is not conform for the placeholder "
+                    "{1}".format(value, name)
+                )
+            self._defaults[name] = placeholder.conform_value(value)
+
+        for names in source._variations_placeholders:
+            self._get_plan(names)
+
+    def __repr__(self):
+        return "<%s %s -> %s>" % (
+            self.__class__.__name__,
+            self._source.name,
+            self._destination.name,
+        )
+
+    @property
+    def source(self):
+        """Return the source template
+
+        :rtype: :class:`templates.Template`
+        """
+        return self._source
+
+    @property
+    def destination(self):
+        """Return the destination template
+
+        :rtype: :class:`templates.Template`
+        """
+        return self._destination
+
+    def _get_plan(self, names):
+        """Get the destination definition and the fields to use according
+        to the placeholders found in the source path.
+
+        :param names: Names of the placeholders found in the source path
+        :type names: frozenset
+        :return: (definition, fields) or None if no destination definition
+        can be generated
+        :rtype: tuple
+        """
+        if names in self._plans:
+            return self._plans[names]
+        fields = [
+            (name, source_name, check)
+            for name, (source_name, check) in self._fields.items()
+            if source_name in names
+        ]
+        available = set(self._defaults)
+        available.update(x[0] for x in fields)
+
+        plan = None
+        for definition, placeholders in zip(
+            self._destination.definitions,
+            self._destination._variations_placeholders,
+        ):
+            if placeholders.issubset(available):
+                plan = (
+                    definition,
+                    [x for x in fields if x[0] in placeholders],
+                )
+                break
+        self._plans[names] = plan
+        return plan
+
+    def translate(self, path):
+        """Translate a path of the source template
+
+        :param path: A path of the source template
+        :type path: str
+        :raises errors.ProdexTemplateError: If the path can't be translated
+        :return: The path for the destination template
+        :rtype: pathlib.Path
+        """
+        values = self._source.get_placeholders_values(path=str(path))
+        plan = self._get_plan(frozenset(values))
+        if plan is None:
+            raise errors.ProdexTemplateMissingPlaceholders(
+                "{0} can't be generated from {1}".format(
+                    self._destination.name, path
+                )
+            )
+        definition, fields = plan
+        conformed = dict(self._defaults)
+        placeholders = self._destination._placeholders
+        for name, source_name, check in fields:
+            value = values[source_name]
+            if check is not None and not check.validate(value):
+                raise errors.ProdexTemplatePlaceholderValidation(
+                    "The value {0} is not conform for the placeholder "
+                    "{1}".format(value, name)
+                )
+            conformed[name] = placeholders[name].conform_value(value)
+        return pathlib.Path(definition.format_map(conformed))
+
+    def translate_many(self, paths, **kwargs):
+        """Translate a stream of paths of the source template
+
+        :param paths: Paths of the source template
+        :type paths: iterable
+        :param discreet: (kwargs) Yield None instead of raising errors
+        :type discreet: bool
+        :return: Generator of (path, translated path)
+        :rtype: generator
+        """
+        discreet = kwargs.get("discreet", False)
+        for path in paths:
+            try:
+                yield path, self.translate(path)
+            except errors.ProdexTemplateError:
+                if not discreet:
+                    raise
+                yield path, None
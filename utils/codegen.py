@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+#
+# - codegen.py -
+#
+# Generation of the Python source of the matching functions of a template
+# (see engines.CodegenEngine).
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import pathlib
+import threading
+
+from utils import templates_utils
+import errors
+
+# sha1 of the source: code object. Filled by compile_source and by the
+# compiled artifacts (see compiled.py).
+CODE_CACHE = {}
+_LOCK = threading.Lock()
+
+# Stages returned by the generated match function
+STAGES = [
+    "matched",
+    "rejected_prefilter",
+    "rejected_parts",
+    "rejected_values",
+    "rejected_format",
+]
+
+
+def compile_source(source):
+    """Compile the source of a template, only once for a given source.
+
+    :param source: The generated source
+    :type source: str
+    :return: The sha1 of the source and the code object
+    :rtype: tuple
+    """
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    with _LOCK:
+        code = CODE_CACHE.get(digest)
+        if code is None:
+            code = compile(source, "<prodex-template %s>" % digest, "exec")
+            CODE_CACHE[digest] = code
+    return digest, code
+
+
+def _validation(value, name):
+    return errors.ProdexTemplatePlaceholderValidation(
+        "The value {0} is not conform for the placeholder {1}".format(
+            value, name
+        )
+    )
+
+
+def _sync():
+    return errors.ProdexTemplatePathSync(
+        "Path and the static_part aren't synchronised anymore"
+    )
+
+
+def _multiple(name, value, other):
+    return errors.ProdexTemplatePlaceholderMultipleValues(
+        "Got two differents values for the {0} [{1}, {2}]".format(
+            name, value, other
+        )
+    )
+
+
+def fstring_literal(text):
+    """Escape a text for the literal part of a double quoted f-string
+
+    :param text: The text
+    :type text: str
+    :return: The escaped text
+    :rtype: str
+    """
+    chunks = []
+    for char in text:
+        if char in "{}":
+            chunks.append(char * 2)
+        elif char in '"\\':
+            chunks.append("\\" + char)
+        elif char.isprintable():
+            chunks.append(char)
+        else:
+            chunks.append("\\U%08x" % ord(char))
+    return "".join(chunks)
+
+
+class _Writer(object):
+    def __init__(self):
+        super(_Writer, self).__init__()
+
+        self.lines = []
+        self.level = 0
+
+    def write(self, line):
+        self.lines.append("    " * self.level + line)
+
+    def source(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def _write_prefilter(writer, variations):
+    """The literals of a variation must be found in this order, the
+    placeholders between them match anything."""
+    writer.write("def prefilter(path):")
+    writer.level += 1
+    for variation in variations:
+        tokens = variation.tokens
+        level = writer.level
+        writer.write("# %r" % variation.definition)
+        if len(tokens) == 1:
+            writer.write("if path == %r:" % tokens[0])
+            writer.write("    return True")
+            continue
+        head, middle, tail = tokens[0], tokens[2:-1:2], tokens[-1]
+        conditions = []
+        if head:
+            conditions.append("path.startswith(%r)" % head)
+        if tail:
+            conditions.append("path.endswith(%r)" % tail)
+        writer.write("if %s:" % (" and ".join(conditions) or "True"))
+        writer.level += 1
+        if tail:
+            writer.write("end = len(path) - %d" % len(tail))
+        else:
+            writer.write("end = len(path)")
+        writer.write("index = %d" % len(head))
+        for literal in middle:
+            if not literal:
+                continue
+            writer.write("index = path.find(%r, index, end)" % literal)
+            writer.write("if index >= 0:")
+            writer.level += 1
+            writer.write("index += %d" % len(literal))
+        writer.write("if index <= end:")
+        writer.write("    return True")
+        writer.level = level
+    writer.write("return False")
+    writer.level -= 1
+    writer.write("")
+
+
+def _write_check(writer, index, placeholder, inline):
+    """Validate and sanitize the value of a placeholder. Return the name of
+    the variable of the sanitized value."""
+    fail = "return None, _validation(value, NAME_%d)" % index
+    if inline == "int":
+        writer.write("if not value.isdigit():")
+        writer.write("    " + fail)
+        writer.write("sanitized = int(value)")
+        writer.write("container = PLACEHOLDER_%d.container" % index)
+        writer.write("if container and sanitized not in container:")
+        writer.write("    " + fail)
+        if placeholder.length:
+            writer.write(
+                "if len(str(sanitized)) != %d:" % int(placeholder.length)
+            )
+            writer.write("    " + fail)
+    elif inline == "str":
+        writer.write("container = PLACEHOLDER_%d.container" % index)
+        writer.write("if container and value not in container:")
+        writer.write("    " + fail)
+        if placeholder.length:
+            writer.write("if len(value) != %d:" % int(placeholder.length))
+            writer.write("    " + fail)
+    else:
+        writer.write("if not PLACEHOLDER_%d.validate(value):" % index)
+        writer.write("    " + fail)
+    writer.write("if head == separator == value:")
+    writer.write("    return None, _sync()")
+    if inline == "str":
+        return "value"
+    if inline is None:
+        writer.write(
+            "sanitized = PLACEHOLDER_%d.sanitize_value(value)" % index
+        )
+    return "sanitized"
+
+
+def _write_resolve(writer, position, variation, context):
+    """Unrolled partitions of a variation, like the reference engine"""
+    placeholders, indexes, inlines = context
+    tail, steps = variation.plan
+    writer.write("def resolve_%d(path, error):" % position)
+    writer.level += 1
+    writer.write("# %r" % variation.definition)
+    if tail is not None:
+        writer.write("remaining = path.rpartition(%r)[0]" % tail)
+    else:
+        writer.write("remaining = path")
+    resolved = []
+    for position, (static_part, key) in enumerate(steps):
+        index = indexes[key]
+        writer.write(
+            "head, separator, value = remaining.rpartition(%r)" % static_part
+        )
+        sanitized = _write_check(
+            writer, index, placeholders[key], inlines[key]
+        )
+        if key in resolved:
+            writer.write("if %s != value_%d:" % (sanitized, index))
+            writer.write(
+                "    return None, _multiple(NAME_%d, value_%d, %s)"
+                % (index, index, sanitized)
+            )
+        else:
+            writer.write("value_%d = %s" % (index, sanitized))
+            resolved.append(key)
+        if position < len(steps) - 1:
+            writer.write("remaining = head")
+    # The error is reset each time a placeholder is resolved
+    error = "None" if resolved else "error"
+    if len(resolved) == variation.expected:
+        values = ", ".join(
+            "NAME_%d: value_%d" % (indexes[x], indexes[x]) for x in resolved
+        )
+        if resolved:
+            writer.write("return {%s}, None" % values)
+            writer.level -= 1
+            writer.write("")
+            return resolved
+        writer.write("if not error:")
+        writer.write("    return {}, error")
+    writer.write("return None, %s" % error)
+    writer.level -= 1
+    writer.write("")
+    return resolved
+
+
+def _write_roundtrip(writer, position, resolved, variations, context):
+    """Conform the values and format every variation with them"""
+    placeholders, indexes, inlines = context
+    writer.write("def roundtrip_%d(values, path):" % position)
+    writer.level += 1
+    writer.write('if path == "None":')
+    writer.write("    return _roundtrip(values, path)")
+    available = set(resolved)
+    for key in resolved:
+        index = indexes[key]
+        placeholder = placeholders[key]
+        if inlines[key] == "int":
+            writer.write(
+                "conformed_%d = str(values[NAME_%d]).zfill(%d)"
+                % (index, index, int(placeholder.format_spec))
+            )
+        elif inlines[key] == "str":
+            writer.write("conformed_%d = values[NAME_%d]" % (index, index))
+        else:
+            writer.write(
+                "conformed_%d = PLACEHOLDER_%d.conform_value(values[NAME_%d])"
+                % (index, index, index)
+            )
+    for key in sorted(placeholders):
+        if key not in available and placeholders[key].default:
+            writer.write(
+                "conformed_%d = DEFAULT_%d" % (indexes[key], indexes[key])
+            )
+            available.add(key)
+    for variation in variations:
+        tokens = variation.tokens
+        if not set(tokens[1::2]).issubset(available):
+            continue
+        chunks = [fstring_literal(tokens[0])]
+        for index in range(1, len(tokens), 2):
+            chunks.append("{conformed_%d}" % indexes[tokens[index]])
+            chunks.append(fstring_literal(tokens[index + 1]))
+        writer.write('formatted = f"%s"' % "".join(chunks))
+        writer.write(
+            'if formatted == path and ("{" not in formatted '
+            "or not _find(formatted)):"
+        )
+        writer.write("    return True")
+    writer.write("return False")
+    writer.level -= 1
+    writer.write("")
+
+
+def generate(variations, placeholders):
+    """Generate the source of the matching functions of a template:
+
+    - ``prefilter(path)``: the literals of a variation are found in order
+      with ``startswith``, ``find`` and ``endswith``.
+    - ``resolve_N(path, error)``: the partitions of the variation N,
+      unrolled, with inline checks of the integers and the choices.
+    - ``roundtrip_N(values, path)``: the values found by the variation N
+      are conformed and formatted with f-strings.
+    - ``resolve(path)`` and ``match(path)`` which call them in order.
+
+    :param variations: The variations of the template (see
+    :class:`engines._Variation`), their placeholders are all defined.
+    :type variations: list
+    :param placeholders: The placeholders of the template
+    :type placeholders: dict
+    :return: The source and the namespace needed to run it
+    :rtype: tuple
+    """
+    # Imported here, placeholders.py is not a part of utils
+    from placeholders import IntegerPlaceholder, StringPlaceholder
+
+    indexes = {}
+    inlines = {}
+    namespace = {
+        "_find": templates_utils.find_placeholder,
+        "_parts": lambda x: pathlib.Path(x).parts,
+    }
+    for index, key in enumerate(sorted(placeholders)):
+        placeholder = placeholders[key]
+        indexes[key] = index
+        inlines[key] = None
+        if type(placeholder) is IntegerPlaceholder:
+            inlines[key] = "int"
+        elif type(placeholder) is StringPlaceholder:
+            inlines[key] = "str"
+        namespace["NAME_%d" % index] = placeholder.name
+        namespace["DEFAULT_%d" % index] = placeholder.default
+        namespace["PLACEHOLDER_%d" % index] = placeholder
+    namespace["_validation"] = _validation
+    namespace["_sync"] = _sync
+    namespace["_multiple"] = _multiple
+    namespace["PARTS"] = frozenset(x.parts for x in variations)
+
+    context = (placeholders, indexes, inlines)
+    writer = _Writer()
+    _write_prefilter(writer, variations)
+    for position, variation in enumerate(variations):
+        resolved = _write_resolve(writer, position, variation, context)
+        _write_roundtrip(writer, position, resolved, variations, context)
+
+    writer.write("def resolve(path):")
+    writer.level += 1
+    writer.write("error = None")
+    for position in range(len(variations)):
+        writer.write("values, error = resolve_%d(path, error)" % position)
+        writer.write("if values is not None:")
+        writer.write("    return values, error")
+    writer.write("return None, error")
+    writer.level -= 1
+    writer.write("")
+
+    writer.write("def match(path):")
+    writer.level += 1
+    writer.write("if not prefilter(path):")
+    writer.write("    return %d" % STAGES.index("rejected_prefilter"))
+    writer.write("if len(_parts(path)) not in PARTS:")
+    writer.write("    return %d" % STAGES.index("rejected_parts"))
+    writer.write("error = None")
+    for position in range(len(variations)):
+        writer.write("values, error = resolve_%d(path, error)" % position)
+        writer.write("if values is not None:")
+        writer.level += 1
+        writer.write("if not values:")
+        writer.write("    return %d" % STAGES.index("rejected_values"))
+        writer.write("if roundtrip_%d(values, path):" % position)
+        writer.write("    return %d" % STAGES.index("matched"))
+        writer.write("return %d" % STAGES.index("rejected_format"))
+        writer.level -= 1
+    writer.write("return %d" % STAGES.index("rejected_values"))
+    writer.level -= 1
+    return writer.source(), namespace
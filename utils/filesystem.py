@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+#
+# - filesystem.py -
+#
+# Filesystem backends. Everything which touches the disk (config loading,
+# scans, versions lookup) goes through a backend, so it can be cached or
+# replaced by an in-memory tree.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import time
+import posixpath
+import threading
+import collections
+from stat import S_ISDIR
+
+# Seconds during which a cached listing is trusted
+DEFAULT_TTL = 5.0
+# Listings kept by a cache, the least recently used ones are dropped
+DEFAULT_MAX_LISTINGS = 4096
+
+
+class Entry(object):
+    """Entry of a directory, same API as os.DirEntry. is_dir is the result
+    of ``is_dir()`` (the symlinks are followed)."""
+
+    __slots__ = ("name", "path", "_is_dir", "_is_symlink")
+
+    def __init__(self, name, path, is_dir, is_symlink=False):
+        self.name = name
+        self.path = path
+        self._is_dir = is_dir
+        self._is_symlink = is_symlink
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.path)
+
+    def is_dir(self, follow_symlinks=True):
+        if self._is_symlink and not follow_symlinks:
+            return False
+        return self._is_dir
+
+    def is_file(self, follow_symlinks=True):
+        if self._is_symlink and not follow_symlinks:
+            return False
+        return not self._is_dir
+
+    def is_symlink(self):
+        return self._is_symlink
+
+
+class FileSystem(object):
+    """Interface of a filesystem backend"""
+
+    def listdir(self, path):
+        """List the names in a directory
+
+        :param path: The directory to list
+        :type path: str
+        :raises OSError: If the directory doesn't exist
+        :return: The names of the entries
+        :rtype: list
+        """
+        return [x.name for x in self.scandir(path)]
+
+    def scandir(self, path):
+        """List the entries of a directory
+
+        :param path: The directory to list
+        :type path: str
+        :raises OSError: If the directory doesn't exist
+        :return: The entries (see :class:`Entry`)
+        :rtype: list
+        """
+        raise NotImplementedError
+
+    def exists(self, path):
+        """Test if a path exists
+
+        :param path: The path to test
+        :type path: str
+        :return: True if it exists, False if not
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    def is_dir(self, path):
+        """Test if a path is a directory (symlinks are followed)
+
+        :param path: The path to test
+        :type path: str
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    def read(self, path):
+        """Read the content of a file
+
+        :param path: The file to read
+        :type path: str
+        :raises OSError: If the file doesn't exist
+        :return: The content
+        :rtype: bytes
+        """
+        raise NotImplementedError
+
+    def mtime(self, path):
+        """Return the modification time of a path
+
+        :param path: The path
+        :type path: str
+        :return: The modification time (ns) or None if it doesn't exist
+        :rtype: int
+        """
+        raise NotImplementedError
+
+    def size(self, path):
+        """Return the size of a file
+
+        :param path: The path
+        :type path: str
+        :return: The size in bytes (0 for a directory) or None if it
+        doesn't exist
+        :rtype: int
+        """
+        raise NotImplementedError
+
+    def mkdir(self, path):
+        """Create a directory, its parent must exist
+
+        :param path: The directory to create
+        :type path: str
+        :raises FileExistsError: If the path already exists
+        :raises FileNotFoundError: If the parent doesn't exist
+        """
+        raise NotImplementedError
+
+    def walk(self, root):
+        """Walk through the root and yield all directories and files below
+        it (sorted by name, depth first).
+
+        :param root: The root directory, the paths are bytes if it is
+        :type root: str or bytes
+        :return: Generator of paths
+        :rtype: generator
+        """
+        stack = [root if isinstance(root, bytes) else str(root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = sorted(self.scandir(directory), key=_entry_name)
+            except OSError:
+                continue
+            for entry in entries:
+                yield entry.path
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+
+
+def _entry_name(entry):
+    return entry.name
+
+
+class LocalFileSystem(FileSystem):
+    """The local filesystem (os functions)"""
+
+    def listdir(self, path):
+        return os.listdir(path)
+
+    def scandir(self, path):
+        with os.scandir(path) as entries:
+            return list(entries)
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def is_dir(self, path):
+        return os.path.isdir(path)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def size(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return 0 if S_ISDIR(stat.st_mode) else stat.st_size
+
+    def mkdir(self, path):
+        os.mkdir(path)
+
+
+class CachingFileSystem(FileSystem):
+    """Cache the listings of another backend. A listing is trusted during
+    ttl seconds, then it is only listed again if the mtime of the directory
+    changed. At most max_listings are kept, the least recently used ones
+    are dropped first.
+
+    >>> filesystem = CachingFileSystem(LocalFileSystem(), ttl=10)
+    >>> filesystem.listdir("/prod/project/shot/work/maya")
+    >>> ['foo.v001.ma', 'foo.v002.ma']
+    """
+
+    def __init__(
+        self, backend, ttl=DEFAULT_TTL, max_listings=DEFAULT_MAX_LISTINGS
+    ):
+        super(CachingFileSystem, self).__init__()
+
+        self.backend = backend
+        self.ttl = ttl
+        self.max_listings = max_listings
+        self._lock = threading.Lock()
+        # path: (expiration, mtime, entries), least recently used first
+        self._listings = collections.OrderedDict()
+
+    def __getstate__(self):
+        # The lock can't be pickled, the listings are not worth it
+        state = dict(self.__dict__)
+        del state["_lock"]
+        state["_listings"] = collections.OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def scandir(self, path):
+        path = str(path)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._listings.get(path)
+            if cached:
+                self._listings.move_to_end(path)
+        if cached and now < cached[0]:
+            return _check_listing(path, cached[2])
+
+        mtime = self.backend.mtime(path)
+        if cached and cached[1] == mtime:
+            entries = cached[2]
+        elif mtime is None:
+            entries = None
+        else:
+            try:
+                entries = [
+                    Entry(x.name, x.path, x.is_dir(), x.is_symlink())
+                    for x in self.backend.scandir(path)
+                ]
+            except OSError:
+                entries = None
+        with self._lock:
+            self._listings[path] = (now + self.ttl, mtime, entries)
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.max_listings:
+                self._listings.popitem(last=False)
+        return _check_listing(path, entries)
+
+    def exists(self, path):
+        path = str(path)
+        parent, name = posixpath.split(path.rstrip("/") or "/")
+        if not name:
+            return self.backend.exists(path)
+        try:
+            return name in self.listdir(parent)
+        except OSError:
+            return False
+
+    def is_dir(self, path):
+        return self.backend.is_dir(path)
+
+    def read(self, path):
+        return self.backend.read(path)
+
+    def mtime(self, path):
+        return self.backend.mtime(path)
+
+    def size(self, path):
+        return self.backend.size(path)
+
+    def mkdir(self, path):
+        self.backend.mkdir(path)
+        self.invalidate(posixpath.dirname(str(path).rstrip("/")) or "/")
+
+    def invalidate(self, path=None):
+        """Forget the listing of a directory (all listings if None)
+
+        :param path: The directory, defaults to None
+        :type path: str, optional
+        """
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(str(path), None)
+
+
+def _check_listing(path, entries):
+    if entries is None:
+        raise FileNotFoundError("No such directory: %s" % path)
+    return list(entries)
+
+
+class MemoryFileSystem(FileSystem):
+    """Filesystem living in memory. It can be populated from a list of
+    paths, which is useful to test or benchmark without any disk.
+
+    >>> filesystem = MemoryFileSystem.from_paths([
+    ...     "/prod/project/shot/work/maya/foo.v001.ma",
+    ...     "/prod/project/shot/work/maya/foo.v002.ma",
+    ... ])
+    >>> filesystem.listdir("/prod/project/shot/work/maya")
+    >>> ['foo.v001.ma', 'foo.v002.ma']
+    """
+
+    def __init__(self):
+        super(MemoryFileSystem, self).__init__()
+
+        self._lock = threading.Lock()
+        # Directory path: {name: children dict (directory) or bytes (file)}
+        self._directories = {"/": {}}
+        self._mtimes = {"/": 0}
+        self._clock = 0
+
+    @classmethod
+    def from_paths(cls, paths):
+        """Create a filesystem with empty files for the given paths. Paths
+        ending with "/" are directories.
+
+        :param paths: The paths to create
+        :type paths: iterable
+        :return: The filesystem
+        :rtype: :class:`MemoryFileSystem`
+        """
+        filesystem = cls()
+        for path in paths:
+            path = str(path)
+            if path.endswith("/"):
+                filesystem.makedirs(path)
+            else:
+                filesystem.write(path, b"")
+        return filesystem
+
+    def _normalize(self, path):
+        path = posixpath.normpath("/" + str(path))
+        return "/" + path.lstrip("/")
+
+    def _touch(self, path):
+        self._clock += 1
+        self._mtimes[path] = self._clock
+
+    def makedirs(self, path):
+        """Create a directory and its parents
+
+        :param path: The directory to create
+        :type path: str
+        :raises NotADirectoryError: If a parent is a file
+        """
+        path = self._normalize(path)
+        with self._lock:
+            self._makedirs(path)
+
+    def mkdir(self, path):
+        path = self._normalize(path)
+        parent, name = posixpath.split(path)
+        with self._lock:
+            children = self._directories.get(parent)
+            if children is None:
+                raise FileNotFoundError("No such directory: %s" % parent)
+            if name in children or path == "/":
+                raise FileExistsError("File exists: %s" % path)
+            children[name] = None
+            self._directories[path] = {}
+            self._touch(parent)
+            self._touch(path)
+
+    def _makedirs(self, path):
+        if path in self._directories:
+            return
+        parent, name = posixpath.split(path)
+        self._makedirs(parent)
+        children = self._directories[parent]
+        if name in children:
+            raise NotADirectoryError("Not a directory: %s" % path)
+        children[name] = None
+        self._directories[path] = {}
+        self._touch(parent)
+        self._touch(path)
+
+    def write(self, path, data):
+        """Write a file (its parents are created)
+
+        :param path: The file to write
+        :type path: str
+        :param data: The content
+        :type data: bytes
+        """
+        path = self._normalize(path)
+        parent, name = posixpath.split(path)
+        with self._lock:
+            if path in self._directories:
+                raise IsADirectoryError("Is a directory: %s" % path)
+            self._makedirs(parent)
+            children = self._directories[parent]
+            if name not in children:
+                self._touch(parent)
+            children[name] = bytes(data)
+            self._touch(path)
+
+    def remove(self, path):
+        """Remove a file or a directory (and everything below it)
+
+        :param path: The path to remove
+        :type path: str
+        :raises FileNotFoundError: If the path doesn't exist
+        """
+        path = self._normalize(path)
+        parent, name = posixpath.split(path)
+        with self._lock:
+            children = self._directories.get(parent, {})
+            if name not in children:
+                raise FileNotFoundError("No such file: %s" % path)
+            del children[name]
+            prefix = path + "/"
+            for directory in list(self._directories):
+                if directory == path or directory.startswith(prefix):
+                    del self._directories[directory]
+            self._mtimes.pop(path, None)
+            self._touch(parent)
+
+    def scandir(self, path):
+        path = self._normalize(path)
+        with self._lock:
+            children = self._directories.get(path)
+            if children is None:
+                raise FileNotFoundError("No such directory: %s" % path)
+            return [
+                Entry(name, posixpath.join(path, name), value is None)
+                for name, value in children.items()
+            ]
+
+    def listdir(self, path):
+        path = self._normalize(path)
+        with self._lock:
+            children = self._directories.get(path)
+            if children is None:
+                raise FileNotFoundError("No such directory: %s" % path)
+            return list(children)
+
+    def exists(self, path):
+        path = self._normalize(path)
+        if path in self._directories:
+            return True
+        parent, name = posixpath.split(path)
+        return name in self._directories.get(parent, {})
+
+    def is_dir(self, path):
+        return self._normalize(path) in self._directories
+
+    def read(self, path):
+        path = self._normalize(path)
+        parent, name = posixpath.split(path)
+        data = self._directories.get(parent, {}).get(name)
+        if data is None:
+            raise FileNotFoundError("No such file: %s" % path)
+        return data
+
+    def mtime(self, path):
+        path = self._normalize(path)
+        if not self.exists(path):
+            return None
+        return self._mtimes.get(path, 0)
+
+    def size(self, path):
+        path = self._normalize(path)
+        if path in self._directories:
+            return 0
+        parent, name = posixpath.split(path)
+        data = self._directories.get(parent, {}).get(name)
+        return None if data is None else len(data)
+
+
+# Backend used to load the configurations
+LOCAL_FILESYSTEM = LocalFileSystem()
+# Default backend of the lookups on the disk (latest versions...), a
+# configuration can have its own (see ProdexTemplate lookup_filesystem)
+CACHED_FILESYSTEM = CachingFileSystem(LOCAL_FILESYSTEM)
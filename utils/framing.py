@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# - framing.py -
+#
+# Framed protocol used between the resolver daemon and its clients. A frame is
+# the length of the payload (4 bytes, big endian) followed by a compact JSON
+# payload.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import struct
+
+HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+
+def encode_frame(data):
+    """Encode the data as a frame
+
+    :param data: The data to encode (must be JSON serializable)
+    :type data: object
+    :return: The frame
+    :rtype: bytes
+    """
+    payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(len(payload)) + payload
+
+
+def send_frame(sock, data):
+    """Send the data as a frame on the socket
+
+    :param sock: The connected socket
+    :type sock: socket.socket
+    :param data: The data to send (must be JSON serializable)
+    :type data: object
+    """
+    sock.sendall(encode_frame(data))
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1048576))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    """Receive a frame from the socket
+
+    :param sock: The connected socket
+    :type sock: socket.socket
+    :raises ValueError: If the frame is too big
+    :return: The decoded data or None if the connection has been closed
+    :rtype: object
+    """
+    header = _recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError("Frame too big: %d bytes" % size)
+    payload = _recv_exactly(sock, size)
+    if payload is None:
+        return None
+    return json.loads(payload.decode("utf-8"))
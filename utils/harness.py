@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+#
+# - harness.py -
+#
+# Differential harness of the matching engines: random configurations and
+# paths go through the reference engine and another one, every difference is
+# reported.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+import json
+import random
+import argparse
+
+from utils import templates_utils, synthetic
+
+# Pieces of the random definitions. Separators are also used in the values
+# to make rpartition ambiguous.
+SEPARATORS = ["_", ".", "-", "_v", "v", ""]
+STRING_VALUES = ["a", "b_c", "x.y", "v1", "1", "", "a-b", "_", "foo_v2"]
+PLACEHOLDERS = {
+    "a": {"type": "str"},
+    "b": {"type": "str"},
+    "c": {"type": "str", "choices": ["x", "x_y", "y.z"]},
+    "d": {"type": "str", "default": "dft"},
+    "n": {"type": "int", "format_spec": 3},
+    "m": {"type": "int"},
+    "e": {"type": "int", "format_spec": 2, "default": 1},
+}
+
+
+def random_content(rnd, templates=10):
+    """Generate a configuration full of ambiguous definitions: adjacent
+    placeholders, separators inside values, optional sections, repeated
+    placeholders.
+
+    :param rnd: The random generator
+    :type rnd: random.Random
+    :param templates: Number of templates, defaults to 10
+    :type templates: int, optional
+    :return: The content (same structure as a config file)
+    :rtype: dict
+    """
+    names = sorted(PLACEHOLDERS)
+    paths = {"root": "/root"}
+    for index in range(templates):
+        directories = ["@root", "t%d" % index]
+        for _ in range(rnd.randint(1, 3)):
+            component = ""
+            if rnd.random() < 0.3:
+                component += rnd.choice(["s", "x", "v"])
+            for position in range(rnd.randint(1, 3)):
+                if position or component:
+                    component += rnd.choice(SEPARATORS)
+                token = "{%s}" % rnd.choice(names)
+                if rnd.random() < 0.2:
+                    token = "[%s%s]" % (rnd.choice(SEPARATORS + ["/"]), token)
+                component += token
+            if rnd.random() < 0.3:
+                component += rnd.choice([".ext", "_v", "v"])
+            directories.append(component)
+        definition = "/".join(directories)
+        # Optional sections can't be the first part of a component
+        definition = definition.replace("/[", "/x[")
+        paths["t%d" % index] = {"definition": definition}
+    return {"placeholders": PLACEHOLDERS, "paths": paths, "strings": {}}
+
+
+def random_path(config, rnd):
+    """Generate a path of a random template of the configuration, with
+    values which are valid but not always separable.
+
+    :param config: The configuration
+    :type config: :class:`templates.ProdexTemplate`
+    :param rnd: The random generator
+    :type rnd: random.Random
+    :return: The path
+    :rtype: str
+    """
+    template = rnd.choice(list(config.templates.values()))
+    definition = rnd.choice(template.definitions)
+    values = {}
+    for name in templates_utils.find_placeholder(definition):
+        placeholder = template.placeholders[name]
+        if placeholder.choices:
+            value = rnd.choice(list(placeholder.choices))
+        elif placeholder.__class__.__name__ == "IntegerPlaceholder":
+            value = rnd.randint(0, 1200)
+        else:
+            value = rnd.choice(STRING_VALUES)
+        values[name] = placeholder.conform_value(value)
+    return definition.format_map(values)
+
+
+def mutate(path, rnd):
+    """Modify a path a little bit
+
+    :param path: The path
+    :type path: str
+    :param rnd: The random generator
+    :type rnd: random.Random
+    :return: The modified path
+    :rtype: str
+    """
+    if not path:
+        return path
+    index = rnd.randrange(len(path))
+    action = rnd.randint(0, 3)
+    if action == 0:
+        return path[:index] + path[index + 1 :]
+    if action == 1:
+        return path[:index] + rnd.choice("_.-v/0") + path[index:]
+    if action == 2:
+        return path[:index] + path[index] + path[index:]
+    return path.rpartition("/")[0]
+
+
+def _outcome(function, *args, **kwargs):
+    try:
+        return function(*args, **kwargs)
+    except Exception as error:
+        return ("raised", error.__class__.__name__, str(error))
+
+
+def compare(path, reference, other):
+    """Compare the results of two configurations on a path, for all
+    templates.
+
+    :param path: The path
+    :type path: str
+    :param reference: The configuration with the reference engine
+    :type reference: :class:`templates.ProdexTemplate`
+    :param other: The same configuration with another engine
+    :type other: :class:`templates.ProdexTemplate`
+    :return: The divergences
+    :rtype: list
+    """
+    divergences = []
+    other_templates = other.templates
+    for name, template in reference.templates.items():
+        other_template = other_templates[name]
+        checks = [
+            ("validate", {}),
+            ("get_placeholders_values", {"discreet": True}),
+            ("get_placeholders_values", {}),
+        ]
+        for method, kwargs in checks:
+            expected = _outcome(getattr(template, method), path, **kwargs)
+            result = _outcome(getattr(other_template, method), path, **kwargs)
+            if expected != result:
+                divergences.append(
+                    {
+                        "template": name,
+                        "definition": str(template.path),
+                        "path": path,
+                        "check": method,
+                        "reference": repr(expected),
+                        other.engine: repr(result),
+                    }
+                )
+    return divergences
+
+
+def run(engine, iterations=20, paths=200, seed=0, templates=10):
+    """Compare an engine with the reference on random configurations.
+    Configurations of :mod:`utils.synthetic` and configurations with
+    ambiguous definitions alternate. Paths are valid paths of the
+    templates, modified paths and paths of the other templates.
+
+    :param engine: The name of the engine to compare
+    :type engine: str
+    :param iterations: Number of configurations, defaults to 20
+    :type iterations: int, optional
+    :param paths: Number of paths by configuration, defaults to 200
+    :type paths: int, optional
+    :param seed: Seed of the generator, defaults to 0
+    :type seed: int, optional
+    :param templates: Number of templates by configuration, defaults to 10
+    :type templates: int, optional
+    :return: The report (counters and divergences)
+    :rtype: dict
+    """
+    # Imported here, templates.py imports the utils package
+    from templates import ProdexTemplate
+
+    report = {
+        "engine": engine,
+        "seed": seed,
+        "configs": 0,
+        "paths": 0,
+        "comparisons": 0,
+        "divergences": [],
+    }
+    for iteration in range(iterations):
+        rnd = random.Random("%s-%s" % (seed, iteration))
+        if iteration % 2:
+            content = random_content(rnd, templates=templates)
+        else:
+            content = synthetic.generate_content(
+                templates=templates, optionals=2, seed=rnd.random()
+            )
+        reference = ProdexTemplate(
+            path="<harness %d>" % iteration, content=content
+        )
+        other = ProdexTemplate(
+            path="<harness %d>" % iteration, content=content, engine=engine
+        )
+        report["configs"] += 1
+        for _ in range(paths):
+            path = random_path(reference, rnd)
+            if rnd.random() < 0.5:
+                path = mutate(path, rnd)
+            divergences = compare(path, reference, other)
+            for divergence in divergences:
+                divergence["config"] = iteration
+            report["divergences"].extend(divergences)
+            report["paths"] += 1
+            report["comparisons"] += len(reference.templates)
+    return report
+
+
+def main(argv=None):
+    """Run the harness from the command line. The exit code is 1 if a
+    divergence has been found.
+
+    >>> python -m utils.harness --engine compiled --iterations 100
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--engine", default="compiled")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--paths", type=int, default=200)
+    parser.add_argument("--templates", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.engine,
+        iterations=args.iterations,
+        paths=args.paths,
+        seed=args.seed,
+        templates=args.templates,
+    )
+    json.dump(report, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write("\n")
+    return 1 if report["divergences"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# - overlap.py -
+#
+# Static analysis of the overlaps between templates: two templates overlap
+# if a path could be valid for both of them.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import re
+import pathlib
+
+import exporters
+
+# Maximum number of strings expanded from the choices of a variation
+MAX_EXPANSION = 256
+
+LITERAL = "literal"
+CHOICES = "choices"
+DIGITS = "digits"
+ANYTHING = "anything"
+
+
+class _Variation(object):
+    """A definition seen as a language: literals, static choices, digits
+    (integer placeholders) and anything (the other placeholders). It is a
+    superset of the paths the definition validates.
+    """
+
+    def __init__(self, definition, placeholders):
+        super(_Variation, self).__init__()
+
+        self.elements = []
+        tokens = re.split(r"{(\w+)}", definition)
+        self.valid = not any("{" in x or "}" in x for x in tokens[::2])
+        for index, token in enumerate(tokens):
+            if index % 2 == 0:
+                if token:
+                    self.elements.append((LITERAL, token))
+                continue
+            placeholder = placeholders.get(token)
+            values = placeholder and exporters._static_choices(placeholder)
+            digits = placeholder and exporters._digits(placeholder)
+            if values:
+                self.elements.append((CHOICES, values))
+            elif digits:
+                self.elements.append((DIGITS, digits))
+            else:
+                self.elements.append((ANYTHING, None))
+        # Characters of the literals, and all the characters the
+        # variation can use (None if a placeholder can be anything)
+        self.required = set(
+            "".join(y for x, y in self.elements if x == LITERAL)
+        )
+        self.alphabet = set(self.required)
+        for kind, value in self.elements:
+            if kind == CHOICES:
+                self.alphabet.update("".join(value))
+            elif kind == DIGITS:
+                self.alphabet.update("0123456789")
+            elif kind == ANYTHING:
+                self.alphabet = None
+                break
+        self._regex = None
+        self.prefixes, self.complete = self._expand(self.elements)
+        self.suffixes, _ = self._expand(
+            [(x, self._reverse(y)) for x, y in reversed(self.elements)]
+        )
+
+    @staticmethod
+    def _reverse(value):
+        if isinstance(value, str):
+            return value[::-1]
+        if isinstance(value, list):
+            return [x[::-1] for x in value]
+        return value
+
+    @staticmethod
+    def _expand(elements):
+        """Expand the literals and the choices until the first open element
+
+        :return: (strings, complete). complete is True if the strings are
+        the whole language. Each string comes with True if the next
+        character is a digit.
+        :rtype: tuple
+        """
+        strings = [""]
+        for kind, value in elements:
+            if kind == LITERAL:
+                strings = [x + value for x in strings]
+                continue
+            if kind == CHOICES and len(strings) * len(value) <= MAX_EXPANSION:
+                strings = [x + y for x in strings for y in value]
+                continue
+            return [(x, kind == DIGITS) for x in strings], False
+        return [(x, False) for x in strings], True
+
+    @property
+    def regex(self):
+        if self._regex is None:
+            pattern = ""
+            for kind, value in self.elements:
+                if kind == LITERAL:
+                    pattern += re.escape(value)
+                elif kind == CHOICES:
+                    pattern += "(?:%s)" % "|".join(re.escape(x) for x in value)
+                elif kind == DIGITS:
+                    pattern += "[0-9]{%d,}" % value
+                else:
+                    pattern += ".*"
+            self._regex = re.compile(pattern, re.S)
+        return self._regex
+
+
+def _compatible(first, second):
+    """Check if two sets of open prefixes (or reversed suffixes) can start
+    the same string"""
+    for text_a, digit_a in first:
+        for text_b, digit_b in second:
+            short, digit, long_ = text_a, digit_a, text_b
+            if len(text_a) > len(text_b):
+                short, digit, long_ = text_b, digit_b, text_a
+            if not long_.startswith(short):
+                continue
+            # The shortest one continues with a digit
+            if digit and len(long_) > len(short):
+                if not long_[len(short)].isdigit():
+                    continue
+            return True
+    return False
+
+
+def _variations_overlap(first, second):
+    if not first.valid or not second.valid:
+        return True
+    for closed, other in ((first, second), (second, first)):
+        if closed.alphabet is not None and other.required - closed.alphabet:
+            return False
+    if first.complete:
+        return any(second.regex.fullmatch(x) for x, _ in first.prefixes)
+    if second.complete:
+        return any(first.regex.fullmatch(x) for x, _ in second.prefixes)
+    return _compatible(first.prefixes, second.prefixes) and _compatible(
+        first.suffixes, second.suffixes
+    )
+
+
+class Analysis(object):
+    """Overlaps between the templates of a configuration. The analysis is
+    conservative: two templates which don't overlap can't validate the same
+    path, two templates which overlap may validate the same path.
+
+    >>> analysis = Analysis(prodex_template.templates.values())
+    >>> analysis.overlaps("maya_shot_work")
+    >>> set()
+
+    :param templates: The templates
+    :type templates: iterable
+    """
+
+    def __init__(self, templates):
+        super(Analysis, self).__init__()
+
+        self._variations = {}
+        # Number of parts: names of the templates
+        buckets = {}
+        for template in templates:
+            self._variations[template.name] = [
+                _Variation(x, template.placeholders)
+                for x in template.definitions
+            ]
+            # A valid path has the parts of one of the definitions
+            for parts in set(
+                len(pathlib.Path(x).parts) for x in template.definitions
+            ):
+                buckets.setdefault(parts, []).append(template.name)
+
+        self._overlaps = {x: set() for x in self._variations}
+        checked = set()
+        for names in buckets.values():
+            for index, name in enumerate(names):
+                for other in names[index + 1 :]:
+                    if (name, other) in checked:
+                        continue
+                    checked.add((name, other))
+                    if self._check(name, other):
+                        self._overlaps[name].add(other)
+                        self._overlaps[other].add(name)
+
+    def _check(self, name, other):
+        return any(
+            _variations_overlap(x, y)
+            for x in self._variations[name]
+            for y in self._variations[other]
+        )
+
+    def overlaps(self, name):
+        """Return the templates which may validate the same paths as a
+        template
+
+        :param name: The name of the template
+        :type name: str
+        :rtype: set
+        """
+        return set(self._overlaps[name])
+
+    def exclusive(self):
+        """Return the templates which don't overlap any other one, a path
+        validated by one of them is validated by no other template.
+
+        :rtype: set
+        """
+        return set(x for x, y in self._overlaps.items() if not y)
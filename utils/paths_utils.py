@@ -25,13 +25,15 @@
 # SOFTWARE.
 
 import pathlib
+import contextlib
 
 import yaml
 
 from errors import ProdexTemplateCircular
+from utils import filesystem as filesystems
 
 
-def get_include_as_absolute_path(file_name, include):
+def get_include_as_absolute_path(file_name, include, filesystem=None):
     """Return the absolute path of any includes in the config file
 
     :param file_name: The path of the parsed config from wich the include was
@@ -39,20 +41,39 @@ def get_include_as_absolute_path(file_name, include):
     :type file_name: pathlib.Path
     :param include: The include file
     :type include: str
+    :param filesystem: The filesystem backend, defaults to the local one
+    :type filesystem: :class:`utils.filesystem.FileSystem`, optional
     :return: The absolute path if the file exists, None instead
     :rtype: pathlib.Path
     """
+    filesystem = filesystem or filesystems.LOCAL_FILESYSTEM
     include_path = pathlib.Path(include)
     if not include_path.is_absolute():
         # The path is not an absolute path, convert it.
         include_path = file_name.parent / include_path
-    if not include_path.exists():
+    if not filesystem.exists(str(include_path)):
         # Ensure that the file exists
         return None
     return include_path
 
 
-def recurssive_parser(path, visited=None):
+def read_config(path, filesystem=None):
+    """Parse a single config file
+
+    :param path: The path of the config file
+    :type path: pathlib.Path
+    :param filesystem: The filesystem backend, defaults to the local one
+    :type filesystem: :class:`utils.filesystem.FileSystem`, optional
+    :return: The data of the config file
+    :rtype: dict
+    """
+    filesystem = filesystem or filesystems.LOCAL_FILESYSTEM
+    return yaml.full_load(filesystem.read(str(path)))
+
+
+def recurssive_parser(
+    path, visited=None, reader=None, filesystem=None, profile=None
+):
     """Parse reccurssively all the configurations
 
     :param path: The path of the first config file
@@ -60,17 +81,31 @@ def recurssive_parser(path, visited=None):
     :param visited: The list of all dependencies which have been visited,
     defaults to None
     :type visited: list, optional
+    :param reader: Function used to parse a single config file,
+    defaults to :func:`read_config`. The returned dict is modified, so it
+    must be a new dict for each call.
+    :type reader: callable, optional
+    :param filesystem: The filesystem backend, defaults to the local one
+    :type filesystem: :class:`utils.filesystem.FileSystem`, optional
+    :param profile: Profile of the load, the reading of each file and the
+    merge of each include are measured, optional
+    :type profile: :class:`profiler.LoadProfile`, optional
     :raises ProdexTemplateCircular: Raised if circular import is detected.
     :return: The data collected in all config files
     :rtype: dict
     """
+    if visited is None:
+        visited = []
     if path in visited:
         raise ProdexTemplateCircular("Circular Import detected in templates.")
     visited.append(path)
 
     # Parse the data
-    with open(path, "r") as f:
-        data = yaml.full_load(f)
+    with _measure(profile, "read", path):
+        if reader:
+            data = reader(path)
+        else:
+            data = read_config(path, filesystem=filesystem)
 
     # Retrieve includes
     _includes = data.pop("includes", [])
@@ -81,25 +116,38 @@ def recurssive_parser(path, visited=None):
     for _include in _includes:
 
         include_path = get_include_as_absolute_path(
-            file_name=path, include=_include
+            file_name=path, include=_include, filesystem=filesystem
         )
         if not include_path:
             continue
 
-        _data = recurssive_parser(path=include_path, visited=visited)
+        _data = recurssive_parser(
+            path=include_path,
+            visited=visited,
+            reader=reader,
+            filesystem=filesystem,
+            profile=profile,
+        )
 
-        for key in _data.keys():
-            if key not in data:
-                data[key] = _data[key]
-                continue
-            if isinstance(data[key], list):
-                data[key].extend(_data[key])
-            elif isinstance(data[key], dict):
-                data[key].update(_data[key])
-            else:
-                data[key] = _data[key]
+        with _measure(profile, "merge", include_path):
+            for key in _data.keys():
+                if key not in data:
+                    data[key] = _data[key]
+                    continue
+                if isinstance(data[key], list):
+                    data[key].extend(_data[key])
+                elif isinstance(data[key], dict):
+                    data[key].update(_data[key])
+                else:
+                    data[key] = _data[key]
 
     # Put inlcudes inside the data
     data["includes"] = visited
 
     return data
+
+
+def _measure(profile, phase, name):
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.measure(phase, name)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# - synthetic.py -
+#
+# Synthetic configurations and paths, used by benchmarks and by the engines
+# equivalence harness.
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import random
+import pathlib
+
+import yaml
+
+from utils import templates_utils
+
+DCCS = ["maya", "houdini", "nuke", "blender", "katana", "mari", "zbrush"]
+STEPS = ["model", "rig", "anim", "fx", "light", "comp", "layout", "surf"]
+WORDS = ["foo", "bar", "baz", "qux", "chair", "table", "hero", "crowd"]
+
+# Pieces used to build the definitions. Optional sections are added by
+# generate_config.
+FILE_NAMES = [
+    "{asset}_{step}.v{version}.{extension}",
+    "{asset}_{name}_v{version}.{extension}",
+    "{name}.v{version}.{frame}.{extension}",
+    "{asset}.{step}.{name}.v{version}.{extension}",
+    "{name}_{asset}_{version}.{extension}",
+]
+
+
+def generate_content(templates=100, optionals=1, roots=4, seed=0):
+    """Generate the content of a configuration
+
+    :param templates: Number of templates, defaults to 100
+    :type templates: int, optional
+    :param optionals: Max number of optional sections by template,
+    defaults to 1
+    :type optionals: int, optional
+    :param roots: Number of root paths, defaults to 4
+    :type roots: int, optional
+    :param seed: Seed of the generator, defaults to 0
+    :type seed: int, optional
+    :return: The content (same structure as a config file)
+    :rtype: dict
+    """
+    rnd = random.Random(seed)
+    placeholders = {
+        "asset": {"type": "str"},
+        "name": {"type": "str"},
+        "step": {"type": "str", "choices": list(STEPS)},
+        "version": {"type": "int", "format_spec": 3},
+        "frame": {"type": "int", "format_spec": 4},
+        "variant": {"type": "str"},
+        "extension": {
+            "type": "str",
+            "choices": ["ma", "mb", "abc", "exr", "usd", "hip", "nk"],
+        },
+    }
+    paths = {}
+    for index in range(roots):
+        paths["root_%d" % index] = "/prod/project_%d" % index
+
+    for index in range(templates):
+        dcc = DCCS[index % len(DCCS)]
+        stage = rnd.choice(["work", "publish", "review", "cache"])
+        file_name = rnd.choice(FILE_NAMES)
+        directories = ["@root_%d" % (index % roots), "%s%d" % (dcc, index)]
+        directories.append(stage)
+        directories.append("{asset}")
+        if rnd.random() < 0.5:
+            directories.append("{step}")
+        definition = "/".join(directories)
+        count = rnd.randint(0, optionals) if optionals else 0
+        if count:
+            definition += "[/{variant}]"
+            count -= 1
+        definition += "/" + file_name
+        if count:
+            # Optional suffix before the version
+            definition = definition.replace(
+                ".v{version}", "[_{variant}].v{version}", 1
+            )
+        paths["%s_%s_%d" % (dcc, stage, index)] = {"definition": definition}
+
+    return {"placeholders": placeholders, "paths": paths, "strings": {}}
+
+
+def generate_config(path, **kwargs):
+    """Generate a config file (see :func:`generate_content` for kwargs)
+
+    :param path: The path of the config file
+    :type path: str
+    :return: The path of the config file
+    :rtype: pathlib.Path
+    """
+    path = pathlib.Path(path)
+    with open(str(path), "w") as f:
+        yaml.safe_dump(generate_content(**kwargs), f, default_flow_style=False)
+    return path
+
+
+def random_value(placeholder, rnd):
+    """Generate a random value for a placeholder
+
+    :param placeholder: The placeholder
+    :type placeholder: :class:`placeholders.Placeholder`
+    :param rnd: The random generator
+    :type rnd: random.Random
+    :return: A valid value
+    :rtype: object
+    """
+    if placeholder.choices:
+        return rnd.choice(list(placeholder.choices))
+    if placeholder.__class__.__name__ == "IntegerPlaceholder":
+        return rnd.randint(0, 300)
+    return rnd.choice(WORDS) + str(rnd.randint(0, 20))
+
+
+def generate_paths(config, count, seed=0, unmatched=0.1):
+    """Generate paths of the templates of a configuration. Paths are
+    generated lazily.
+
+    :param config: The configuration
+    :type config: :class:`templates.ProdexTemplate`
+    :param count: Number of paths
+    :type count: int
+    :param seed: Seed of the generator, defaults to 0
+    :type seed: int, optional
+    :param unmatched: Ratio of paths which don't match any template,
+    defaults to 0.1
+    :type unmatched: float, optional
+    :return: Generator of (path, template name or None)
+    :rtype: generator
+    """
+    rnd = random.Random(seed)
+    templates = [
+        x for x in config.templates.values() if x.required_placeholders
+    ]
+    for _ in range(count):
+        template = rnd.choice(templates)
+        definition = rnd.choice(template.definitions)
+        values = {}
+        for name in templates_utils.find_placeholder(definition):
+            placeholder = template.placeholders[name]
+            values[name] = placeholder.conform_value(
+                random_value(placeholder, rnd)
+            )
+        path = definition.format_map(values)
+        if rnd.random() < unmatched:
+            yield path + ".bak", None
+            continue
+        yield path, template.name
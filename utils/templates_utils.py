@@ -216,6 +216,46 @@ def decompose_definition(definition, static_part):
     return (base, static_part, placeholder)
 
 
+def component_pattern(component, key, values):
+    """Compile the pattern of a path component in order to extract the key.
+    Given values are literals, other placeholders match anything. Groups
+    are named with generated ids (placeholder names aren't always valid
+    group names), the lookup table gives the id of each placeholder.
+
+    >>> pattern, groups = component_pattern("{name}.v{version}.{ext}",
+    ...     "version", {"name": "foo"})
+    >>> pattern.fullmatch("foo.v003.ma").group(groups["version"])
+    >>> '003'
+
+    :param component: The component of a definition (no "/" inside)
+    :type component: str
+    :param key: The placeholder to extract (integer)
+    :type key: str
+    :param values: Conformed values of the known placeholders
+    :type values: dict
+    :return: The compiled pattern with a group for the key, and the group
+    id of each captured placeholder
+    :rtype: tuple
+    """
+    tokens = re.split(r"{(\w+)}", component)
+    pattern = ""
+    groups = {}
+    for index, token in enumerate(tokens):
+        if index % 2 == 0:
+            pattern += re.escape(token)
+        elif token == key and key in groups:
+            # Same placeholder twice, the values must be equal
+            pattern += "(?P=%s)" % groups[key]
+        elif token == key:
+            groups[key] = "g%d" % len(groups)
+            pattern += "(?P<%s>[0-9]+)" % groups[key]
+        elif token in values:
+            pattern += re.escape(str(values[token]))
+        else:
+            pattern += ".+"
+    return re.compile(pattern), groups
+
+
 def paths_categorization(paths):
     root_paths = {}
     other_paths = {}
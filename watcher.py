@@ -0,0 +1,704 @@
+# -*- coding: utf-8 -*-
+#
+# - watcher.py -
+#
+# Live classification of the files written in the directories reachable by
+# the templates (inotify on Linux, polling elsewhere).
+#
+# Copyright (c) 2021 Laurette Alexandre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import re
+import sys
+import time
+import errno
+import select
+import struct
+import asyncio
+import threading
+import collections
+import ctypes
+import ctypes.util
+
+import errors
+
+WatchEvent = collections.namedtuple(
+    "WatchEvent", ["event", "path", "template", "fields"]
+)
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+# Events have been lost (inotify queue overflow), the path is a watched
+# directory which must be scanned again by the consumer.
+OVERFLOW = "overflow"
+
+# inotify constants (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Reachability(object):
+    """Directories which can contain a path of the templates. Each
+    component of a directory must match the component at the same
+    position of a definition (placeholders match anything).
+
+    :param templates: The templates
+    :type templates: list
+    """
+
+    def __init__(self, templates):
+        super(Reachability, self).__init__()
+
+        self._definitions = []
+        roots = set()
+        for template in templates:
+            for definition in template.definitions:
+                components = definition.split("/")[:-1]
+                patterns = []
+                static = []
+                for component in components:
+                    tokens = re.split(r"{\w+}", component)
+                    patterns.append(
+                        re.compile(
+                            "(?s:%s)" % ".*".join(re.escape(x) for x in tokens)
+                        )
+                    )
+                    if len(tokens) == 1 and len(static) == len(patterns) - 1:
+                        static.append(component)
+                self._definitions.append(patterns)
+                roots.add("/".join(static) or "/")
+        self.roots = []
+        for root in sorted(roots):
+            if any(root.startswith(x.rstrip("/") + "/") for x in self.roots):
+                continue
+            self.roots.append(root)
+
+    def __call__(self, directory):
+        """Check if a directory can contain a path of the templates
+
+        :param directory: The directory
+        :type directory: str
+        :rtype: bool
+        """
+        components = directory.rstrip("/").split("/") or [""]
+        for patterns in self._definitions:
+            if len(components) > len(patterns):
+                continue
+            if all(x.fullmatch(y) for x, y in zip(patterns, components)):
+                return True
+        return False
+
+    def existing_roots(self):
+        """Get the directories to watch: the roots or their nearest
+        existing parent.
+
+        :rtype: list
+        """
+        roots = []
+        for root in self.roots:
+            while not os.path.isdir(root) and os.path.dirname(root) != root:
+                root = os.path.dirname(root)
+            if root not in roots:
+                roots.append(root)
+        return roots
+
+
+def _scan(directory, reachable, directories, files):
+    """List the reachable directories and the files below a directory"""
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    directories.append(directory)
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if not is_dir:
+            files.append(entry.path)
+        elif reachable(entry.path):
+            _scan(entry.path, reachable, directories, files)
+
+
+class InotifyBackend(object):
+    """Events of the kernel, one watch by reachable directory. Directories
+    which can't be watched (no more watches, see max_user_watches...) are
+    polled.
+
+    :param poll_interval: Seconds between two polls of the directories
+    which can't be watched, defaults to 1.0
+    :type poll_interval: float, optional
+    """
+
+    def __init__(self, reachable, poll_interval=1.0):
+        super(InotifyBackend, self).__init__()
+
+        self._reachable = reachable
+        self._poll_interval = poll_interval
+        # Polling of the directories which can't be watched
+        self._fallback = None
+        name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._watches = {}  # wd: directory
+        self._created = set()  # Created files which are not closed yet
+        self._moved = {}  # cookie: directory moved, until its MOVED_TO
+
+    def add_tree(self, directory):
+        """Watch a directory and its reachable directories
+
+        :param directory: The directory
+        :type directory: str
+        :return: The files found in the directories
+        :rtype: list
+        """
+        directories = []
+        files = []
+        _scan(directory, self._reachable, directories, files)
+        for path in directories:
+            self._watch(path)
+        return files
+
+    def _watch(self, directory):
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), IN_MASK
+        )
+        if wd >= 0:
+            self._watches[wd] = directory
+            return
+        error = ctypes.get_errno()
+        if error in (errno.ENOENT, errno.ENOTDIR):
+            # Removed since it was listed, its parent reports it
+            return
+        if self._fallback is None:
+            sys.stderr.write(
+                "inotify: can't watch %s (%s), polling it instead\n"
+                % (directory, os.strerror(error))
+            )
+            self._fallback = PollingBackend(
+                self._reachable, self._poll_interval
+            )
+        self._fallback.watch(directory)
+
+    def _unwatch(self, directory):
+        """Remove the watches of a directory and of its subdirectories"""
+        prefix = directory.rstrip("/") + "/"
+        for wd, path in list(self._watches.items()):
+            if path == directory or path.startswith(prefix):
+                del self._watches[wd]
+                self._libc.inotify_rm_watch(self._fd, wd)
+        self._created = set(
+            x for x in self._created if not x.startswith(prefix)
+        )
+
+    @property
+    def polled(self):
+        """Return the directories polled because they can't be watched
+
+        :rtype: list
+        """
+        if self._fallback is None:
+            return []
+        return sorted(self._fallback.directories)
+
+    def read(self, timeout):
+        """Wait for events
+
+        :param timeout: Seconds to wait at most
+        :type timeout: float
+        :return: The events (kind, path)
+        :rtype: list
+        """
+        if self._fallback is None:
+            return self._read(timeout)
+        # Wake up for the next poll of the fallback
+        wait = max(self._fallback.next_poll - time.monotonic(), 0)
+        if timeout is None or wait < timeout:
+            timeout = wait
+        events = self._read(timeout)
+        events.extend(self._fallback.read(0))
+        return events
+
+    def _read(self, timeout):
+        readable = select.select([self._fd], [], [], timeout)[0]
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as error:
+            if error.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            self._convert(wd, mask, cookie, os.fsdecode(name), events)
+        # Directories moved out of the watched directories: what they
+        # contained is unknown, the consumer must scan them again
+        for directory in self._moved.values():
+            events.append((OVERFLOW, directory))
+        self._moved.clear()
+        return events
+
+    def _convert(self, wd, mask, cookie, name, events):
+        if mask & IN_Q_OVERFLOW:
+            for directory in sorted(set(self._watches.values())):
+                events.append((OVERFLOW, directory))
+            return
+        if mask & IN_MOVE_SELF:
+            directory = self._watches.get(wd)
+            if directory is not None:
+                # A root moved (the moves below a root are reported by the
+                # parent directory): its watches have a stale path
+                self._unwatch(directory)
+                events.append((OVERFLOW, directory))
+            return
+        if mask & (IN_IGNORED | IN_DELETE_SELF):
+            self._watches.pop(wd, None)
+            return
+        directory = self._watches.get(wd)
+        if directory is None:
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & IN_MOVED_FROM:
+                # The watches below keep the old path until they are
+                # removed, the new location is watched again if reachable
+                self._unwatch(path)
+                if self._reachable(path):
+                    self._moved[cookie] = path
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                source = self._moved.pop(cookie, None)
+                if source is not None and mask & IN_MOVED_TO:
+                    events.extend(self._moved_away(source, path))
+                if self._reachable(path):
+                    # Files may have been written before the watch exists
+                    events.extend((CREATED, x) for x in self.add_tree(path))
+            return
+        if mask & IN_CREATE:
+            self._created.add(path)
+        elif mask & IN_CLOSE_WRITE:
+            if path in self._created:
+                self._created.discard(path)
+                events.append((CREATED, path))
+            else:
+                events.append((MODIFIED, path))
+        elif mask & IN_MOVED_TO:
+            events.append((CREATED, path))
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self._created.discard(path)
+            events.append((DELETED, path))
+
+    def _moved_away(self, source, destination):
+        """Deleted events of the files of a directory moved from source to
+        destination (a watched directory)"""
+        directories = []
+        files = []
+        _scan(
+            destination,
+            lambda x: self._reachable(source + x[len(destination) :]),
+            directories,
+            files,
+        )
+        return [(DELETED, source + x[len(destination) :]) for x in files]
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        if self._fallback is not None:
+            self._fallback.close()
+
+
+class PollingBackend(object):
+    """Polling of the reachable directories. Only the directories are
+    checked on each poll, a directory is listed again when its mtime
+    changes. Files modified in place (without being written again by a
+    rename) are not detected.
+
+    :param interval: Seconds between two polls, defaults to 1.0
+    :type interval: float, optional
+    """
+
+    def __init__(self, reachable, interval=1.0):
+        super(PollingBackend, self).__init__()
+
+        self._reachable = reachable
+        self._interval = interval
+        self._next = time.monotonic() + interval
+        self._directories = {}  # directory: (mtime, {name: (is_dir, stat)})
+
+    def _snapshot(self, directory):
+        entries = {}
+        mtime = os.stat(directory).st_mtime_ns
+        for entry in os.scandir(directory):
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            entries[entry.name] = (is_dir, (stat.st_mtime_ns, stat.st_size))
+        return mtime, entries
+
+    def add_tree(self, directory):
+        """Watch a directory and its reachable directories
+
+        :param directory: The directory
+        :type directory: str
+        :return: The files found in the directories
+        :rtype: list
+        """
+        directories = []
+        files = []
+        _scan(directory, self._reachable, directories, files)
+        for path in directories:
+            self.watch(path)
+        return files
+
+    def watch(self, directory):
+        """Watch a directory, not its subdirectories
+
+        :param directory: The directory
+        :type directory: str
+        """
+        try:
+            self._directories[directory] = self._snapshot(directory)
+        except OSError:
+            pass
+
+    @property
+    def directories(self):
+        """Return the watched directories
+
+        :rtype: list
+        """
+        return list(self._directories)
+
+    @property
+    def next_poll(self):
+        """Return the time of the next poll (see :func:`time.monotonic`)
+
+        :rtype: float
+        """
+        return self._next
+
+    def _forget(self, directory, events):
+        prefix = directory.rstrip("/") + "/"
+        for path in list(self._directories):
+            if path != directory and not path.startswith(prefix):
+                continue
+            for name, (is_dir, _) in self._directories.pop(path)[1].items():
+                if not is_dir:
+                    events.append((DELETED, os.path.join(path, name)))
+
+    def read(self, timeout):
+        """Wait for the next poll
+
+        :param timeout: Seconds to wait at most
+        :type timeout: float
+        :return: The events (kind, path)
+        :rtype: list
+        """
+        wait = self._next - time.monotonic()
+        if timeout is not None and wait > timeout:
+            time.sleep(max(timeout, 0))
+            return []
+        time.sleep(max(wait, 0))
+        self._next = time.monotonic() + self._interval
+        events = []
+        for directory in list(self._directories):
+            if directory not in self._directories:
+                continue  # Forgotten with its parent
+            mtime, entries = self._directories[directory]
+            try:
+                changed = os.stat(directory).st_mtime_ns != mtime
+                if changed:
+                    snapshot = self._snapshot(directory)
+            except OSError:
+                self._forget(directory, events)
+                continue
+            if not changed:
+                continue
+            self._directories[directory] = snapshot
+            self._compare(directory, entries, snapshot[1], events)
+        return events
+
+    def _compare(self, directory, before, after, events):
+        for name, (is_dir, stat) in after.items():
+            path = os.path.join(directory, name)
+            previous = before.get(name)
+            if is_dir:
+                if previous is None and self._reachable(path):
+                    events.extend((CREATED, x) for x in self.add_tree(path))
+            elif previous is None or previous[0]:
+                events.append((CREATED, path))
+            elif previous[1] != stat:
+                events.append((MODIFIED, path))
+        for name, (is_dir, _) in before.items():
+            if name in after:
+                continue
+            path = os.path.join(directory, name)
+            if is_dir:
+                self._forget(path, events)
+            else:
+                events.append((DELETED, path))
+
+    def close(self):
+        self._directories.clear()
+
+
+class Watcher(object):
+    """Watch the directories reachable by the templates and classify the
+    new, modified and deleted files. Bursts of events are debounced and
+    classified in batches, the cost depends on the number of changes, not
+    on the size of the tree.
+
+    >>> def on_event(event):
+    ...     print(event.event, event.path, event.template, event.fields)
+    >>> with Watcher(config, callback=on_event):
+    ...     time.sleep(3600)
+
+    >>> async for event in Watcher(config):
+    ...     print(event)
+
+    :param config: The configuration
+    :type config: :class:`templates.ProdexTemplate`
+    :param templates: (kwargs) Names of the templates to watch, all
+    templates by default
+    :type templates: list
+    :param callback: (kwargs) Called with each :class:`WatchEvent` by a
+    thread, optional
+    :type callback: callable
+    :param backend: (kwargs) "inotify", "polling" or "auto" (default)
+    :type backend: str
+    :param debounce: (kwargs) Seconds without event before a batch is
+    classified, defaults to 0.5
+    :type debounce: float
+    :param max_delay: (kwargs) Seconds after which a batch is classified
+    even if events keep coming, defaults to 5.0
+    :type max_delay: float
+    :param batch_size: (kwargs) Number of paths after which a batch is
+    classified, defaults to 1000
+    :type batch_size: int
+    :param poll_interval: (kwargs) Seconds between two polls of the
+    polling backend (or of the directories inotify can't watch), defaults
+    to 1.0
+    :type poll_interval: float
+    :param unmatched: (kwargs) Also deliver the paths which don't match
+    any template (the template is None), defaults to False
+    :type unmatched: bool
+    :raises errors.ProdexTemplateError: If a template doesn't exist
+    """
+
+    def __init__(self, config, **kwargs):
+        super(Watcher, self).__init__()
+
+        names = kwargs.get("templates", None)
+        templates = config.templates
+        if names is not None:
+            for name in names:
+                if name not in templates:
+                    raise errors.ProdexTemplateError(
+                        "No template found for %s" % name
+                    )
+            templates = {x: templates[x] for x in names}
+        self._templates = list(templates.values())
+        self._callback = kwargs.get("callback", None)
+        self.debounce = kwargs.get("debounce", 0.5)
+        self.max_delay = kwargs.get("max_delay", 5.0)
+        self.batch_size = kwargs.get("batch_size", 1000)
+        self._unmatched = kwargs.get("unmatched", False)
+
+        self.reachable = Reachability(self._templates)
+        backend = kwargs.get("backend", "auto")
+        if backend == "auto":
+            backend = "polling"
+            if sys.platform.startswith("linux"):
+                backend = "inotify"
+        if backend == "inotify":
+            try:
+                self._backend = InotifyBackend(
+                    self.reachable, kwargs.get("poll_interval", 1.0)
+                )
+            except (OSError, AttributeError):
+                # No inotify (libc without it, limit of instances...)
+                backend = "polling"
+        if backend == "polling":
+            self._backend = PollingBackend(
+                self.reachable, kwargs.get("poll_interval", 1.0)
+            )
+        elif backend != "inotify":
+            raise errors.ProdexTemplateError("Unknown backend %s" % backend)
+        self.backend = backend
+
+        for root in self.reachable.existing_roots():
+            self._backend.add_tree(root)
+
+        self._pending = collections.OrderedDict()  # path: event
+        self._first_event = None
+        self._last_event = None
+        self._stop = threading.Event()
+        self._thread = None
+        if self._callback is not None:
+            self.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __aiter__(self):
+        return self.events()
+
+    def start(self):
+        """Deliver the events to the callback from a thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._backend.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for event in self.poll(timeout=0.2):
+                self._callback(event)
+
+    async def events(self):
+        """Iterate over the events
+
+        :return: Asynchronous generator of :class:`WatchEvent`
+        :rtype: async generator
+        """
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            batch = await loop.run_in_executor(None, self.poll, 0.2)
+            for event in batch:
+                yield event
+
+    def poll(self, timeout=None):
+        """Wait for the next batch of events
+
+        :param timeout: Seconds to wait at most, optional
+        :type timeout: float, optional
+        :return: The classified events, empty if the timeout expired
+        :rtype: list
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._stop.is_set():
+            now = time.monotonic()
+            wait = 0.2
+            if self._pending:
+                flush = min(
+                    self._last_event + self.debounce,
+                    self._first_event + self.max_delay,
+                )
+                if now >= flush or len(self._pending) >= self.batch_size:
+                    return self._flush()
+                wait = flush - now
+            if deadline is not None:
+                if now >= deadline:
+                    return []
+                wait = min(wait, deadline - now)
+            for kind, path in self._backend.read(wait):
+                self._add(kind, path)
+        return []
+
+    def _add(self, kind, path):
+        now = time.monotonic()
+        if not self._pending:
+            self._first_event = now
+        self._last_event = now
+        previous = self._pending.get(path)
+        if previous == CREATED and kind == DELETED:
+            # Temporary file
+            del self._pending[path]
+        elif previous == CREATED and kind == MODIFIED:
+            pass
+        elif previous == DELETED and kind in (CREATED, MODIFIED):
+            self._pending[path] = MODIFIED
+        else:
+            self._pending[path] = kind
+
+    def _flush(self):
+        pending = self._pending
+        self._pending = collections.OrderedDict()
+        events = []
+        for path, kind in pending.items():
+            if kind == OVERFLOW:
+                events.append(WatchEvent(kind, path, None, {}))
+                continue
+            template, fields = self.classify(path)
+            if template is None and not self._unmatched:
+                continue
+            events.append(WatchEvent(kind, path, template, fields))
+        return events
+
+    def classify(self, path):
+        """Find the template of a path
+
+        :param path: The path
+        :type path: str
+        :return: The template (None if no template or several templates
+        match) and the fields
+        :rtype: tuple
+        """
+        matched = [x for x in self._templates if x.validate(path)]
+        if len(matched) != 1:
+            return None, {}
+        template = matched[0]
+        return template, template.get_placeholders_values(path)